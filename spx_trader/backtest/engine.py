@@ -0,0 +1,210 @@
+# backtest/engine.py
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+from config import config
+from utils.logger import Logger
+from utils.indicators import TechnicalIndicators, reversal_masks, batch_rsi, batch_ma, filter_settings
+from trading.exits import calculate_tp_sl, tp_hit, sl_hit, exit_reason
+
+TRADE_COLUMNS = [
+    'symbol', 'action', 'entry_time', 'entry', 'target', 'stop',
+    'exit_time', 'exit_price', 'exit_reason', 'bars', 'pnl', 'return_pct'
+]
+
+
+def default_params() -> dict:
+    """معاملات الاستراتيجية الحية من ملف التكوين"""
+    params = {
+        'rsi_period': int(config.get('rsi_period', 14)),
+        'ma_period': int(config.get('ma_period', 50)),
+        'tp_pct': config.get('tp_pct', 5),
+        'sl_pct': config.get('sl_pct', 3),
+        'qty': config.get('qty', 1)
+    }
+    params.update(filter_settings())
+    return params
+
+
+def compute_signals(ohlc: Dict[str, np.ndarray], params: dict,
+                    rsi: np.ndarray = None, ma: np.ndarray = None):
+    """
+    إشارات الانعكاس لكل شمعة بنفس دوال analyze_batch في مسار المراقبة الحي
+
+    Args:
+        rsi, ma: مؤشرات محسوبة مسبقًا بفترات params (اختياري - لإعادة استخدامها بين التجارب)
+
+    Returns:
+        Tuple: (buy, sell) مصفوفات منطقية بشكل ohlc['close']
+    """
+    close = np.asarray(ohlc['close'], dtype=float)
+    return reversal_masks(
+        ohlc['open'], ohlc['high'], ohlc['low'], close,
+        batch_rsi(close, params['rsi_period']) if rsi is None else rsi,
+        batch_ma(close, params['ma_period']) if ma is None else ma,
+        use_rsi=params['use_rsi'], use_ma=params['use_ma'],
+        rsi_oversold=params['rsi_oversold'], rsi_overbought=params['rsi_overbought']
+    )
+
+
+def simulate_exits(open_, high, low, close, buy, sell, params: dict) -> List[tuple]:
+    """
+    محاكاة الدخول عند إغلاق شمعة الإشارة والخروج بنفس قواعد TP/SL الحية
+
+    مركز واحد لكل رمز في الوقت نفسه. تُمرر أسعار كل شمعة بترتيب: الافتتاح، ثم
+    الأسوأ، ثم الأفضل - كما يراها exit_reason في المسار الحي. فإذا افتتحت الشمعة
+    بفجوة بعد أحد المستويين يكون الخروج عنده بسعر الافتتاح، وإذا لمست الهدف والوقف
+    معًا بعد افتتاح بينهما يُفترض الوقف (الأسوأ).
+
+    Returns:
+        List: (شمعة الدخول، شمعة الخروج، الاتجاه، الدخول، الهدف، الوقف، سعر الخروج، السبب)
+    """
+    entries = np.flatnonzero(buy | sell)
+    if not len(entries):
+        return []
+    directions = np.where(buy[entries], 1, -1)
+    entry_prices = close[entries]
+    targets, stops = calculate_tp_sl(entry_prices, directions, params['tp_pct'], params['sl_pct'])
+
+    trades = []
+    last = len(close) - 1
+    next_free = 0
+    for entry, direction, entry_price, target, stop in zip(
+            entries, directions, entry_prices, targets, stops):
+        if entry < next_free:
+            continue  # لا يزال هناك مركز مفتوح على هذا الرمز
+
+        # أفضل وأسوأ سعر داخل كل شمعة لاحقة حسب اتجاه المركز
+        favorable = high[entry + 1:] if direction == 1 else low[entry + 1:]
+        adverse = low[entry + 1:] if direction == 1 else high[entry + 1:]
+        hit_tp = tp_hit(favorable, target, direction)
+        hit_sl = sl_hit(adverse, stop, direction)
+        hit = hit_tp | hit_sl
+
+        if not hit.any():
+            trades.append((entry, last, direction, entry_price, target, stop, close[last], 'OPEN'))
+            break
+
+        offset = int(np.argmax(hit))
+        exit_bar = entry + 1 + offset
+        # سعر الافتتاح هو أول سعر في الشمعة: فجوة بعد الهدف تُغلق بالهدف حتى لو لمست الوقف لاحقًا
+        gap_reason = exit_reason(open_[exit_bar], target, stop)
+        if gap_reason:
+            reason, exit_price = gap_reason, open_[exit_bar]
+        elif hit_sl[offset]:
+            reason, exit_price = 'SL', stop
+        else:
+            reason, exit_price = 'TP', target
+        trades.append((entry, exit_bar, direction, entry_price, target, stop, exit_price, reason))
+        # الخروج يحدث داخل الشمعة، فإشارة عند إغلاقها يمكن أن تفتح مركزًا جديدًا
+        next_free = exit_bar
+    return trades
+
+
+def run_backtest(symbols: List[str], ohlc: Dict[str, np.ndarray],
+                 params: dict = None, times: np.ndarray = None) -> dict:
+    """
+    اختبار الاستراتيجية على مصفوفات (رموز × شموع) محاذاة يمينية كما تعيدها stack_frames
+
+    Returns:
+        dict: {'trades': DataFrame, 'equity': Series, 'stats': dict}
+    """
+    params = {**default_params(), **(params or {})}
+    buy, sell = compute_signals(ohlc, params)
+
+    rows = []
+    for row, symbol in enumerate(symbols):
+        for entry, exit_bar, direction, entry_price, target, stop, exit_price, reason in simulate_exits(
+                ohlc['open'][row], ohlc['high'][row], ohlc['low'][row], ohlc['close'][row],
+                buy[row], sell[row], params):
+            pnl = direction * (exit_price - entry_price) * params['qty']
+            rows.append((
+                symbol, 'CALL' if direction == 1 else 'PUT',
+                times[row, entry] if times is not None else entry, entry_price, target, stop,
+                times[row, exit_bar] if times is not None else exit_bar, exit_price, reason,
+                exit_bar - entry, pnl, direction * (exit_price / entry_price - 1) * 100
+            ))
+
+    trades = pd.DataFrame(rows, columns=TRADE_COLUMNS)
+    trades = trades.sort_values(['exit_time', 'symbol'], kind='stable').reset_index(drop=True)
+    equity = trades.set_index('exit_time')['pnl'].cumsum().rename('equity')
+    return {'trades': trades, 'equity': equity, 'stats': summarize(trades['pnl'].values)}
+
+
+def evaluate(ohlc: Dict[str, np.ndarray], params: dict,
+             rsi: np.ndarray = None, ma: np.ndarray = None) -> dict:
+    """مقاييس الأداء فقط دون بناء جدول الصفقات (للمُحسِّن)"""
+    buy, sell = compute_signals(ohlc, params, rsi, ma)
+    exits, pnl = [], []
+    for row in range(buy.shape[0]):
+        for _, exit_bar, direction, entry_price, _, _, exit_price, _ in simulate_exits(
+                ohlc['open'][row], ohlc['high'][row], ohlc['low'][row], ohlc['close'][row],
+                buy[row], sell[row], params):
+            exits.append(exit_bar)
+            pnl.append(direction * (exit_price - entry_price) * params['qty'])
+    # المصفوفات محاذاة يمينية، فترتيب شمعة الخروج يقارب الترتيب الزمني
+    order = np.argsort(exits, kind='stable')
+    return summarize(np.asarray(pnl)[order])
+
+
+def summarize(pnl: np.ndarray) -> dict:
+    """مقاييس الأداء من أرباح الصفقات بترتيب الخروج"""
+    pnl = np.asarray(pnl, dtype=float)
+    if not len(pnl):
+        return {'trades': 0, 'win_rate': 0.0, 'total_pnl': 0.0,
+                'profit_factor': 0.0, 'max_drawdown': 0.0, 'avg_pnl': 0.0}
+    equity = np.cumsum(pnl)
+    drawdown = np.maximum.accumulate(np.maximum(equity, 0)) - equity
+    gains, losses = pnl[pnl > 0].sum(), -pnl[pnl < 0].sum()
+    return {
+        'trades': len(pnl),
+        'win_rate': float((pnl > 0).mean()),
+        'total_pnl': float(equity[-1]),
+        'profit_factor': float(gains / losses) if losses else float('inf') if gains else 0.0,
+        'max_drawdown': float(drawdown.max()),
+        'avg_pnl': float(pnl.mean())
+    }
+
+
+def _bar_times(df: pd.DataFrame) -> np.ndarray:
+    """أوقات الشموع من عمود date (util.df) أو من الفهرس"""
+    values = df['date'] if 'date' in df.columns else df.index
+    return pd.to_datetime(values).values.astype('datetime64[ns]')
+
+
+class Backtester:
+    """اختبار تاريخي لاستراتيجية الانعكاس على إطارات بيانات القائمة"""
+
+    def __init__(self, params: Optional[dict] = None):
+        self.logger = Logger()
+        self.indicators = TechnicalIndicators()
+        self.params = {**default_params(), **(params or {})}
+
+    def run(self, frames: Dict[str, pd.DataFrame]) -> dict:
+        """
+        Args:
+            frames (dict): رمز -> إطار بيانات الشموع (open/high/low/close و date اختياريًا)
+
+        Returns:
+            dict: {'trades': DataFrame, 'equity': Series, 'stats': dict}
+        """
+        try:
+            symbols, ohlc = self.indicators.stack_frames(frames)
+            width = ohlc['close'].shape[-1]
+            times = np.full((len(symbols), width), np.datetime64('NaT'), dtype='datetime64[ns]')
+            for row, symbol in enumerate(symbols):
+                bar_times = _bar_times(frames[symbol])
+                times[row, width - len(bar_times):] = bar_times
+
+            result = run_backtest(symbols, ohlc, self.params, times)
+            stats = result['stats']
+            self.logger.info(
+                f"الاختبار التاريخي: {stats['trades']} صفقة، نسبة النجاح {stats['win_rate']:.0%}، "
+                f"الربح {stats['total_pnl']:.2f}"
+            )
+            return result
+        except Exception as e:
+            self.logger.error(f"خطأ في الاختبار التاريخي: {e}")
+            return {'trades': pd.DataFrame(columns=TRADE_COLUMNS),
+                    'equity': pd.Series(dtype=float, name='equity'),
+                    'stats': summarize([])}
@@ -0,0 +1,203 @@
+# backtest/optimizer.py
+"""
+مُحسِّن معاملات الاستراتيجية بالبحث الشبكي أو العشوائي على عدة أنوية
+
+مثال:
+    python -m backtest.optimizer bars.npz --rsi-period 10,14,21 --ma-period 20:100:10 \
+        --tp-pct 2:10:1 --sl-pct 1:5:0.5 --random 10000 --rank total_pnl,-max_drawdown
+"""
+import os
+import sys
+import argparse
+import itertools
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+from backtest.engine import default_params, evaluate
+from utils.indicators import TechnicalIndicators, batch_rsi, batch_ma
+from utils.bar_cache import get_bar_cache
+
+PARAMETERS = ['rsi_period', 'ma_period', 'rsi_oversold', 'rsi_overbought', 'tp_pct', 'sl_pct']
+COLUMNS = ('open', 'high', 'low', 'close')
+
+_bars = None  # مصفوفات العامل المرتبطة بالذاكرة المشتركة
+
+
+class SharedBars:
+    """مصفوفة (أعمدة × رموز × شموع) في ذاكرة مشتركة ينسخها المنشئ مرة واحدة"""
+
+    def __init__(self, ohlc: Dict[str, np.ndarray] = None, name: str = None, shape=None):
+        if ohlc is not None:
+            data = np.stack([np.asarray(ohlc[column], dtype=float) for column in COLUMNS])
+            self.shm = shared_memory.SharedMemory(create=True, size=data.nbytes)
+            self.shape = data.shape
+            self.array = np.ndarray(self.shape, dtype=float, buffer=self.shm.buf)
+            self.array[:] = data
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.shape = shape
+            self.array = np.ndarray(shape, dtype=float, buffer=self.shm.buf)
+            self.owner = False
+
+    @property
+    def spec(self):
+        """ما يكفي العامل للارتباط بالذاكرة (بدلاً من نسخ البيانات مع كل مهمة)"""
+        return self.shm.name, self.shape
+
+    def ohlc(self) -> Dict[str, np.ndarray]:
+        return dict(zip(COLUMNS, self.array))
+
+    def close(self):
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _init_worker(spec):
+    global _bars
+    _bars = SharedBars(name=spec[0], shape=spec[1])
+
+
+def _evaluate_group(task):
+    """
+    تقييم كل تجارب مجموعة تشترك في فترتي RSI و MA
+    (المؤشرات تُحسب مرة واحدة للمجموعة)
+    """
+    (rsi_period, ma_period), trials, base = task
+    ohlc = _bars.ohlc()
+    rsi = batch_rsi(ohlc['close'], rsi_period)
+    ma = batch_ma(ohlc['close'], ma_period)
+    results = []
+    for trial in trials:
+        params = {**base, **trial}
+        results.append({**trial, **evaluate(ohlc, params, rsi, ma)})
+    return results
+
+
+def parse_values(spec: str) -> list:
+    """'10,14,21' أو 'بداية:نهاية:خطوة' (النهاية شاملة)"""
+    if ':' in spec:
+        start, stop, step = (float(part) for part in spec.split(':'))
+        values = np.arange(start, stop + step / 2, step).round(6).tolist()
+    else:
+        values = [float(part) for part in spec.split(',') if part.strip()]
+    return [int(value) if float(value).is_integer() else value for value in values]
+
+
+def build_trials(space: Dict[str, list], samples: int = None, seed: int = None) -> List[dict]:
+    """كل تركيبات الشبكة، أو عينة عشوائية منها بحجم samples"""
+    names = list(space)
+    total = int(np.prod([len(space[name]) for name in names]))
+    if samples and samples < total:
+        rng = np.random.default_rng(seed)
+        picks = rng.choice(total, size=samples, replace=False)
+        indices = np.unravel_index(picks, [len(space[name]) for name in names])
+        combos = zip(*[np.asarray(space[name], dtype=object)[index]
+                       for name, index in zip(names, indices)])
+    else:
+        combos = itertools.product(*(space[name] for name in names))
+    return [dict(zip(names, combo)) for combo in combos]
+
+
+def optimize(ohlc: Dict[str, np.ndarray], space: Dict[str, list], rank: List[str] = None,
+             samples: int = None, seed: int = None, workers: int = None,
+             min_trades: int = 1, base: dict = None) -> pd.DataFrame:
+    """
+    تقييم التركيبات بالتوازي وترتيبها
+
+    Args:
+        ohlc (dict): مصفوفات (رموز × شموع) كما تعيدها stack_frames
+        space (dict): معامل -> القيم المطلوب تجربتها (المعاملات غير المذكورة من التكوين)
+        rank (list): مقاييس الترتيب تنازليًا، وبادئة '-' للترتيب تصاعديًا
+        min_trades (int): استبعاد التركيبات ذات الصفقات الأقل من هذا العدد
+
+    Returns:
+        pd.DataFrame: النتائج مرتبة (الأفضل أولاً)
+    """
+    base = {**default_params(), **(base or {})}
+    trials = build_trials(space, samples, seed)
+
+    # تجميع التجارب حسب فترتي المؤشرات ثم تقسيمها لمهام متقاربة الحجم
+    groups = {}
+    for trial in trials:
+        key = (int(trial.get('rsi_period', base['rsi_period'])),
+               int(trial.get('ma_period', base['ma_period'])))
+        groups.setdefault(key, []).append(trial)
+    workers = workers or os.cpu_count() or 1
+    chunk = max(1, -(-len(trials) // (workers * 8)))
+    tasks = [(key, group[i:i + chunk], base)
+             for key, group in groups.items() for i in range(0, len(group), chunk)]
+
+    bars = SharedBars(ohlc)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(bars.spec,)) as pool:
+            rows = [row for rows in pool.map(_evaluate_group, tasks) for row in rows]
+    finally:
+        bars.close()
+
+    results = pd.DataFrame(rows)
+    if results.empty:
+        return results
+    results = results[results['trades'] >= min_trades]
+    rank = rank or ['total_pnl']
+    return results.sort_values(
+        [metric.lstrip('-') for metric in rank],
+        ascending=[metric.startswith('-') for metric in rank]
+    ).reset_index(drop=True)
+
+
+def load_bars(path, bar_size: str = '15 mins') -> Dict[str, np.ndarray]:
+    """
+    تحميل الشموع من ملف npz (مصفوفات open/high/low/close بشكل رموز × شموع)
+    أو من مجلد ملفات CSV (ملف لكل رمز) أو من ذاكرة الشموع المحلية ('cache')
+    """
+    if str(path) == 'cache':
+        _, ohlc = TechnicalIndicators().stack_frames(get_bar_cache().load_frames(bar_size))
+        return ohlc
+    path = Path(path)
+    if path.is_dir():
+        frames = {csv_path.stem: pd.read_csv(csv_path) for csv_path in sorted(path.glob('*.csv'))}
+        _, ohlc = TechnicalIndicators().stack_frames(frames)
+        return ohlc
+    with np.load(path) as data:
+        return {column: np.atleast_2d(data[column]).astype(float) for column in COLUMNS}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="مُحسِّن معاملات استراتيجية الانعكاس")
+    parser.add_argument('bars', help="ملف npz أو مجلد ملفات CSV للشموع أو 'cache' للذاكرة المحلية")
+    parser.add_argument('--bar-size', default='15 mins', help="حجم الشمعة عند القراءة من الذاكرة المحلية")
+    for name in PARAMETERS:
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name,
+                            help="قيم مفصولة بفواصل أو بداية:نهاية:خطوة")
+    parser.add_argument('--random', type=int, help="عدد التركيبات العشوائية بدلاً من الشبكة كاملة")
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--workers', type=int, help="عدد العمليات (الافتراضي عدد الأنوية)")
+    parser.add_argument('--rank', default='total_pnl',
+                        help="مقاييس الترتيب مفصولة بفواصل، '-' للترتيب التصاعدي")
+    parser.add_argument('--min-trades', type=int, default=10)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--output', help="حفظ كل النتائج في ملف CSV")
+    args = parser.parse_args(argv)
+
+    space = {name: parse_values(getattr(args, name)) for name in PARAMETERS if getattr(args, name)}
+    if not space:
+        parser.error("يجب تحديد معامل واحد على الأقل للبحث")
+
+    results = optimize(load_bars(args.bars, args.bar_size), space, rank=args.rank.split(','),
+                       samples=args.random, seed=args.seed, workers=args.workers,
+                       min_trades=args.min_trades)
+    if args.output:
+        results.to_csv(args.output, index=False)
+    print(results.head(args.top).to_string())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,7 +4,7 @@ import sys
 import csv
 import configparser
 from pathlib import Path
-from spx_trader.utils.resource import resource_path
+from utils.resource import resource_path
 
 def resource_path(relative_path):
     """احصل على المسار الصحيح للملفات بعد تحزيم PyInstaller"""
@@ -18,16 +18,81 @@ BASE_DIR = Path(__file__).parent.parent
 DATA_DIR = Path(resource_path('data'))
 TRADES_DIR = DATA_DIR / 'trades'
 
-# إنشاء المجلدات إذا لم تكن موجودة
-DATA_DIR.mkdir(exist_ok=True)
-TRADES_DIR.mkdir(exist_ok=True)
+# القيم الافتراضية للإعدادات: مصدر واحد لملف config.ini الجديد ولـ SPXTrader.load_config
+# (expiry الفارغ يُستبدل بالجمعة القادمة عند التحميل)
+DEFAULTS = {
+    'qty': 1,
+    'tp_pct': 5,
+    'sl_pct': 3,
+    'expiry': '',
+    'rsi_period': 14,
+    'rsi_overbought': 70,
+    'rsi_oversold': 30,
+    'use_rsi': True,
+    'use_ma': True,
+    'ma_period': 50,
+    'scan_mode': 'async',
+    'scan_concurrency': 20,
+    'bar_store_mode': 'delta',
+    'batch_analysis': True,
+    'exit_mode': 'client',
+    'journal_fsync': 'interval',
+    'journal_fsync_ms': 200,
+    'chart_render_mode': 'incremental',
+    'chart_max_fps': 10,
+    'bar_cache': True,
+    'latency_tracking': True,
+    'metrics_port': 9108,
+    'profile_seconds': 30,
+    'profile_interval_ms': 10,
+    'control_port': 8765,
+    'client_id': 1,
+    'shard_workers': 0
+}
 
 class Config:
     def __init__(self):
         self.config_file = DATA_DIR / 'config.ini'
         self.watchlist_file = DATA_DIR / 'watchlist.ini'
         self.trades_log = TRADES_DIR / 'executed_trades.csv'
+        self._settings = {}
+        self._settings_mtime = None
+        self._files_ready = False
+
+    def ensure_files(self):
+        """إنشاء المجلدات والملفات الافتراضية عند أول استخدام (لا عند الاستيراد)"""
+        if self._files_ready:
+            return
+        DATA_DIR.mkdir(exist_ok=True)
+        TRADES_DIR.mkdir(exist_ok=True)
         self._ensure_files_exist()
+        self._files_ready = True
+
+    def get(self, key, default=None):
+        """قراءة قيمة من قسم DEFAULT في ملف الإعدادات مع تحويل نوعها"""
+        return self._read_settings().get(key, default)
+
+    def _read_settings(self):
+        """تحميل الإعدادات وإعادة قراءتها فقط عند تغير الملف"""
+        self.ensure_files()
+        try:
+            mtime = self.config_file.stat().st_mtime
+        except OSError:
+            return self._settings
+        if mtime != self._settings_mtime:
+            cfg = configparser.ConfigParser()
+            cfg.read(self.config_file, encoding='utf-8')
+            settings = {}
+            for key, value in cfg['DEFAULT'].items():
+                if value.lower() in ['true', 'false']:
+                    settings[key] = value.lower() == 'true'
+                elif value.replace('.', '', 1).isdigit():
+                    settings[key] = float(value) if '.' in value else int(value)
+                else:
+                    settings[key] = value
+            self._settings = settings
+            self._settings_mtime = mtime
+        return self._settings
         
     def _ensure_files_exist(self):
         if not self.config_file.exists():
@@ -41,18 +106,7 @@ class Config:
     
     def _create_default_config(self):
         config = configparser.ConfigParser()
-        config['DEFAULT'] = {
-            'qty': '1',
-            'tp_pct': '5',
-            'sl_pct': '3',
-            'expiry': '',
-            'rsi_period': '14',
-            'rsi_overbought': '70',
-            'rsi_oversold': '30',
-            'use_rsi': 'True',
-            'use_ma': 'True',
-            'ma_period': '50'
-        }
+        config['DEFAULT'] = {key: str(value) for key, value in DEFAULTS.items()}
         with open(self.config_file, 'w') as f:
             config.write(f)
     
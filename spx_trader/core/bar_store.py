@@ -0,0 +1,230 @@
+# core/bar_store.py
+import math
+import threading
+from datetime import datetime
+from typing import Optional
+import pandas as pd
+from ib_insync import BarData, util
+from utils.logger import Logger
+from core.contract_cache import ContractCache
+from core.scheduler import RequestScheduler, SCAN
+from utils.latency import LatencyTracker
+
+BAR_SECONDS = {
+    '1 min': 60, '2 mins': 120, '3 mins': 180, '5 mins': 300,
+    '10 mins': 600, '15 mins': 900, '20 mins': 1200, '30 mins': 1800,
+    '1 hour': 3600, '2 hours': 7200, '4 hours': 14400, '1 day': 86400
+}
+
+
+class BarStore:
+    """مخزن شموع لكل رمز يُملأ مرة واحدة ثم يُحدَّث بطلبات الفروقات فقط"""
+
+    def __init__(self, ib, scheduler: RequestScheduler, bar_size: str = '15 mins', duration: str = '2 D',
+                 what_to_show: str = 'TRADES', use_rth: bool = True,
+                 mode: str = 'delta', max_bars: int = 2000, cache=None,
+                 latency: LatencyTracker = None):
+        """
+        Args:
+            scheduler (RequestScheduler): مجدول المتداول (حدود المعدل وحلقة IB مشتركة بين الجميع)
+            mode (str): 'delta' لطلب الشموع بعد آخر طابع زمني فقط،
+                        'stream' للاشتراك عبر keepUpToDate
+            max_bars (int): الحد الأقصى للشموع المحفوظة لكل رمز
+            cache (BarCache): ذاكرة الشموع على القرص (وضع delta فقط) - البدء منها
+                              وطلب الفجوات والفرق الأخير فقط بدلاً من كامل المدة
+        """
+        self.ib = ib
+        self.logger = Logger()
+        self.bar_size = bar_size
+        self.duration = duration
+        self.what_to_show = what_to_show
+        self.use_rth = use_rth
+        self.mode = mode
+        self.max_bars = max_bars
+        self.bar_seconds = BAR_SECONDS.get(bar_size, 60)
+        self.cache = cache if mode == 'delta' else None
+        self.scheduler = scheduler
+        self.latency = latency or LatencyTracker(enabled=False)
+        self._keys = {}
+        self._bars = {}
+        self._lock = threading.Lock()
+
+    def update(self, symbol: str, contract) -> Optional[pd.DataFrame]:
+        """تحديث شموع الرمز وإرجاعها كإطار بيانات"""
+        try:
+            if self.cache and symbol not in self._bars:
+                key = self._series_key(symbol, contract)
+                for args in self._gap_requests(key):
+                    self._cache_bars(symbol, self._request(contract, args))
+                self._seed(symbol, key)
+
+            bars = self._bars.get(symbol)
+            if bars is None or self.mode == 'delta':
+                new_bars = self._request(contract, self._request_args(bars))
+                self._merge(symbol, new_bars)
+            return self.get_df(symbol)
+        except Exception as e:
+            self.logger.error(f"خطأ في تحديث شموع {symbol}: {e}")
+            return None
+
+    async def update_async(self, symbol: str, contract) -> Optional[pd.DataFrame]:
+        """النسخة غير المتزامنة من update"""
+        try:
+            if self.cache and symbol not in self._bars:
+                key = self._series_key(symbol, contract)
+                for args in self._gap_requests(key):
+                    self._cache_bars(symbol, await self._request_async(contract, args))
+                self._seed(symbol, key)
+
+            bars = self._bars.get(symbol)
+            if bars is None or self.mode == 'delta':
+                new_bars = await self._request_async(contract, self._request_args(bars))
+                self._merge(symbol, new_bars)
+            return self.get_df(symbol)
+        except Exception as e:
+            self.logger.error(f"خطأ في تحديث شموع {symbol}: {e}")
+            return None
+
+    def get_df(self, symbol: str) -> Optional[pd.DataFrame]:
+        """إرجاع الشموع المخزنة للرمز"""
+        with self._lock:
+            bars = self._bars.get(symbol)
+            if not bars:
+                return None
+            with self.latency.time('to_df', symbol):
+                return util.df(list(bars))
+
+    def clear(self, symbol: str = None):
+        """حذف مخزن رمز محدد أو جميع الرموز مع إلغاء الاشتراكات"""
+        with self._lock:
+            symbols = [symbol] if symbol else list(self._bars)
+            for sym in symbols:
+                bars = self._bars.pop(sym, None)
+                if self.mode == 'stream' and bars is not None:
+                    self.scheduler.call('message', self.ib.cancelHistoricalData, bars)
+
+    def _request(self, contract, args: dict):
+        """طلب بيانات تاريخية عبر المجدول (حدود IB ودمج الطلبات المتطابقة، والتنفيذ على حلقة IB)"""
+        return self.scheduler.call('historical', self.ib.reqHistoricalDataAsync, contract,
+                                   key=self._request_key(contract, args), priority=SCAN, **args)
+
+    async def _request_async(self, contract, args: dict):
+        return await self.scheduler.call_async('historical', self.ib.reqHistoricalDataAsync, contract,
+                                               key=self._request_key(contract, args), priority=SCAN, **args)
+
+    @staticmethod
+    def _request_key(contract, args: dict):
+        return ('historical', ContractCache.make_key(contract), tuple(sorted(args.items())))
+
+    def _series_key(self, symbol: str, contract) -> str:
+        key = self.cache.series_key(ContractCache.make_key(contract), self.bar_size,
+                                    self.what_to_show, self.use_rth)
+        self._keys[symbol] = key
+        return key
+
+    def _gap_requests(self, key: str) -> list:
+        """طلبات تغطي فقط الفجوات بين النطاقات المحفوظة ضمن المدة المطلوبة"""
+        window = pd.Timedelta(self._duration_seconds(), unit='s')
+        requests = []
+        for start, end in self.cache.gaps(key):
+            # حدود الفجوات بمنطقة السلسلة الزمنية (أو بلا منطقة)، فيُقارن بالوقت الحالي بنفسها
+            if end < pd.Timestamp.now(tz=end.tz) - window:
+                continue
+            # شمعة إضافية على كل جانب حتى يتداخل الرد مع النطاقين المحيطين
+            end = end + pd.Timedelta(self.bar_seconds, unit='s')
+            seconds = (end - start).total_seconds() + self.bar_seconds
+            args = self._request_args(None)
+            args['endDateTime'] = end.to_pydatetime()
+            args['durationStr'] = self._format_duration(seconds)
+            requests.append(args)
+        return requests
+
+    def _seed(self, symbol: str, key: str):
+        """بدء مخزن الرمز من آخر max_bars شمعة محفوظة على القرص"""
+        df = self.cache.load_df(key, self.max_bars)
+        if df is None:
+            return
+        last = pd.Timestamp(df['date'].iloc[-1])
+        age = (pd.Timestamp.now(last.tz) - last).total_seconds()
+        if age > self._duration_seconds():
+            return  # أقدم من المدة المطلوبة: طلب كامل المدة أقل من طلب الفرق
+        with self._lock:
+            self._bars[symbol] = [BarData(*row) for row in df[list(BarData.__dataclass_fields__)].itertuples(index=False)]
+        self.logger.info(f"📦 [{symbol}] تم تحميل {len(df)} شمعة من الذاكرة المحلية")
+
+    def _cache_bars(self, symbol: str, bars):
+        """حفظ الشموع المكتملة فقط (الأخيرة قد تكون قيد التكوين)"""
+        key = self._keys.get(symbol)
+        if self.cache and key and len(bars) > 1:
+            self.cache.append(key, bars[:-1], symbol=symbol, bar_size=self.bar_size,
+                              what_to_show=self.what_to_show)
+
+    def _duration_seconds(self) -> int:
+        """تحويل مدة الطلب (مثل '2 D') إلى ثوانٍ تقريبية"""
+        value, unit = self.duration.split()
+        return int(value) * {'S': 1, 'D': 86400, 'W': 7 * 86400, 'M': 31 * 86400, 'Y': 366 * 86400}[unit]
+
+    @staticmethod
+    def _format_duration(seconds: float) -> str:
+        if seconds <= 86400:
+            return f"{max(60, math.ceil(seconds))} S"
+        return f"{math.ceil(seconds / 86400)} D"
+
+    def _request_args(self, bars) -> dict:
+        """تحديد معاملات الطلب: تعبئة أولية أو فرق منذ آخر شمعة"""
+        args = {
+            'endDateTime': '',
+            'durationStr': self.duration,
+            'barSizeSetting': self.bar_size,
+            'whatToShow': self.what_to_show,
+            'useRTH': self.use_rth,
+            'formatDate': 1
+        }
+        if bars is None and self.mode == 'stream':
+            args['keepUpToDate'] = True
+        elif bars:
+            args['durationStr'] = self._delta_duration(bars[-1].date)
+        return args
+
+    def _delta_duration(self, last_date) -> str:
+        """مدة الطلب التي تغطي آخر شمعة (قد تكون غير مكتملة) وما بعدها"""
+        return self._format_duration(max(0, self._bar_age(last_date)) + self.bar_seconds)
+
+    @staticmethod
+    def _bar_age(last_date) -> float:
+        """الثواني منذ بداية الشمعة (الشموع اليومية تاريخ بلا وقت)"""
+        if isinstance(last_date, datetime):
+            now = datetime.now(last_date.tzinfo)
+        else:
+            last_date = datetime.combine(last_date, datetime.min.time())
+            now = datetime.now()
+        return (now - last_date).total_seconds()
+
+    def _merge(self, symbol: str, new_bars):
+        """دمج الشموع الجديدة: استبدال الشمعة الأخيرة المتغيرة وإلحاق ما بعدها"""
+        if not new_bars:
+            return
+        with self._lock:
+            bars = self._bars.get(symbol)
+            if bars is None or self.mode == 'stream':
+                # في وضع البث تتولى ib_insync تحديث القائمة نفسها
+                self._bars[symbol] = new_bars if self.mode == 'stream' else list(new_bars)
+                changed = self._bars[symbol]
+            else:
+                last_date = bars[-1].date
+                first_changed = len(bars)
+                for bar in new_bars:
+                    if bar.date == last_date:
+                        bars[-1] = bar
+                        first_changed = min(first_changed, len(bars) - 1)
+                    elif bar.date > last_date:
+                        bars.append(bar)
+                        last_date = bar.date
+
+                if len(bars) > self.max_bars:
+                    first_changed -= len(bars) - self.max_bars
+                    del bars[:len(bars) - self.max_bars]
+                # الشمعة السابقة للتغيير تربط النطاق الجديد بالمحفوظ على القرص
+                changed = bars[max(first_changed - 1, 0):]
+
+        self._cache_bars(symbol, changed)
@@ -0,0 +1,163 @@
+# core/contract_cache.py
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from typing import Optional
+from ib_insync import Contract, util
+from config import DATA_DIR
+from utils.logger import Logger
+from core.scheduler import RequestScheduler, SCAN
+
+
+class ContractCache:
+    """ذاكرة مؤقتة للعقود المؤهلة مشتركة بين المراقب والمتداولين ومحفوظة على القرص"""
+
+    def __init__(self, ib, scheduler: RequestScheduler, path=None, max_age_days: int = 30,
+                 flush_interval: float = 30):
+        """
+        Args:
+            scheduler (RequestScheduler): مجدول المتداول (حدود المعدل وحلقة IB مشتركة بين الجميع)
+            flush_interval (float): أقصى مدة (ثوانٍ) تبقى فيها العقود الجديدة في الذاكرة قبل
+                                    حفظها - الحفظ لا يتكرر مع كل عقد، بل مرة لكل دورة فحص
+                                    (flush) أو عند انقضاء هذه المدة
+        """
+        self.ib = ib
+        self.logger = Logger()
+        self.scheduler = scheduler
+        self.path = path or DATA_DIR / 'contracts.json'
+        self.max_age = max_age_days * 86400
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._flushed_at = time.monotonic()
+        self._entries = {}    # المفتاح -> {'fields': ..., 'cached_at': ...}
+        self._contracts = {}  # المفتاح -> كائن Contract مؤهل
+        self._load()
+
+    @staticmethod
+    def make_key(contract) -> str:
+        """بناء مفتاح العقد: الرمز/النوع/البورصة (+ الاستحقاق/الإضراب/الحق للخيارات)"""
+        parts = [contract.symbol, contract.secType, contract.exchange, contract.currency]
+        if contract.secType in ('OPT', 'FOP', 'FUT'):
+            parts += [
+                contract.lastTradeDateOrContractMonth,
+                f"{float(contract.strike or 0):g}",
+                contract.right
+            ]
+        return '|'.join(str(p or '') for p in parts)
+
+    def qualify(self, contract, priority: int = SCAN):
+        """إرجاع العقد المؤهل من الذاكرة أو تأهيله عبر IB عند عدم وجوده"""
+        key = self.make_key(contract)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+
+        # طلبات التأهيل المتزامنة لنفس العقد تُدمج في طلب واحد (ينفذه المجدول على حلقة IB)
+        qualified = self.scheduler.call('message', self.ib.qualifyContractsAsync, contract,
+                                        key=('qualify', key), priority=priority)
+        return self._store(key, qualified[0] if qualified else contract)
+
+    async def qualify_async(self, contract, priority: int = SCAN):
+        """النسخة غير المتزامنة من qualify"""
+        key = self.make_key(contract)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+
+        qualified = await self.scheduler.call_async('message', self.ib.qualifyContractsAsync, contract,
+                                                    key=('qualify', key), priority=priority)
+        return self._store(key, qualified[0] if qualified else contract)
+
+    def invalidate(self, contract=None):
+        """حذف عقد محدد أو مسح الذاكرة بالكامل"""
+        with self._lock:
+            if contract is None:
+                self._entries.clear()
+                self._contracts.clear()
+            else:
+                key = self.make_key(contract)
+                self._entries.pop(key, None)
+                self._contracts.pop(key, None)
+            self._dirty = True
+        self.flush()
+
+    def _get(self, key: str) -> Optional[Contract]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._is_stale(entry):
+                self._entries.pop(key, None)
+                self._contracts.pop(key, None)
+                return None
+            contract = self._contracts.get(key)
+            if contract is None:
+                contract = Contract.create(**entry['fields'])
+                self._contracts[key] = contract
+            return contract
+
+    def _store(self, key: str, contract) -> Optional[Contract]:
+        if not contract.conId:
+            self.logger.warning(f"تعذر تأهيل العقد: {key}")
+            return None
+
+        with self._lock:
+            self._entries[key] = {
+                'fields': util.dataclassNonDefaults(contract),
+                'cached_at': time.time()
+            }
+            self._contracts[key] = contract
+            self._dirty = True
+        if time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+        return contract
+
+    def flush(self):
+        """حفظ العقود على القرص إذا تغيرت منذ آخر حفظ"""
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                entries = dict(self._entries)
+                self._dirty = False
+            self._flushed_at = time.monotonic()
+            if not self._save(entries):
+                with self._lock:
+                    self._dirty = True  # إعادة المحاولة في الحفظ التالي
+
+    def _is_stale(self, entry: dict) -> bool:
+        """العقد منتهي إذا انقضى تاريخ استحقاقه أو تجاوز العمر الأقصى"""
+        expiry = entry['fields'].get('lastTradeDateOrContractMonth', '')[:8]
+        today = datetime.now().strftime('%Y%m%d')
+        if expiry and expiry < today[:len(expiry)]:
+            return True
+        return time.time() - entry['cached_at'] > self.max_age
+
+    def _load(self):
+        """تحميل العقود المحفوظة مع استبعاد المنتهية"""
+        try:
+            if not os.path.exists(self.path):
+                return
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            self._entries = {k: v for k, v in entries.items() if not self._is_stale(v)}
+        except Exception as e:
+            self.logger.error(f"خطأ في تحميل ذاكرة العقود: {e}")
+            self._entries = {}
+
+    def _save(self, entries: dict) -> bool:
+        """حفظ ذري لملف العقود (ملف مؤقت لكل عملية حتى لا تتداخل كتابة عمليتين)"""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            return True
+        except Exception as e:
+            self.logger.error(f"خطأ في حفظ ذاكرة العقود: {e}")
+            return False
@@ -0,0 +1,196 @@
+# core/engine.py
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from utils.logger import Logger
+from utils.profiler import get_profiler
+from core.monitoring import MarketMonitor
+
+TRADE_FIELDS = ('action', 'quantity', 'entry', 'target', 'stop', 'status',
+                'exit_price', 'exit_time', 'exit_reason', 'type')
+
+
+def rss_bytes() -> Optional[int]:
+    """الذاكرة المقيمة الحالية للعملية (بايت)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+class HeadlessEngine:
+    """
+    تشغيل SPXTrader و MarketMonitor كخدمة بلا واجهة (لا Tk ولا matplotlib)
+
+    رسائل المراقبة تُكتب في السجل وتُحفظ آخرها للعرض، والتحكم عبر واجهة HTTP
+    محلية صغيرة:
+        GET  /status /trades /events /metrics
+        POST /start /stop /profile /shutdown
+
+    مع shard_workers > 1 يُوزع الفحص على عمليات منفصلة عبر ShardCoordinator.
+    """
+
+    def __init__(self, trader, max_events: int = 500, fake: bool = False):
+        self.trader = trader
+        self.logger = Logger()
+        self.events_log = logging.getLogger('spx.engine')
+        workers = int(trader.config.get('shard_workers', 0))
+        if workers > 1:
+            from core.sharding import ShardCoordinator
+            self.monitor = ShardCoordinator(trader, workers, fake=fake)
+        else:
+            self.monitor = MarketMonitor(trader)
+        self.events = deque(maxlen=max_events)
+        self.started_at = time.time()
+        self._server = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def log(self, message: str):
+        """دالة السجل الممررة للمراقب (بديل سجل أحداث الواجهة)"""
+        self.events.append((datetime.now().strftime('%Y-%m-%d %H:%M:%S'), message))
+        self.events_log.info(message)
+
+    def start(self) -> bool:
+        """بدء المراقبة (الاتصال بـ IB ثم خيوط الفحص ومتابعة الصفقات)"""
+        with self._lock:
+            if self.monitor.running:
+                return True
+            started = self.monitor.start_monitoring(self.log)
+            self.trader.running = bool(started)
+            return bool(started)
+
+    def stop(self):
+        """إيقاف المراقبة مع إبقاء الخدمة تعمل"""
+        with self._lock:
+            if self.monitor.running:
+                self.monitor.stop_monitoring()
+                self.log("🛑 توقف مراقبة قائمة المتابعة")
+            self.trader.running = False
+
+    def status(self) -> dict:
+        ib = self.trader.__dict__.get('ib')  # دون تحميل ib_insync إن لم يُستخدم بعد
+        open_trades = [t for t in self.trader.current_trades.values() if t.get('status') == 'open']
+        return {
+            'running': self.monitor.running,
+            'connected': bool(ib and ib.isConnected()),
+            'pid': os.getpid(),
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'rss_bytes': rss_bytes(),
+            'watchlist': len(self.monitor.watchlist),
+            'last_scan_seconds': self.monitor.last_scan_seconds,
+            'open_trades': len(open_trades),
+            'total_trades': len(self.trader.current_trades),
+            'profiling': get_profiler().running,
+            'shards': self.monitor.status() if hasattr(self.monitor, 'status') else None
+        }
+
+    def trades(self) -> dict:
+        """الصفقات الجارية بحقول قابلة للتحويل إلى JSON"""
+        result = {}
+        for trade_id, info in list(self.trader.current_trades.items()):
+            row = {key: info.get(key) for key in TRADE_FIELDS if key in info}
+            contract = info.get('contract')
+            row['symbol'] = getattr(contract, 'localSymbol', '') or getattr(contract, 'symbol', '')
+            result[trade_id] = row
+        return result
+
+    def serve(self, port: int, host: str = '127.0.0.1'):
+        """تشغيل واجهة التحكم في خيط خلفي"""
+        engine = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                if path == '/status':
+                    self._json(engine.status())
+                elif path == '/trades':
+                    self._json(engine.trades())
+                elif path == '/events':
+                    self._json([{'time': t, 'message': m} for t, m in engine.events])
+                elif path == '/metrics':
+                    self._text(engine.trader.latency.prometheus_text())
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                path = self.path.split('?')[0]
+                if path == '/start':
+                    self._json({'running': engine.start()})
+                elif path == '/stop':
+                    engine.stop()
+                    self._json({'running': False})
+                elif path == '/profile':
+                    seconds = float(engine.trader.config.get('profile_seconds', 30))
+                    self._json({'profiling': get_profiler().toggle(seconds)})
+                elif path == '/shutdown':
+                    self._json({'shutdown': True})
+                    engine.request_shutdown()
+                else:
+                    self.send_error(404)
+
+            def _json(self, data):
+                self._text(json.dumps(data, ensure_ascii=False, default=str), 'application/json')
+
+            def _text(self, body: str, content_type: str = 'text/plain; version=0.0.4'):
+                payload = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', f"{content_type}; charset=utf-8")
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='control-http', daemon=True).start()
+        self.logger.info(f"واجهة التحكم على http://{host}:{self._server.server_port}")
+        return self._server
+
+    def request_shutdown(self):
+        self._stopped.set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """انتظار طلب الإيقاف (/shutdown أو إشارة)"""
+        return self._stopped.wait(timeout)
+
+    def shutdown(self):
+        """إيقاف المراقبة وقطع الاتصال وإغلاق واجهة التحكم"""
+        self._stopped.set()
+        self.stop()
+        if 'ib' in self.trader.__dict__:
+            self.trader.disconnect_ibkr()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.logger.info("تم إيقاف المحرك")
+
+
+def setup_file_logging(path, level: int = logging.INFO):
+    """توجيه السجل إلى ملف دوري بدلاً من نافذة الواجهة"""
+    from logging.handlers import RotatingFileHandler
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handler = RotatingFileHandler(path, maxBytes=10 * 1024 * 1024, backupCount=5, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(level)
+    if sys.stderr and sys.stderr.isatty():
+        root.addHandler(logging.StreamHandler())
+    return handler
@@ -0,0 +1,105 @@
+# core/ib_loop.py
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable
+from utils.logger import Logger
+
+
+class IBLoop:
+    """
+    خيط واحد يملك حلقة أحداث asyncio لاتصال IB
+
+    ib_insync يربط الاتصال بحلقة الخيط الذي اتصل منه، وتصل الأحداث (الأسعار
+    وتنفيذ الأوامر) على تلك الحلقة فقط، وطرقه المتزامنة تشغّل حلقة الخيط الحالي
+    (فتفشل داخل حلقة تعمل أو في خيط بلا حلقة). لذلك يتم الاتصال والفحص وكل طلبات IB
+    على هذا الخيط، وبقية الخيوط ترسل إليه عبر run و call و spawn.
+    """
+
+    def __init__(self, name: str = 'ib-loop'):
+        self.name = name
+        self.logger = Logger()
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """حلقة الأحداث (يبدأ الخيط عند أول استخدام)"""
+        with self._lock:
+            if self._loop is None:
+                ready = threading.Event()
+                self._thread = threading.Thread(target=self._run, args=(ready,), name=self.name, daemon=True)
+                self._thread.start()
+                ready.wait()
+            return self._loop
+
+    def in_loop(self) -> bool:
+        """هل الخيط الحالي هو خيط الحلقة"""
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def run(self, awaitable: Awaitable, timeout: float = None):
+        """تشغيل coroutine على الحلقة وانتظار نتيجتها (من خيط آخر فقط)"""
+        if self.in_loop():
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise RuntimeError("لا يمكن انتظار نتيجة على خيط حلقة IB نفسه؛ استخدم await أو spawn")
+        return asyncio.run_coroutine_threadsafe(self._await(awaitable), self.loop).result(timeout)
+
+    def call(self, func: Callable, *args, **kwargs):
+        """تنفيذ دالة غير حاجبة على خيط الحلقة وإرجاع نتيجتها"""
+        if self.in_loop():
+            return func(*args, **kwargs)
+        future = Future()
+
+        def invoke():
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+        self.loop.call_soon_threadsafe(invoke)
+        return future.result()
+
+    def spawn(self, awaitable: Awaitable) -> Future:
+        """جدولة coroutine على الحلقة دون انتظار (من أي خيط)"""
+        return asyncio.run_coroutine_threadsafe(self._await(awaitable), self.loop)
+
+    def call_later(self, delay: float, func: Callable, *args) -> Future:
+        """
+        تنفيذ دالة على خيط الحلقة بعد delay ثانية (من أي خيط)
+
+        Returns:
+            Future: إلغاؤه (cancel) يلغي التنفيذ إذا لم يبدأ بعد
+        """
+        async def later():
+            await asyncio.sleep(delay)
+            func(*args)
+
+        return self.spawn(later())
+
+    def stop(self):
+        """إيقاف الحلقة وخيطها"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            if thread is not threading.current_thread():
+                thread.join(5)
+
+    @staticmethod
+    async def _await(awaitable: Awaitable):
+        return await awaitable
+
+    def _run(self, ready: threading.Event):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        ready.set()
+        try:
+            loop.run_forever()
+        except Exception as e:
+            self.logger.error(f"خطأ في حلقة أحداث IB: {e}")
+        finally:
+            loop.close()
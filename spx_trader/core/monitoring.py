@@ -1,20 +1,37 @@
 # core/monitoring.py
 import time
+import asyncio
 import threading
 import pandas as pd
-from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
 from ib_insync import *
 from config import config
 from utils.logger import Logger
 from utils.indicators import TechnicalIndicators
+from utils.streaming_indicators import IndicatorState
+from core.bar_store import BarStore
+from core.subscriptions import MarketDataSubscriptions
+from core.scheduler import EXIT
+from utils.journal import get_journal
+from utils.bar_cache import get_bar_cache
 from trading.stocks import StockTrader
 from trading.options import OptionTrader
+from trading.exits import exit_reason
 
 class MarketMonitor:
-    def __init__(self, trader):
+    def __init__(self, trader, on_signal: Optional[Callable[[str, str, float], None]] = None):
+        """
+        Args:
+            on_signal: تُستدعى (symbol, signal, price) بدلاً من إرسال الأمر مباشرة
+                       (عمال التقسيم يمررون الإشارات للمنسق الذي يملك الأوامر)
+        """
         self.trader = trader
+        self.on_signal = on_signal
         self.ib = trader.ib
+        self.ib_loop = trader.ib_loop
         self.logger = Logger()
+        self.latency = trader.latency
         self.indicators = TechnicalIndicators()
         self.stock_trader = StockTrader(trader)
         self.option_trader = OptionTrader(trader)
@@ -22,28 +39,69 @@ class MarketMonitor:
         self.watchlist = []
         self.bar_size = '15 mins'
         self.duration = '2 D'
-
-    def start_monitoring(self, log_func: Callable):
-        """بدء عملية مراقبة السوق"""
+        self.bar_store = BarStore(self.ib, trader.scheduler, self.bar_size, self.duration,
+                                  mode=trader.config.get('bar_store_mode', 'delta'),
+                                  cache=get_bar_cache() if trader.config.get('bar_cache', True) else None,
+                                  latency=trader.latency)
+        self.scan_mode = trader.config.get('scan_mode', 'async')
+        self.scan_concurrency = int(trader.config.get('scan_concurrency', 20))
+        self.batch_analysis = trader.config.get('batch_analysis', True)
+        self.scan_interval = 60
+        self.last_scan_seconds = None
+        # حالات المؤشرات التزايدية لكل رمز: للتحليل رمزًا برمز فقط (batch_analysis=False أو
+        # scan_mode='sync')؛ التحليل الجماعي الافتراضي يعيد الحساب متجهًا على آخر الشموع
+        self.indicator_states = {}
+        self.subscriptions = None
+        self.pending_orders = []
+        self._orders_lock = threading.Lock()
+        # آخر شمعة أُرسلت إشارتها لكل رمز: الشمعة قيد التكوين تُحلَّل في كل دورة فحص،
+        # والإشارة نفسها لا تُرسل مرة أخرى حتى شمعة جديدة
+        self._signaled_bars = {}
+        self._orders = None       # خيوط إرسال الأوامر خارج حلقة IB
+        self._scan_future = None  # دورة الفحص غير المتزامن على حلقة IB
+
+    def start_monitoring(self, log_func: Callable, watchlist: list = None,
+                         scan: bool = True, monitor_trades: bool = True):
+        """
+        بدء عملية مراقبة السوق
+
+        Args:
+            watchlist (list): رموز محددة بدلاً من ملف القائمة (جزء العامل في وضع التقسيم)
+            scan (bool): تشغيل فحص القائمة
+            monitor_trades (bool): تشغيل متابعة الصفقات المفتوحة (المنسق فقط في وضع التقسيم)
+        """
         if not self._connect_ibkr():
             log_func("⚠️ فشل بدء المراقبة - لا يوجد اتصال")
             return False
 
         self.running = True
-        self.watchlist = self._load_watchlist()
+        self.watchlist = self._load_watchlist() if watchlist is None else list(watchlist)
+        port = int(self.trader.config.get('metrics_port', 9108))
+        if port:
+            self.latency.serve(port)
         
-        # بدء خيوط المراقبة
-        threading.Thread(
-            target=self._monitor_watchlist,
-            args=(log_func,),
-            daemon=True
-        ).start()
-
-        threading.Thread(
-            target=self._monitor_open_trades,
-            args=(log_func,),
-            daemon=True
-        ).start()
+        # الإشارات تُجمع في الفحص، والأوامر تُرسل من خيوط مستقلة (مسار الأوامر المتزامن
+        # ينتظر ردود IB، فلا يُستدعى من حلقة IB التي تنتظرها)
+        if self.on_signal is None:
+            self._orders = ThreadPoolExecutor(max_workers=4, thread_name_prefix='orders')
+            self._open_journal()
+
+        # بدء خيوط المراقبة (الفحص غير المتزامن يعمل على حلقة IB نفسها)
+        if scan and self.scan_mode == 'async':
+            self._scan_future = self.ib_loop.spawn(self._scan_forever_async(log_func))
+        elif scan:
+            threading.Thread(
+                target=self._monitor_watchlist,
+                args=(log_func,),
+                daemon=True
+            ).start()
+
+        if monitor_trades:
+            threading.Thread(
+                target=self._monitor_open_trades,
+                args=(log_func,),
+                daemon=True
+            ).start()
 
         log_func("🚀 بدء مراقبة السوق والصفقات...")
         return True
@@ -51,12 +109,41 @@ class MarketMonitor:
     def stop_monitoring(self):
         """إيقاف عملية المراقبة"""
         self.running = False
+        if self._scan_future:
+            self._scan_future.cancel()
+            self._scan_future = None
+        if self._orders:
+            self._orders.shutdown(wait=False, cancel_futures=True)
+            self._orders = None
+        self.bar_store.clear()
+        self.trader.contract_cache.flush()
+        self.indicator_states.clear()
+        if self.subscriptions:
+            self.subscriptions.close()
+            self.subscriptions = None
+        with self._orders_lock:
+            orders, self.pending_orders = self.pending_orders, []
+        for order in orders:
+            order.cancel()
+
+    def _open_journal(self):
+        """
+        إنشاء سجل الصفقات الآن خارج حلقة IB: فتح SQLite واستيراد CSV لمرة واحدة لا يحدثان
+        داخل معالج التنفيذ على الحلقة عند أول صفقة، فيبقى get_journal هناك مجرد قراءة
+        """
+        try:
+            get_journal()
+        except Exception as e:
+            self.logger.error(f"خطأ في فتح سجل الصفقات: {e}")
 
     def _connect_ibkr(self) -> bool:
         """إجراء اتصال بـ IBKR"""
         try:
             if not self.ib.isConnected():
-                self.ib.connect('127.0.0.1', 7497, clientId=1, timeout=15)
+                # الاتصال من حلقة IB: أحداث الاتصال تصل على الحلقة التي اتصلت
+                self.ib_loop.run(self.ib.connectAsync('127.0.0.1', 7497,
+                                                      clientId=int(self.trader.config.get('client_id', 1)),
+                                                      timeout=15))
             return True
         except Exception as e:
             self.logger.error(f"فشل الاتصال بـ IBKR: {e}")
@@ -65,6 +152,7 @@ class MarketMonitor:
     def _load_watchlist(self) -> list:
         """تحميل قائمة المتابعة من الملف"""
         try:
+            config.ensure_files()
             with open(config.watchlist_file, 'r', encoding='utf-8') as f:
                 return [line.strip() for line in f if line.strip()]
         except Exception as e:
@@ -83,107 +171,225 @@ class MarketMonitor:
                     if not contract:
                         continue
 
-                    bars = self._get_historical_data(contract)
-                    if bars is None:
+                    df = self._get_historical_data(symbol, contract)
+                    if df is None:
                         continue
 
-                    df = util.df(bars)
                     self._analyze_symbol(symbol, df, log_func)
 
-                time.sleep(60)  # فحص كل دقيقة
+                self.trader.contract_cache.flush()
+                time.sleep(self.scan_interval)  # فحص كل دقيقة
 
             except Exception as e:
                 self.logger.error(f"خطأ في مراقبة القائمة: {e}")
                 time.sleep(30)
 
-    def _create_contract(self, symbol: str):
-        """إنشاء عقد التداول المناسب"""
+    async def _scan_forever_async(self, log_func: Callable):
+        """تكرار دورات الفحص المتزامن (على حلقة IB عبر واجهات *Async) مع مراعاة فترة الفحص"""
+        while self.running:
+            try:
+                started = time.perf_counter()
+                await self._scan_watchlist_async(log_func)
+                # العقود الجديدة تُحفظ مرة واحدة لكل دورة (بعد الفحص فلا تؤخر طلباته)
+                self.trader.contract_cache.flush()
+                elapsed = time.perf_counter() - started
+                self.last_scan_seconds = elapsed
+
+                log_func(f"⏱ دورة الفحص: {len(self.watchlist)} رمز خلال {elapsed:.2f} ث")
+                self.logger.info(self.trader.scheduler.summary())
+                if elapsed > self.scan_interval:
+                    self.logger.warning(
+                        f"زمن دورة الفحص ({elapsed:.1f} ث) تجاوز فترة الفحص ({self.scan_interval} ث)"
+                    )
+
+                await asyncio.sleep(max(0, self.scan_interval - elapsed))
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"خطأ في مراقبة القائمة: {e}")
+                await asyncio.sleep(30)
+
+    async def _scan_watchlist_async(self, log_func: Callable):
+        """فحص جميع رموز القائمة بالتوازي مع حد أقصى للطلبات المتزامنة"""
+        semaphore = asyncio.Semaphore(max(1, self.scan_concurrency))
+
+        async def scan(symbol):
+            async with semaphore:
+                if not self.running:
+                    return None
+                df = await self._scan_symbol_async(symbol)
+                if df is not None and not self.batch_analysis:
+                    self._analyze_symbol(symbol, df, log_func)
+                return df
+
+        frames = await asyncio.gather(*(scan(symbol) for symbol in self.watchlist))
+        if self.batch_analysis and self.running:
+            self._analyze_watchlist(dict(zip(self.watchlist, frames)), log_func)
+
+    async def _scan_symbol_async(self, symbol: str) -> Optional[pd.DataFrame]:
+        """جلب بيانات رمز واحد"""
         try:
-            if symbol == 'SPX':
-                contract = Index(symbol, 'CBOE')
-            else:
-                contract = Stock(symbol, 'SMART', 'USD')
-            
-            self.ib.qualifyContracts(contract)
-            return contract
+            contract = await self._create_contract_async(symbol)
+            if not contract:
+                return None
+
+            return await self._get_historical_data_async(symbol, contract)
+        except Exception as e:
+            self.logger.error(f"خطأ في فحص {symbol}: {e}")
+            return None
+
+    def _build_contract(self, symbol: str):
+        """بناء عقد غير مؤهل للرمز"""
+        if symbol == 'SPX':
+            return Index(symbol, 'CBOE')
+        return Stock(symbol, 'SMART', 'USD')
+
+    async def _create_contract_async(self, symbol: str):
+        """إنشاء عقد التداول وتأهيله بشكل غير متزامن"""
+        try:
+            with self.latency.time('contract', symbol):
+                return await self.trader.contract_cache.qualify_async(self._build_contract(symbol))
         except Exception as e:
             self.logger.error(f"خطأ في إنشاء عقد لـ {symbol}: {e}")
             return None
 
-    def _get_historical_data(self, contract) -> Optional[pd.DataFrame]:
-        """الحصول على البيانات التاريخية"""
+    async def _get_historical_data_async(self, symbol: str, contract) -> Optional[pd.DataFrame]:
+        """الحصول على البيانات التاريخية من مخزن الشموع بشكل غير متزامن"""
+        with self.latency.time('historical', symbol):
+            return await self.bar_store.update_async(symbol, contract)
+
+    def _create_contract(self, symbol: str):
+        """إنشاء عقد التداول المناسب"""
         try:
-            bars = self.ib.reqHistoricalData(
-                contract,
-                endDateTime='',
-                durationStr=self.duration,
-                barSizeSetting=self.bar_size,
-                whatToShow='TRADES',
-                useRTH=True,
-                formatDate=1
-            )
-            return bars
+            with self.latency.time('contract', symbol):
+                return self.trader.contract_cache.qualify(self._build_contract(symbol))
         except Exception as e:
-            self.logger.error(f"خطأ في جلب البيانات: {e}")
+            self.logger.error(f"خطأ في إنشاء عقد لـ {symbol}: {e}")
             return None
 
+    def _get_historical_data(self, symbol: str, contract) -> Optional[pd.DataFrame]:
+        """الحصول على البيانات التاريخية من مخزن الشموع (تعبئة أولية ثم فروقات فقط)"""
+        with self.latency.time('historical', symbol):
+            return self.bar_store.update(symbol, contract)
+
     def _analyze_symbol(self, symbol: str, df: pd.DataFrame, log_func: Callable):
         """تحليل البيانات وإرسال إشارات التداول"""
         try:
-            signal = self.indicators.identify_reversal_candles(df)
-            if not signal:
-                return
+            with self.latency.time('signal', symbol):
+                signal = self.indicators.identify_reversal_candles(
+                    df, self._latest_indicators(symbol, df))
+            if signal:
+                self._dispatch_signal(symbol, signal, df['close'].iloc[-1], log_func, df['date'].iloc[-1])
+
+        except Exception as e:
+            self.logger.error(f"خطأ في تحليل {symbol}: {e}")
 
-            price = df['close'].iloc[-1]
-            log_func(f"📊 [{symbol}] إشارة {signal} عند السعر {price:.2f}")
+    def _analyze_watchlist(self, frames: dict, log_func: Callable):
+        """
+        تحليل جميع رموز القائمة دفعة واحدة على مصفوفة (رموز × شموع)
 
+        لا يستخدم IndicatorState: إعادة حساب نوافذ lookback متجهة لكل القائمة أسرع من
+        تحديث حالة كل رمز في حلقة بايثون، والنتائج متطابقة (tests/test_indicators.py).
+        """
+        try:
+            # النوافذ المتحركة محدودة، لذا تكفي آخر الشموع لنتائج مطابقة
+            rsi_period = int(self.trader.config.get('rsi_period', 14))
+            ma_period = int(self.trader.config.get('ma_period', 50))
+            lookback = max(ma_period, rsi_period + 1, 20) + 2
+            with self.latency.time('signal_batch'):
+                symbols, ohlc = self.indicators.stack_frames(frames, lookback)
+                results = self.indicators.analyze_batch(symbols, ohlc, rsi_period, ma_period)
+            for symbol, result in results.items():
+                if result['signal']:
+                    self._dispatch_signal(symbol, result['signal'], result['close'], log_func,
+                                          frames[symbol]['date'].iloc[-1])
+        except Exception as e:
+            self.logger.error(f"خطأ في التحليل الجماعي للقائمة: {e}")
+
+    def _dispatch_signal(self, symbol: str, signal: str, price: float, log_func: Callable, bar=None):
+        """
+        تمرير الإشارة لخيوط الأوامر دون انتظار (يُستدعى من حلقة IB أو خيط الفحص أو المنسق)
+
+        Args:
+            bar: طابع الشمعة التي ظهرت عليها الإشارة - إشارة واحدة لكل (رمز، شمعة)؛
+                 المنسق يمرر إشارات العمال بدونه (العمال أزالوا تكرارها)
+        """
+        if bar is not None:
+            with self._orders_lock:
+                if self._signaled_bars.get(symbol) == bar:
+                    return
+                self._signaled_bars[symbol] = bar
+        if self.on_signal:
+            self.on_signal(symbol, signal, float(price))
+            return
+        log_func(f"📊 [{symbol}] إشارة {signal} عند السعر {price:.2f}")
+        orders = self._orders
+        if orders is None or not self.running:
+            return
+        try:
+            orders.submit(self._place_signal_order, symbol, signal, float(price), log_func)
+        except RuntimeError:
+            pass  # أُوقفت المراقبة أثناء الإرسال
+
+    def _place_signal_order(self, symbol: str, signal: str, price: float, log_func: Callable):
+        """إرسال أمر التداول المناسب للإشارة (في خيط أوامر خارج حلقة IB)"""
+        try:
+            action = 'CALL' if signal == 'reversal_up' else 'PUT'
             if symbol == 'SPX':
-                self.option_trader.place_order(
-                    signal.split('_')[1].upper(),
-                    price,
-                    log_func
-                )
+                order = self.option_trader.place_order(action, price, log_func)
             else:
-                self.stock_trader.place_order(
-                    symbol,
-                    signal.split('_')[1].upper(),
-                    price,
-                    log_func
-                )
-
+                order = self.stock_trader.place_order(symbol, action, price)
+
+            # الأوامر تعود فورًا؛ نحتفظ بالمقابض الجارية لإلغائها عند الإيقاف
+            with self._orders_lock:
+                self.pending_orders = [o for o in self.pending_orders if not o.done]
+                if order:
+                    self.pending_orders.append(order)
+            if order and not self.running:
+                order.cancel()  # أُوقفت المراقبة أثناء إرسال الأمر
         except Exception as e:
-            self.logger.error(f"خطأ في تحليل {symbol}: {e}")
+            self.logger.error(f"خطأ في إرسال أمر {symbol}: {e}")
+
+    def _latest_indicators(self, symbol: str, df: pd.DataFrame) -> dict:
+        """تحديث مؤشرات الرمز تزايديًا بالشموع المغلقة الجديدة فقط"""
+        state = self.indicator_states.get(symbol)
+        values = state.sync(df) if state else None
+        if values is None:
+            # أول تشغيل أو تغير في تاريخ الشموع: إعادة بناء الحالة
+            state = IndicatorState()
+            self.indicator_states[symbol] = state
+            values = state.sync(df)
+        return values
 
     def _monitor_open_trades(self, log_func: Callable):
-        """مراقبة الصفقات المفتوحة وتنفيذ TP/SL"""
-        while self.running and self.trader.current_trades:
+        """مراقبة الصفقات المفتوحة: TP/SL يُقيَّم من أحداث الأسعار فور وصولها"""
+        self.subscriptions = MarketDataSubscriptions(
+            self.ib,
+            lambda trade_id, trade_info, price: self._check_trade_conditions(
+                trade_id, trade_info, price, log_func),
+            scheduler=self.trader.scheduler
+        )
+        while self.running:
             try:
-                for trade_id, trade_info in list(self.trader.current_trades.items()):
-                    if not self.running:
-                        break
-
-                    if trade_info['status'] != 'open':
-                        continue
-
-                    self._check_trade_conditions(trade_id, trade_info, log_func)
-
-                time.sleep(10)  # فحص كل 10 ثواني
+                # التقاط الصفقات الجديدة وإلغاء اشتراكات المغلقة فقط - لا استطلاع للأسعار هنا
+                self.subscriptions.sync(self.trader.current_trades)
+                time.sleep(1)
 
             except Exception as e:
                 self.logger.error(f"خطأ في متابعة الصفقات: {e}")
                 time.sleep(30)
 
-    def _check_trade_conditions(self, trade_id: str, trade_info: dict, log_func: Callable):
-        """فحص شروط إغلاق الصفقة"""
+    def _check_trade_conditions(self, trade_id: str, trade_info: dict, current_price: float, log_func: Callable):
+        """فحص شروط إغلاق الصفقة عند وصول سعر جديد"""
         try:
-            ticker = self.ib.reqMktData(trade_info['contract'], '', False, False)
-            self.ib.sleep(1)
-            
-            if not hasattr(ticker, 'last') or ticker.last != ticker.last:
+            if trade_info['status'] != 'open':
                 return
-
-            current_price = ticker.last
+            started = time.perf_counter()
             self._process_tp_sl(trade_id, trade_info, current_price, log_func)
+            # مسار الخروج كاملاً (من وصول السعر حتى إرسال أمر الإغلاق) يُقاس منفصلاً عن الفحص
+            stage = 'exit' if trade_info['status'] == 'closed' else 'exit_check'
+            self.latency.record(stage, time.perf_counter() - started, trade_info['contract'].symbol)
 
         except Exception as e:
             self.logger.error(f"خطأ في فحص الصفقة {trade_id}: {e}")
@@ -191,24 +397,28 @@ class MarketMonitor:
     def _process_tp_sl(self, trade_id: str, trade_info: dict, current_price: float, log_func: Callable):
         """معالجة أوامر جني الربح ووقف الخسارة"""
         try:
-            if current_price >= trade_info['target']:
-                self._close_trade(trade_id, trade_info, current_price, 'TP', log_func)
-            elif current_price <= trade_info['stop']:
-                self._close_trade(trade_id, trade_info, current_price, 'SL', log_func)
+            reason = exit_reason(current_price, trade_info['target'], trade_info['stop'])
+            if reason:
+                self._close_trade(trade_id, trade_info, current_price, reason, log_func)
 
         except Exception as e:
             self.logger.error(f"خطأ في معالجة TP/SL: {e}")
 
     def _close_trade(self, trade_id: str, trade_info: dict, price: float, reason: str, log_func: Callable):
-        """إغلاق الصفقة"""
+        """إغلاق الصفقة (من معالج الأسعار على حلقة IB، فيُرسل أمر الإغلاق دون انتظار)"""
         try:
-            close_order = MarketOrder('SELL', trade_info['quantity'])
-            self.ib.placeOrder(trade_info['contract'], close_order)
+            close_action = 'BUY' if trade_info.get('action') == 'SELL' else 'SELL'
+            close_order = MarketOrder(close_action, trade_info['quantity'])
+            self.trader.scheduler.submit('message', self.ib.placeOrder, trade_info['contract'],
+                                         close_order, priority=EXIT)
             
+            if self.subscriptions:
+                self.subscriptions.unsubscribe(trade_id)
             trade_info.update({
                 'status': 'closed',
                 'exit_price': price,
-                'exit_time': pd.Timestamp.now()
+                'exit_time': pd.Timestamp.now(),
+                'exit_reason': reason
             })
 
             log_func(f"✅ {reason} تم تنفيذ {trade_id} عند السعر {price:.2f}")
@@ -219,5 +429,7 @@ class MarketMonitor:
 
     def _update_trade_in_db(self, trade_id: str, trade_info: dict):
         """تحديث سجل الصفقات"""
-        # سيتم تنفيذ هذه الوظيفة في ملف إدارة البيانات
-        pass
+        try:
+            get_journal().record_close(trade_id, trade_info)
+        except Exception as e:
+            self.logger.error(f"خطأ في تحديث سجل الصفقة {trade_id}: {e}")
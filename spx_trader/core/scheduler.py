@@ -0,0 +1,253 @@
+# core/scheduler.py
+import time
+import heapq
+import asyncio
+import inspect
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable
+from utils.logger import Logger
+from core.ib_loop import IBLoop
+
+# الأولويات (الأصغر أولاً): أوامر الخروج ثم الدخول ثم الفحص
+EXIT, ENTRY, SCAN = 0, 1, 2
+
+# حدود IB: 50 رسالة/ث، و60 طلب بيانات تاريخية لكل 10 دقائق.
+# السعة + المعدل × النافذة لا تتجاوز الحد في أي نافذة زمنية
+LIMITS = {
+    'messages': (40.0, 10),        # (توكن/ث، السعة)
+    'historical': (54 / 600, 6)
+}
+
+# الدلاء التي يستهلكها كل نوع طلب
+KINDS = {
+    'message': ('messages',),
+    'historical': ('historical', 'messages')
+}
+
+
+class TokenBucket:
+    """دلو توكنات بمعدل ثابت وسعة محدودة"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def wait_time(self) -> float:
+        """الوقت حتى توفر توكن (0 إذا كان متاحًا الآن)"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class RequestScheduler:
+    """
+    جدولة طلبات IB من جميع الخيوط: حدود معدل بدلاء التوكنات، وأولوية للخروج
+    على الدخول على الفحص، ودمج الطلبات المتطابقة الجارية في طلب واحد.
+
+    مع loop تُنفَّذ الطلبات على خيط حلقة IB مهما كان الخيط المستدعي، والدوال غير
+    المتزامنة (*Async) تُنتظر هناك؛ بدونها (الاختبارات) تُنفَّذ في الخيط المستدعي.
+    """
+
+    def __init__(self, limits: dict = None, loop: IBLoop = None):
+        self.logger = Logger()
+        self.loop = loop
+        self.buckets = {name: TokenBucket(rate, capacity)
+                        for name, (rate, capacity) in (limits or LIMITS).items()}
+        self._cond = threading.Condition()
+        self._waiting = {name: [] for name in self.buckets}
+        self._seq = itertools.count()
+        self._inflight = {}
+        self._stats = {name: {'requests': 0, 'wait_total': 0.0, 'wait_max': 0.0,
+                              'waits': deque(maxlen=1000)} for name in self.buckets}
+        self.dedup_hits = 0
+
+    def acquire(self, kind: str = 'message', priority: int = SCAN):
+        """انتظار (بحجب الخيط) دور الطلب في كل دلو يستهلكه"""
+        for name in KINDS[kind]:
+            entry = self._enqueue(name, priority)
+            try:
+                with self._cond:
+                    while True:
+                        wait = self._try_take(name, entry)
+                        if wait == 0:
+                            break
+                        self._cond.wait(wait)
+            finally:
+                self._withdraw(name, entry)
+
+    async def acquire_async(self, kind: str = 'message', priority: int = SCAN):
+        """النسخة غير المتزامنة من acquire (لا تحجب حلقة الأحداث)"""
+        for name in KINDS[kind]:
+            entry = self._enqueue(name, priority)
+            try:
+                while True:
+                    with self._cond:
+                        wait = self._try_take(name, entry)
+                    if wait == 0:
+                        break
+                    await asyncio.sleep(min(wait, 0.05))
+            finally:
+                # الإلغاء (مثل إيقاف الفحص) أو الخطأ أثناء الانتظار لا يترك المدخل رأسًا للطابور
+                self._withdraw(name, entry)
+
+    def call(self, kind: str, func: Callable, *args, key=None, priority: int = SCAN, **kwargs):
+        """
+        تنفيذ طلب بعد الحصول على دوره (يحجب الخيط المستدعي حتى النتيجة)
+
+        لا يُستدعى من حلقة IB (معالجات الأحداث): الانتظار هناك يوقف الحلقة التي تحمل الرد؛
+        استخدم call_async أو submit.
+
+        Args:
+            func: دالة IB متزامنة أو غير متزامنة (يُفضَّل *Async مع حلقة IB)
+            key: مفتاح الطلب؛ الطلبات المتطابقة أثناء تنفيذ الأول تنتظر نتيجته بدلاً من إرسالها
+        """
+        if self.loop is not None and self.loop.in_loop():
+            raise RuntimeError("طلب حاجب من حلقة IB؛ استخدم call_async أو submit")
+        future, owner = self._claim(key)
+        if not owner:
+            return future.result()
+        try:
+            self.acquire(kind, priority)
+            result = self._execute(func, args, kwargs)
+        except BaseException as e:
+            self._resolve(key, future, error=e)
+            raise
+        self._resolve(key, future, result=result)
+        return result
+
+    async def call_async(self, kind: str, func: Callable, *args, key=None, priority: int = SCAN, **kwargs):
+        """النسخة غير المتزامنة من call (على حلقة IB؛ func متزامنة أو تعيد كائنًا قابلاً للانتظار)"""
+        future, owner = self._claim(key)
+        if not owner:
+            return await asyncio.wrap_future(future)
+        try:
+            await self.acquire_async(kind, priority)
+            result = func(*args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+        except BaseException as e:
+            self._resolve(key, future, error=e)
+            raise
+        self._resolve(key, future, result=result)
+        return result
+
+    def submit(self, kind: str, func: Callable, *args, key=None, priority: int = SCAN, **kwargs) -> Future:
+        """جدولة طلب دون انتظار نتيجته (آمن من حلقة IB ومن أي خيط؛ الفشل يُسجَّل)"""
+        if self.loop is not None:
+            future = self.loop.spawn(self.call_async(kind, func, *args, key=key, priority=priority, **kwargs))
+        else:
+            future = Future()
+            try:
+                future.set_result(self.call(kind, func, *args, key=key, priority=priority, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+        name = getattr(func, '__name__', kind)
+        future.add_done_callback(lambda done: self._log_failure(name, done))
+        return future
+
+    def _log_failure(self, name: str, future: Future):
+        if not future.cancelled() and future.exception() is not None:
+            self.logger.error(f"فشل طلب IB ({name}): {future.exception()}")
+
+    def _execute(self, func: Callable, args: tuple, kwargs: dict):
+        """تنفيذ الطلب على خيط حلقة IB وانتظار نتيجته"""
+        if asyncio.iscoroutinefunction(func):
+            if self.loop is None:
+                return asyncio.run(func(*args, **kwargs))
+            return self.loop.run(func(*args, **kwargs))
+        if self.loop is None:
+            return func(*args, **kwargs)
+        return self.loop.call(func, *args, **kwargs)
+
+    def metrics(self) -> dict:
+        """عمق الطوابير وأزمنة الانتظار لكل دلو"""
+        with self._cond:
+            metrics = {'inflight': len(self._inflight), 'dedup_hits': self.dedup_hits}
+            for name, stats in self._stats.items():
+                waits = sorted(stats['waits'])
+                metrics[name] = {
+                    'queue_depth': len(self._waiting[name]),
+                    'requests': stats['requests'],
+                    'tokens': round(self.buckets[name].tokens, 2),
+                    'wait_avg': stats['wait_total'] / stats['requests'] if stats['requests'] else 0.0,
+                    'wait_p95': waits[int(len(waits) * 0.95)] if waits else 0.0,
+                    'wait_max': stats['wait_max']
+                }
+            return metrics
+
+    def summary(self) -> str:
+        """ملخص المقاييس في سطر واحد للسجل"""
+        metrics = self.metrics()
+        parts = [
+            f"{name}: طابور {metrics[name]['queue_depth']}، انتظار p95 {metrics[name]['wait_p95']:.2f} ث"
+            for name in self.buckets
+        ]
+        return f"جدولة IB - {' | '.join(parts)} | مدمجة {metrics['dedup_hits']}"
+
+    def _enqueue(self, name: str, priority: int) -> list:
+        entry = [priority, next(self._seq), time.monotonic()]
+        with self._cond:
+            heapq.heappush(self._waiting[name], entry)
+        return entry
+
+    def _withdraw(self, name: str, entry: list):
+        """إزالة مدخل لم يُمنح توكنًا من الطابور (لا شيء إذا مُنح)"""
+        with self._cond:
+            queue = self._waiting[name]
+            for index, waiting in enumerate(queue):
+                if waiting is entry:
+                    queue.pop(index)
+                    heapq.heapify(queue)
+                    self._cond.notify_all()
+                    break
+
+    def _try_take(self, name: str, entry: list) -> float:
+        """منح توكن لرأس الطابور فقط (يُستدعى مع القفل)؛ يعيد 0 عند المنح أو مدة الانتظار"""
+        queue = self._waiting[name]
+        if queue[0] is not entry:
+            return 0.05
+        wait = self.buckets[name].wait_time()
+        if wait:
+            return wait
+
+        self.buckets[name].take()
+        heapq.heappop(queue)
+        waited = time.monotonic() - entry[2]
+        stats = self._stats[name]
+        stats['requests'] += 1
+        stats['wait_total'] += waited
+        stats['wait_max'] = max(stats['wait_max'], waited)
+        stats['waits'].append(waited)
+        self._cond.notify_all()
+        return 0
+
+    def _claim(self, key):
+        """تسجيل الطلب كجارٍ، أو إرجاع الطلب المطابق الجاري"""
+        if key is None:
+            return None, True
+        with self._cond:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.dedup_hits += 1
+                return future, False
+            future = self._inflight[key] = Future()
+            return future, True
+
+    def _resolve(self, key, future, result=None, error=None):
+        if key is None:
+            return
+        with self._cond:
+            self._inflight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
@@ -0,0 +1,258 @@
+# core/sharding.py
+import time
+import threading
+import multiprocessing
+from multiprocessing.connection import wait
+from typing import Callable, Dict, List
+from utils.logger import Logger
+from core.monitoring import MarketMonitor
+
+# أنواع الرسائل من العمال إلى المنسق
+SIGNAL = 'signal'
+LOG = 'log'
+SCAN = 'scan'
+
+# إعادة تشغيل العامل: تأخير مضاعف بعد كل توقف سريع متتالٍ، والتوقف عن المحاولة بعد MAX_FAILURES
+RESTART_DELAY = 5
+RESTART_MAX_DELAY = 300
+MAX_FAILURES = 5
+STABLE_SECONDS = 60  # العامل الذي عمل أطول من ذلك يعيد عداد التوقفات المتتالية
+
+
+def partition(symbols: List[str], shards: int) -> List[List[str]]:
+    """توزيع الرموز على shards جزءًا بالتناوب (أحجام متقاربة وترتيب ثابت لنفس القائمة)"""
+    return [symbols[index::shards] for index in range(shards)]
+
+
+def _worker_main(shard: int, symbols: List[str], config: dict, connection, stop_flag, fake: bool):
+    """
+    نقطة دخول عملية العامل: اتصال IB خاص بمعرّف عميل مستقل وفحص جزئه من القائمة فقط
+
+    الإشارات ورسائل السجل وأزمنة الدورات تُرسل إلى المنسق عبر connection، ولا يرسل
+    العامل أي أمر ولا يتابع الصفقات.
+    """
+    from config import DATA_DIR
+    from core.trader import SPXTrader
+    from core.contract_cache import ContractCache
+
+    send_lock = threading.Lock()
+    parent = multiprocessing.parent_process()
+
+    def send(*message):
+        with send_lock:
+            connection.send(message)
+
+    def log(message: str):
+        send(LOG, shard, message)
+
+    trader = SPXTrader()
+    trader.config = config
+    if fake:
+        from sim.fake_ib import FakeIB
+        trader.ib = FakeIB()
+    # ملف عقود لكل جزء: العمال لا يتشاركون ملف contracts.json، والتقسيم ثابت لنفس القائمة
+    trader.contract_cache = ContractCache(trader.ib, trader.scheduler,
+                                          path=DATA_DIR / f'contracts_shard{shard}.json')
+
+    monitor = MarketMonitor(
+        trader,
+        on_signal=lambda symbol, signal, price: send(SIGNAL, shard, symbol, signal, price)
+    )
+    if not monitor.start_monitoring(log, watchlist=symbols, monitor_trades=False):
+        log(f"⚠️ فشل بدء العامل {shard} (معرّف العميل {config['client_id']})")
+        raise SystemExit(1)  # رمز خروج غير صفري يراه المشرف
+
+    last_scan = None
+    try:
+        # التوقف بطلب المنسق أو بانتهاء عمليته (لا يبقى عامل يتيم متصلاً بـ IB)
+        while not stop_flag.value and (parent is None or parent.is_alive()):
+            if monitor.last_scan_seconds is not None and monitor.last_scan_seconds != last_scan:
+                last_scan = monitor.last_scan_seconds
+                send(SCAN, shard, last_scan, len(symbols))
+            time.sleep(0.5)
+    except (BrokenPipeError, EOFError, OSError):
+        pass
+    finally:
+        monitor.stop_monitoring()
+        trader.disconnect_ibkr()
+
+
+class ShardCoordinator:
+    """
+    فحص قائمة المتابعة موزعًا على عدة عمليات، لكل منها اتصال IB بمعرّف عميل مستقل
+
+    المنسق يقسم watchlist.ini ويشغل العمال (client_id + 1 ... client_id + N)، ويستقبل
+    إشاراتهم في خيط واحد ويمررها لخيوط أوامر المراقب، فتُرسل الأوامر عبر اتصاله هو
+    (client_id وحلقة IB الخاصة به)، وتبقى الأوامر و current_trades ومتابعة TP/SL في
+    عملية واحدة. العامل المتوقف يُعاد تشغيله بتأخير متزايد، ويُترك بعد MAX_FAILURES
+    توقفات سريعة متتالية.
+
+    لكل عامل قناة (Pipe) خاصة وعلم إيقاف مشترك بلا أقفال، فتوقف عامل فجأة لا يعطل
+    بقية العمال ولا إيقاف المنسق.
+    """
+
+    def __init__(self, trader, workers: int, fake: bool = False, start_method: str = 'spawn'):
+        self.trader = trader
+        self.logger = Logger()
+        self.workers = max(1, int(workers))
+        self.fake = fake
+        self.monitor = MarketMonitor(trader)
+        self._context = multiprocessing.get_context(start_method)
+        self._stop_flag = None
+        self._stopped = threading.Event()
+        self._connections = {}  # قناة القراءة -> رقم الجزء
+        self._processes: Dict[int, multiprocessing.Process] = {}
+        self._shards: List[List[str]] = []
+        self._stats: Dict[int, dict] = {}
+        self._spawned_at: Dict[int, float] = {}
+        self._restart_at: Dict[int, float] = {}
+        self._threads = []
+        self._log_func = None
+
+    @property
+    def running(self) -> bool:
+        return self.monitor.running
+
+    @property
+    def watchlist(self) -> list:
+        return self.monitor.watchlist
+
+    @property
+    def last_scan_seconds(self):
+        """أبطأ جزء في آخر دورة (زمن دورة القائمة كاملة)"""
+        times = [stats['last_scan_seconds'] for stats in self._stats.values()
+                 if stats['last_scan_seconds'] is not None]
+        return max(times) if len(times) == len(self._shards) and times else None
+
+    def start_monitoring(self, log_func: Callable) -> bool:
+        """الاتصال ومتابعة الصفقات في المنسق ثم تشغيل عمال الفحص"""
+        if not self.monitor.start_monitoring(log_func, scan=False):
+            return False
+
+        self._log_func = log_func
+        symbols = self.monitor.watchlist
+        self._shards = [shard for shard in partition(symbols, min(self.workers, len(symbols) or 1)) if shard]
+        self._stats = {index: self._new_stats(shard) for index, shard in enumerate(self._shards)}
+        self._restart_at.clear()
+        self._stop_flag = self._context.RawValue('b', 0)
+        self._stopped.clear()
+        for index in range(len(self._shards)):
+            self._spawn(index)
+
+        self._threads = [
+            threading.Thread(target=self._consume, name='shard-signals', daemon=True),
+            threading.Thread(target=self._supervise, name='shard-supervisor', daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+        log_func(f"🧩 فحص موزع: {len(symbols)} رمز على {len(self._shards)} عامل")
+        return True
+
+    def stop_monitoring(self, timeout: float = 10):
+        """إيقاف العمال ثم متابعة الصفقات في المنسق"""
+        self.monitor.stop_monitoring()
+        self._stopped.set()
+        if self._stop_flag is not None:
+            self._stop_flag.value = 1
+        deadline = time.monotonic() + timeout
+        for process in self._processes.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+                process.join(1)
+        for thread in self._threads:
+            thread.join(1)
+        for connection in self._connections:
+            connection.close()
+        self._connections.clear()
+        self._processes.clear()
+        self._threads = []
+
+    def status(self) -> Dict[int, dict]:
+        """حالة كل عامل: عدد الرموز وزمن آخر دورة والإشارات وإعادات التشغيل والتوقفات المتتالية"""
+        return {index: {**stats, 'client_id': self._client_id(index),
+                        'alive': bool(self._processes.get(index) and self._processes[index].is_alive())}
+                for index, stats in self._stats.items()}
+
+    @staticmethod
+    def _new_stats(shard: List[str]) -> dict:
+        return {'symbols': len(shard), 'last_scan_seconds': None, 'scans': 0, 'signals': 0,
+                'restarts': 0, 'failures': 0, 'gave_up': False}
+
+    def _client_id(self, index: int) -> int:
+        return int(self.trader.config.get('client_id', 1)) + 1 + index
+
+    def _spawn(self, index: int):
+        config = {**self.trader.config, 'client_id': self._client_id(index), 'metrics_port': 0}
+        reader, writer = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, self._shards[index], config, writer, self._stop_flag, self.fake),
+            name=f"scan-shard-{index}",
+            daemon=True
+        )
+        process.start()
+        writer.close()  # يبقى طرف الكتابة مع العامل فقط، فتصل EOF عند توقفه
+        self._connections[reader] = index
+        self._processes[index] = process
+        self._spawned_at[index] = time.monotonic()
+
+    def _consume(self):
+        """استقبال رسائل العمال؛ الإشارات تُمرر لخيوط أوامر المراقب دون انتظار"""
+        while not self._stopped.is_set():
+            ready = wait(list(self._connections), timeout=0.5)
+            for connection in ready:
+                try:
+                    message = connection.recv()
+                except (EOFError, OSError):
+                    # توقف العامل؛ المشرف يعيد تشغيله بقناة جديدة
+                    self._connections.pop(connection, None)
+                    connection.close()
+                    continue
+                self._handle(message)
+
+    def _handle(self, message: tuple):
+        try:
+            kind, shard = message[0], message[1]
+            if kind == SIGNAL:
+                _, _, symbol, signal, price = message
+                self._stats[shard]['signals'] += 1
+                if self.running:
+                    self.monitor._dispatch_signal(symbol, signal, price, self._log_func)
+            elif kind == SCAN:
+                self._stats[shard]['last_scan_seconds'] = message[2]
+                self._stats[shard]['scans'] += 1
+            elif kind == LOG:
+                self._log_func(f"[{shard}] {message[2]}")
+        except Exception as e:
+            self.logger.error(f"خطأ في معالجة رسالة العامل: {e}")
+
+    def _supervise(self, interval: float = 1):
+        """إعادة تشغيل العامل الذي توقف بشكل غير متوقع"""
+        while not self._stopped.wait(interval):
+            self._check_workers(time.monotonic())
+
+    def _check_workers(self, now: float):
+        """جدولة إعادة تشغيل العمال المتوقفين بتأخير مضاعف، وتنفيذ ما حان موعده"""
+        for index, process in list(self._processes.items()):
+            stats = self._stats[index]
+            if process.is_alive() or not self.running or stats['gave_up']:
+                continue
+
+            if index not in self._restart_at:
+                # توقف جديد: التوقف السريع بعد التشغيل يُعد فشلاً متتاليًا
+                quick = now - self._spawned_at.get(index, now) < STABLE_SECONDS
+                stats['failures'] = stats['failures'] + 1 if quick else 1
+                if stats['failures'] >= MAX_FAILURES:
+                    stats['gave_up'] = True
+                    self._log_func(f"⛔ توقف العامل {index} {stats['failures']} مرات متتالية "
+                                   f"(رمز الخروج {process.exitcode}) - لن يُعاد تشغيله")
+                    continue
+                delay = min(RESTART_MAX_DELAY, RESTART_DELAY * 2 ** (stats['failures'] - 1))
+                self._restart_at[index] = now + delay
+                self._log_func(f"⚠️ توقف العامل {index} (رمز الخروج {process.exitcode}) - "
+                               f"إعادة التشغيل بعد {delay} ث")
+            elif now >= self._restart_at[index]:
+                del self._restart_at[index]
+                stats['restarts'] += 1
+                self._spawn(index)
@@ -0,0 +1,95 @@
+# core/subscriptions.py
+import threading
+from typing import Callable
+from utils.logger import Logger
+from core.scheduler import RequestScheduler, EXIT
+
+
+class MarketDataSubscriptions:
+    """إدارة اشتراكات بيانات السوق للصفقات المفتوحة: اشتراك واحد لكل عقد يُلغى عند إغلاق آخر صفقة عليه"""
+
+    def __init__(self, ib, on_price: Callable[[str, dict, float], None], scheduler: RequestScheduler):
+        """
+        Args:
+            on_price (Callable): تُستدعى (trade_id, trade_info, price) مع كل تحديث سعر (على حلقة IB)
+            scheduler (RequestScheduler): مجدول المتداول
+        """
+        self.ib = ib
+        self.logger = Logger()
+        self.on_price = on_price
+        self.scheduler = scheduler
+        self._tickers = {}    # conId -> Ticker
+        self._trades = {}     # conId -> {trade_id: trade_info}
+        self._trade_keys = {} # trade_id -> conId
+        self._lock = threading.Lock()
+        self.ib.pendingTickersEvent += self._on_pending_tickers
+
+    def subscribe(self, trade_id: str, trade_info: dict):
+        """ربط الصفقة بمؤشر أسعار متدفق لعقدها"""
+        contract = trade_info['contract']
+        with self._lock:
+            if trade_id in self._trade_keys:
+                return
+            key = contract.conId
+            if key not in self._tickers:
+                self._tickers[key] = self.scheduler.call(
+                    'message', self.ib.reqMktData, contract, '', False, False, priority=EXIT)
+                self._trades[key] = {}
+            self._trades[key][trade_id] = trade_info
+            self._trade_keys[trade_id] = key
+
+    def unsubscribe(self, trade_id: str):
+        """فك ارتباط الصفقة وإلغاء الاشتراك إذا لم تبق صفقات على العقد (دون انتظار، آمن من حلقة IB)"""
+        with self._lock:
+            key = self._trade_keys.pop(trade_id, None)
+            if key is None:
+                return
+            trades = self._trades.get(key, {})
+            trades.pop(trade_id, None)
+            if not trades:
+                self._trades.pop(key, None)
+                ticker = self._tickers.pop(key, None)
+                if ticker is not None:
+                    self.scheduler.submit('message', self.ib.cancelMktData, ticker.contract, priority=EXIT)
+
+    def sync(self, current_trades: dict):
+        """مطابقة الاشتراكات مع الصفقات المفتوحة حاليًا"""
+        open_ids = set()
+        for trade_id, trade_info in list(current_trades.items()):
+            # صفقات الأقواس يتولى الوسيط خروجها فلا تحتاج اشتراكًا
+            if trade_info.get('status') == 'open' and trade_info.get('exit_mode') != 'bracket':
+                open_ids.add(trade_id)
+                self.subscribe(trade_id, trade_info)
+
+        for trade_id in set(self._trade_keys) - open_ids:
+            self.unsubscribe(trade_id)
+
+    def close(self):
+        """إلغاء جميع الاشتراكات وفصل معالج الأحداث"""
+        self.ib.pendingTickersEvent -= self._on_pending_tickers
+        for trade_id in list(self._trade_keys):
+            self.unsubscribe(trade_id)
+
+    @property
+    def active_count(self) -> int:
+        return len(self._tickers)
+
+    def _on_pending_tickers(self, tickers):
+        """تقييم الصفقات المرتبطة فور وصول الأسعار"""
+        for ticker in tickers:
+            with self._lock:
+                trades = list(self._trades.get(ticker.contract.conId, {}).items())
+            if not trades:
+                continue
+
+            price = ticker.last
+            if price != price:
+                price = ticker.marketPrice()
+            if price != price:
+                continue
+
+            for trade_id, trade_info in trades:
+                try:
+                    self.on_price(trade_id, trade_info, price)
+                except Exception as e:
+                    self.logger.error(f"خطأ في معالجة سعر الصفقة {trade_id}: {e}")
@@ -3,54 +3,76 @@ import os
 import time
 import threading
 import configparser
+from collections import deque
 from datetime import datetime, timedelta
-from tkinter import messagebox
-from ib_insync import *
+from functools import cached_property
+from typing import Callable, Optional
 
-# تصحيح الاستيرادات لتكون مطلقة
-from spx_trader.trading.stocks import StockTrader
-from spx_trader.trading.options import OptionTrader
-from spx_trader.utils.logger import Logger
-from spx_trader.utils.indicators import TechnicalIndicators
-from spx_trader.core.connection import IBConnection
-from spx_trader.core.monitoring import TradeMonitor
-from spx_trader.config import config as app_config  # <<< مفقود سابقًا وتم تصحيحه
+# الاستيرادات المجردة (core.* و utils.*) كباقي المشروع: المسار المطلق spx_trader.* يحمّل نسخة ثانية من كل وحدة
+# ib_insync و pandas و numpy تُحمَّل عند أول استخدام فقط (خصائص مؤجلة أدناه) لتسريع ظهور النافذة
+from utils.logger import Logger
+from core.ib_loop import IBLoop
+from core.scheduler import RequestScheduler
+from utils.latency import LatencyTracker
+from config import config as app_config, DEFAULTS as CONFIG_DEFAULTS
 
 
 class SPXTrader:
-    def __init__(self):
-        self.ib = IB()
+    def __init__(self, on_error: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            on_error: تُستدعى برسالة الخطأ لعرضها (مثل messagebox في الواجهة)؛
+                      بدونها تُسجَّل الأخطاء في السجل فقط (الوضع بلا واجهة)
+        """
+        self._on_error = on_error
+        self._unreported_errors = deque(maxlen=20)  # أخطاء قبل تثبيت معالج العرض (تُعرض عند تثبيته)
         self.running = False
         self.current_trades = {}
         self.connection_status = False
         self.logger = Logger()
-        self.indicators = TechnicalIndicators()
         self.config = self.load_config()
-
-        self.stock_trader = StockTrader(self)
-        self.option_trader = OptionTrader(self)
+        # الاتصال وكل طلبات IB وأحداثها على خيط حلقة واحد يملكه المتداول
+        self.ib_loop = IBLoop()
+        self.scheduler = RequestScheduler(loop=self.ib_loop)
+        self.latency = LatencyTracker(enabled=self.config.get('latency_tracking', True))
+
+    @cached_property
+    def ib(self):
+        from ib_insync import IB
+        return IB()
+
+    @cached_property
+    def indicators(self):
+        from utils.indicators import TechnicalIndicators
+        return TechnicalIndicators()
+
+    @cached_property
+    def contract_cache(self):
+        from core.contract_cache import ContractCache
+        return ContractCache(self.ib, self.scheduler)
+
+    @cached_property
+    def stock_trader(self):
+        from trading.stocks import StockTrader
+        return StockTrader(self)
+
+    @cached_property
+    def option_trader(self):
+        from trading.options import OptionTrader
+        return OptionTrader(self)
 
     def load_config(self):
-        default_config = {
-            'qty': 1,
-            'tp_pct': 5,
-            'sl_pct': 3,
-            'expiry': self.get_next_friday(),
-            'rsi_period': 14,
-            'rsi_overbought': 70,
-            'rsi_oversold': 30,
-            'use_rsi': True,
-            'use_ma': True,
-            'ma_period': 50
-        }
+        default_config = dict(CONFIG_DEFAULTS, expiry=self.get_next_friday())
 
+        app_config.ensure_files()
         if os.path.exists(app_config.config_file):
             try:
                 cfg = configparser.ConfigParser()
                 cfg.read(app_config.config_file)
                 if 'DEFAULT' in cfg:
                     for key in default_config:
-                        if key in cfg['DEFAULT']:
+                        # القيمة الفارغة (مثل expiry في الملف الافتراضي) تبقي القيمة الافتراضية
+                        if cfg['DEFAULT'].get(key):
                             value = cfg['DEFAULT'][key]
                             if value.lower() in ['true', 'false']:
                                 default_config[key] = value.lower() == 'true'
@@ -59,18 +81,46 @@ class SPXTrader:
                             else:
                                 default_config[key] = value
             except Exception as e:
-                messagebox.showerror("\u062e\u0637\u0623", f"\u0641\u0634\u0644 \u062a\u062d\u0645\u064a\u0644 \u0627\u0644\u0625\u0639\u062f\u0627\u062f\u0627\u062a: {e}")
+                self._report_error(f"\u0641\u0634\u0644 \u062a\u062d\u0645\u064a\u0644 \u0627\u0644\u0625\u0639\u062f\u0627\u062f\u0627\u062a: {e}")
 
         return default_config
 
     def save_config(self):
         try:
+            app_config.ensure_files()
             cfg = configparser.ConfigParser()
             cfg['DEFAULT'] = {k: str(v) for k, v in self.config.items()}
             with open(app_config.config_file, 'w', encoding='utf-8') as f:
                 cfg.write(f)
         except Exception as e:
-            messagebox.showerror("\u062e\u0637\u0623", f"\u0641\u0634\u0644 \u062d\u0641\u0638 \u0627\u0644\u0625\u0639\u062f\u0627\u062f\u0627\u062a: {e}")
+            self._report_error(f"\u0641\u0634\u0644 \u062d\u0641\u0638 \u0627\u0644\u0625\u0639\u062f\u0627\u062f\u0627\u062a: {e}")
+
+    @property
+    def on_error(self) -> Optional[Callable[[str], None]]:
+        return self._on_error
+
+    @on_error.setter
+    def on_error(self, handler: Optional[Callable[[str], None]]):
+        """تثبيت معالج العرض وعرض الأخطاء التي سبقته (مثل أخطاء load_config في __init__)"""
+        self._on_error = handler
+        pending = list(self._unreported_errors)
+        self._unreported_errors.clear()
+        for message in pending:
+            self._show_error(message)
+
+    def _report_error(self, message: str):
+        """تسجيل الخطأ وتمريره لمعالج العرض إن وُجد (أو حفظه حتى يُثبَّت)"""
+        self.logger.error(message)
+        self._show_error(message)
+
+    def _show_error(self, message: str):
+        if not self._on_error:
+            self._unreported_errors.append(message)
+            return
+        try:
+            self._on_error(message)
+        except Exception as e:
+            self.logger.error(f"خطأ في معالج عرض الأخطاء: {e}")
 
     def get_next_friday(self):
         today = datetime.today()
@@ -100,17 +150,21 @@ class SPXTrader:
     def connect_ibkr(self):
         try:
             if not self.ib.isConnected():
-                self.ib.connect('127.0.0.1', 7497, clientId=1, timeout=15)
-                self.connection_status = True
-                return True
+                self.ib_loop.run(self.ib.connectAsync('127.0.0.1', 7497,
+                                                      clientId=int(self.config.get('client_id', 1)), timeout=15))
+            self.connection_status = True
+            return True
         except Exception as e:
             self.logger.error(f"\u0641\u0634\u0644 \u0627\u0644\u0627\u062a\u0635\u0627\u0644 \u0628\u0640 IBKR: {e}")
             return False
 
     def disconnect_ibkr(self):
         try:
+            # العقود المؤهلة منذ آخر حفظ (الحفظ مؤجل ولا يتكرر مع كل عقد)
+            if 'contract_cache' in self.__dict__:
+                self.contract_cache.flush()
             if self.ib.isConnected():
-                self.ib.disconnect()
+                self.ib_loop.call(self.ib.disconnect)
                 self.connection_status = False
         except Exception as e:
             self.logger.error(f"\u062e\u0637\u0623 \u0623\u062b\u0646\u0627\u0621 \u0642\u0637\u0639 \u0627\u0644\u0627\u062a\u0635\u0627\u0644: {e}")
@@ -147,7 +201,7 @@ class SPXTrader:
     def get_account_balance(self):
         try:
             if self.ib.isConnected():
-                account = self.ib.accountSummary()
+                account = self.scheduler.call('message', self.ib.accountSummaryAsync)
                 return {item.tag: item.value for item in account}
             return {}
         except Exception as e:
@@ -156,10 +210,11 @@ class SPXTrader:
 
     def get_market_data(self, symbol):
         try:
+            from ib_insync import Index, Stock
             contract = Index(symbol, 'CBOE') if symbol == 'SPX' else Stock(symbol, 'SMART', 'USD')
-            self.ib.qualifyContracts(contract)
-            ticker = self.ib.reqMktData(contract)
-            self.ib.sleep(1)
+            contract = self.contract_cache.qualify(contract)
+            ticker = self.scheduler.call('message', self.ib.reqMktData, contract)
+            time.sleep(1)  # الأسعار تصل على حلقة IB
             return ticker
         except Exception as e:
             self.logger.error(f"\u062e\u0637\u0623 \u0641\u064a \u0627\u0644\u0628\u064a\u0627\u0646\u0627\u062a: {e}")
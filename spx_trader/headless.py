@@ -0,0 +1,65 @@
+"""
+تشغيل محرك التداول بلا واجهة رسومية (خوادم بلا شاشة / عدة محركات على نفس الجهاز)
+
+مثال:
+    python headless.py --port 8765
+    python headless.py --shards 4      # فحص القائمة على 4 عمليات (معرّفات العميل 2..5)
+    curl http://127.0.0.1:8765/status
+    curl -X POST http://127.0.0.1:8765/stop
+"""
+import sys
+import os
+import signal
+import argparse
+
+# تعديل مسار المشروع
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from config import DATA_DIR
+from core.trader import SPXTrader
+from core.engine import HeadlessEngine, setup_file_logging
+from utils.profiler import get_profiler, install_signal_toggle
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="محرك التداول بلا واجهة")
+    parser.add_argument('--port', type=int, default=None, help="منفذ واجهة التحكم المحلية")
+    parser.add_argument('--log-file', default=str(DATA_DIR / 'logs' / 'engine.log'))
+    parser.add_argument('--no-start', action='store_true', help="انتظار POST /start بدلاً من البدء فورًا")
+    parser.add_argument('--fake', action='store_true', help="بوابة IB وهمية محلية (للتجربة واختبار الحمل)")
+    parser.add_argument('--shards', type=int, default=None,
+                        help="عدد عمليات الفحص (لكل منها معرّف عميل IB مستقل)؛ 0 أو 1 لعملية واحدة")
+    args = parser.parse_args(argv)
+
+    setup_file_logging(args.log_file)
+    trader = SPXTrader()
+    if args.fake:
+        from sim.fake_ib import FakeIB
+        trader.ib = FakeIB()
+    if args.shards is not None:
+        trader.config['shard_workers'] = args.shards
+
+    engine = HeadlessEngine(trader, fake=args.fake)
+    engine.serve(args.port if args.port is not None else int(trader.config.get('control_port', 8765)))
+    install_signal_toggle(get_profiler(), float(trader.config.get('profile_seconds', 30)))
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: engine.request_shutdown())
+
+    if not args.no_start:
+        engine.start()
+
+    # حالة دورية في السجل (الذاكرة المقيمة وعدد الصفقات) حتى طلب الإيقاف
+    while not engine.wait(60):
+        status = engine.status()
+        memory = f"{status['rss_bytes'] / 2 ** 20:.0f} م.ب" if status['rss_bytes'] else 'غير متاح'
+        engine.log(f"الحالة: مراقبة={status['running']} صفقات مفتوحة={status['open_trades']} "
+                   f"الذاكرة={memory}")
+    engine.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    # عمال الفحص الموزع عمليات جديدة (spawn)، ويلزم هذا للنسخة المحزَّمة
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
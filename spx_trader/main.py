@@ -11,13 +11,16 @@ def resource_path(relative_path):
 # تعديل مسار المشروع
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
+from utils.startup import probe_startup  # أولاً: بداية قياس زمن التشغيل
 from core.trader import SPXTrader
 from ui.main_window import MainWindow
 from config import config as app_config
 
 def main():
-    trader = SPXTrader(app_config)  # تم تعديل SPXTrader ليقبل config
+    # أخطاء بدء التشغيل (مثل تحميل الإعدادات) تُعرض بعد أن تثبّت الواجهة معالج الأخطاء
+    trader = SPXTrader()
     app = MainWindow(trader)
+    probe_startup(app.root)
     app.root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,387 @@
+# sim/fake_ib.py
+import time
+import math
+import zlib
+import random
+import asyncio
+import threading
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+from eventkit import Event
+from ib_insync import (AccountValue, BarData, BarDataList, CommissionReport, Execution,
+                       Fill, OrderStatus, Ticker, Trade, util)
+from core.bar_store import BAR_SECONDS
+from core.contract_cache import ContractCache
+from utils.logger import Logger
+
+DURATION_SECONDS = {'S': 1, 'D': 86400, 'W': 7 * 86400, 'M': 31 * 86400, 'Y': 366 * 86400}
+
+
+class FakeIB:
+    """
+    بديل محلي لكائن IB في ib_insync لاختبارات الحمل دون TWS أو شبكة
+
+    يوفر نفس الواجهة التي يستخدمها المراقب والمتداولون: تأهيل العقود، والشموع
+    التاريخية (اصطناعية أو من ذاكرة الشموع المحلية)، وأسعار متدفقة عبر
+    pendingTickersEvent، وتنفيذ الأوامر (سوق/حد/إيقاف/أقواس/OCA) مع زمن استجابة قابل للضبط.
+    الأسعار دالة ثابتة في الزمن لكل عقد، فتتطابق الشموع والأسعار الحية وطلبات الفروقات.
+
+    يحاكي قيود الحلقة في ib_insync: الطرق المتزامنة تمر عبر util.run (فتفشل داخل حلقة
+    تعمل أو في خيط بلا حلقة)، والأسعار وأحداث الأوامر تصل على حلقة الاتصال فقط.
+    الطلبات غير الحاجبة من خارج تلك الحلقة تُعد في stats['off_loop_calls'].
+    """
+
+    def __init__(self, latency: float = 0.005, jitter: float = 0.0, fill_latency: float = 0.05,
+                 tick_interval: float = 0.25, volatility: float = 0.01, bar_cache=None, seed: int = 0):
+        """
+        Args:
+            latency (float): زمن الرد على الطلبات بالثواني
+            jitter (float): تذبذب عشوائي إضافي لزمن الرد
+            fill_latency (float): زمن تنفيذ أوامر السوق
+            tick_interval (float): الفاصل بين تحديثات الأسعار المتدفقة
+            volatility (float): سعة تذبذب السعر الاصطناعي (نسبة من السعر الأساسي)
+            bar_cache (BarCache): مصدر شموع مسجلة (اختياري) بدلاً من الاصطناعية
+        """
+        self.logger = Logger()
+        self.latency = latency
+        self.jitter = jitter
+        self.fill_latency = fill_latency
+        self.tick_interval = tick_interval
+        self.volatility = volatility
+        self.bar_cache = bar_cache
+        self.seed = seed
+        self.pendingTickersEvent = Event('pendingTickersEvent')
+        self.client = SimpleNamespace(getReqId=self._next_id)
+        self.stats = {}
+        self._connected = False
+        self._lock = threading.RLock()
+        self._ids = iter(range(1, 1 << 62))
+        self._tickers = {}   # conId -> Ticker
+        self._working = {}   # orderId -> Trade
+        self._trades = []
+        self._loop = None        # حلقة الاتصال: كل الأحداث تصل عليها
+        self._tick_task = None
+
+    # --- الاتصال ---
+
+    def connect(self, host: str = '127.0.0.1', port: int = 7497, clientId: int = 1,
+                timeout: float = 4, **kwargs):
+        return self._run(self.connectAsync(host, port, clientId, timeout, **kwargs))
+
+    async def connectAsync(self, host: str = '127.0.0.1', port: int = 7497, clientId: int = 1,
+                           timeout: float = 4, **kwargs):
+        await self._wait_async('connect')
+        self._loop = asyncio.get_running_loop()
+        self._connected = True
+        if self._tick_task is None:
+            self._tick_task = self._loop.create_task(self._tick_loop())
+        return self
+
+    def disconnect(self):
+        self._connected = False
+        task, self._tick_task = self._tick_task, None
+        if task is not None:
+            self._loop.call_soon_threadsafe(task.cancel)
+
+    def isConnected(self) -> bool:
+        return self._connected
+
+    def sleep(self, secs: float = 0.02) -> bool:
+        self._run(asyncio.sleep(secs))
+        return True
+
+    def run(self, *awaitables, timeout: float = None):
+        """تشغيل coroutines حتى اكتمالها على حلقة الخيط الحالي (مثل IB.run)"""
+        return util.run(*awaitables, timeout=timeout)
+
+    # --- العقود ---
+
+    def qualifyContracts(self, *contracts):
+        return self._run(self.qualifyContractsAsync(*contracts))
+
+    async def qualifyContractsAsync(self, *contracts):
+        await self._wait_async('qualifyContracts')
+        return self._qualify(contracts)
+
+    def _qualify(self, contracts):
+        for contract in contracts:
+            contract.conId = self._con_id(contract)
+            if not contract.exchange:
+                contract.exchange = 'SMART'
+            if not contract.currency:
+                contract.currency = 'USD'
+        return list(contracts)
+
+    # --- الشموع التاريخية ---
+
+    def reqHistoricalData(self, contract, endDateTime, durationStr: str, barSizeSetting: str,
+                          whatToShow: str, useRTH: bool, formatDate: int = 1,
+                          keepUpToDate: bool = False, chartOptions=None, timeout: float = 60):
+        return self._run(self.reqHistoricalDataAsync(contract, endDateTime, durationStr, barSizeSetting,
+                                                    whatToShow, useRTH, formatDate, keepUpToDate))
+
+    async def reqHistoricalDataAsync(self, contract, endDateTime, durationStr: str, barSizeSetting: str,
+                                     whatToShow: str, useRTH: bool, formatDate: int = 1,
+                                     keepUpToDate: bool = False, chartOptions=None, timeout: float = 60):
+        await self._wait_async('reqHistoricalData')
+        return self._bars(contract, endDateTime, durationStr, barSizeSetting, whatToShow, useRTH, keepUpToDate)
+
+    def cancelHistoricalData(self, bars):
+        self._count('cancelHistoricalData')
+
+    def _bars(self, contract, end, duration: str, bar_size: str, what_to_show: str, use_rth: bool,
+              keep_up_to_date: bool) -> BarDataList:
+        step = BAR_SECONDS.get(bar_size, 60)
+        end_ts = pd.Timestamp(end) if end else pd.Timestamp.now()
+        if end_ts.tzinfo is not None:
+            end_ts = end_ts.tz_localize(None)
+        value, unit = duration.split()
+        count = max(1, min(int(value) * DURATION_SECONDS[unit] // step, 100000))
+
+        bars = BarDataList()
+        bars.reqId = self._next_id()
+        bars.contract = contract
+        bars.endDateTime = end
+        bars.durationStr = duration
+        bars.barSizeSetting = bar_size
+        bars.whatToShow = what_to_show
+        bars.useRTH = use_rth
+        bars.keepUpToDate = keep_up_to_date
+
+        recorded = self._recorded_bars(contract, bar_size, what_to_show, use_rth, end_ts, count)
+        if recorded is not None:
+            bars.extend(recorded)
+            return bars
+
+        # الشمعة الأخيرة تبدأ عند آخر حد زمني وتكون قيد التكوين إذا كانت النهاية "الآن"
+        last_start = math.floor(end_ts.timestamp() / step) * step
+        starts = last_start - step * np.arange(count - 1, -1, -1, dtype=np.int64)
+        con_id = self._con_id(contract)
+        opens = self._price(con_id, starts)
+        closes = self._price(con_id, np.minimum(starts + step, end_ts.timestamp()))
+        mids = self._price(con_id, starts + step / 2)
+        highs = np.maximum.reduce([opens, closes, mids]) * (1 + self._noise(con_id, starts, 1) * 0.002)
+        lows = np.minimum.reduce([opens, closes, mids]) * (1 - self._noise(con_id, starts, 2) * 0.002)
+        volumes = (1000 + 9000 * self._noise(con_id, starts, 3)).round()
+        for i, start in enumerate(starts):
+            bars.append(BarData(
+                date=datetime.fromtimestamp(int(start)), open=round(opens[i], 2),
+                high=round(highs[i], 2), low=round(lows[i], 2), close=round(closes[i], 2),
+                volume=volumes[i], average=round((highs[i] + lows[i]) / 2, 2), barCount=int(volumes[i] // 10)
+            ))
+        return bars
+
+    def _recorded_bars(self, contract, bar_size, what_to_show, use_rth, end_ts, count):
+        """شموع مسجلة من ذاكرة الشموع المحلية إن وجدت للعقد"""
+        if self.bar_cache is None:
+            return None
+        key = self.bar_cache.series_key(ContractCache.make_key(contract), bar_size, what_to_show, use_rth)
+        df = self.bar_cache.load_df(key)
+        if df is None:
+            return None
+        df = df[pd.to_datetime(df['date']) <= end_ts].tail(count)
+        return [BarData(*row) for row in df[list(BarData.__dataclass_fields__)].itertuples(index=False)]
+
+    # --- الأسعار المتدفقة ---
+
+    def reqMktData(self, contract, genericTickList: str = '', snapshot: bool = False,
+                   regulatorySnapshot: bool = False, mktDataOptions=None) -> Ticker:
+        self._count('reqMktData')
+        with self._lock:
+            ticker = self._tickers.get(contract.conId)
+            if ticker is None:
+                ticker = self._tickers[contract.conId] = Ticker(contract=contract)
+                self._update_ticker(ticker, time.time())
+            return ticker
+
+    def cancelMktData(self, contract):
+        self._count('cancelMktData')
+        with self._lock:
+            self._tickers.pop(contract.conId, None)
+
+    async def _tick_loop(self):
+        while self._connected:
+            await asyncio.sleep(self.tick_interval)
+            now = time.time()
+            with self._lock:
+                tickers = list(self._tickers.values())
+                working = list(self._working.values())
+            for ticker in tickers:
+                self._update_ticker(ticker, now)
+            for trade in working:
+                self._check_resting_order(trade, now)
+            if tickers:
+                try:
+                    self.pendingTickersEvent.emit(set(tickers))
+                except Exception as e:
+                    self.logger.error(f"خطأ في معالج الأسعار: {e}")
+
+    def _update_ticker(self, ticker: Ticker, now: float):
+        price = round(float(self._price(ticker.contract.conId, now)), 2)
+        ticker.time = datetime.now(timezone.utc)
+        ticker.last = price
+        ticker.bid = round(price - 0.01, 2)
+        ticker.ask = round(price + 0.01, 2)
+
+    # --- الأوامر ---
+
+    def placeOrder(self, contract, order) -> Trade:
+        self._count('placeOrder')
+        if not order.orderId:
+            order.orderId = self._next_id()
+        if not contract.conId:
+            self._qualify([contract])
+        trade = Trade(contract=contract, order=order,
+                      orderStatus=OrderStatus(orderId=order.orderId, status='PreSubmitted',
+                                              remaining=order.totalQuantity))
+        with self._lock:
+            self._trades.append(trade)
+            self._working[order.orderId] = trade
+
+        # أوامر الأقواس: الأبناء تنتظر تنفيذ الأب
+        if order.orderType == 'MKT' and not order.parentId:
+            self._emit_later(self._delay(self.fill_latency), self._fill, trade, None)
+        else:
+            self._emit_later(self._delay(self.latency), self._set_status, trade, 'Submitted')
+        return trade
+
+    def cancelOrder(self, order):
+        self._count('cancelOrder')
+        with self._lock:
+            trade = self._working.pop(order.orderId, None)
+        if trade is not None:
+            self._emit_later(self._delay(self.latency), self._set_status, trade, 'Cancelled')
+
+    def trades(self):
+        with self._lock:
+            return list(self._trades)
+
+    def openTrades(self):
+        with self._lock:
+            return list(self._working.values())
+
+    def accountSummary(self, account: str = ''):
+        return self._run(self.accountSummaryAsync(account))
+
+    async def accountSummaryAsync(self, account: str = ''):
+        await self._wait_async('accountSummary')
+        return [AccountValue('DU000000', tag, value, 'USD', '') for tag, value in (
+            ('NetLiquidation', '1000000'), ('AvailableFunds', '1000000'), ('BuyingPower', '4000000'))]
+
+    def _check_resting_order(self, trade: Trade, now: float):
+        order = trade.order
+        if order.parentId and order.parentId in self._working:
+            return  # الأب لم يُنفَّذ بعد
+        price = float(self._price(trade.contract.conId, now))
+        buy = order.action == 'BUY'
+        if order.orderType == 'LMT':
+            hit = price <= order.lmtPrice if buy else price >= order.lmtPrice
+        elif order.orderType == 'STP':
+            hit = price >= order.auxPrice if buy else price <= order.auxPrice
+        else:
+            hit = order.orderType == 'MKT'
+        if hit:
+            self._fill(trade, round(price, 2))
+
+    def _fill(self, trade: Trade, price):
+        with self._lock:
+            if self._working.pop(trade.order.orderId, None) is None:
+                return
+            siblings = [t for t in self._working.values()
+                        if trade.order.ocaGroup and t.order.ocaGroup == trade.order.ocaGroup]
+            for sibling in siblings:
+                self._working.pop(sibling.order.orderId, None)
+
+        if price is None:
+            price = round(float(self._price(trade.contract.conId, time.time())), 2)
+        quantity = trade.order.totalQuantity
+        execution = Execution(execId=f"sim.{trade.order.orderId}", time=datetime.now(timezone.utc),
+                              side='BOT' if trade.order.action == 'BUY' else 'SLD', shares=quantity,
+                              price=price, orderId=trade.order.orderId, cumQty=quantity, avgPrice=price)
+        trade.fills.append(Fill(trade.contract, execution, CommissionReport(), execution.time))
+        trade.orderStatus.filled = quantity
+        trade.orderStatus.remaining = 0
+        trade.orderStatus.avgFillPrice = price
+        trade.orderStatus.lastFillPrice = price
+        self._count('fills')
+        self._set_status(trade, 'Filled')
+        trade.fillEvent.emit(trade, trade.fills[-1])
+        trade.filledEvent.emit(trade)
+        for sibling in siblings:
+            self._set_status(sibling, 'Cancelled')
+
+    def _set_status(self, trade: Trade, status: str):
+        if trade.orderStatus.status == status or trade.isDone() and status != 'Filled':
+            return
+        trade.orderStatus.status = status
+        try:
+            trade.statusEvent.emit(trade)
+            if status == 'Cancelled':
+                trade.cancelledEvent.emit(trade)
+        except Exception as e:
+            self.logger.error(f"خطأ في معالج حالة الأمر: {e}")
+
+    # --- أدوات داخلية ---
+
+    def _price(self, con_id: int, seconds):
+        """سعر اصطناعي ثابت لكل عقد كدالة في الزمن (موجات من دقائق إلى أيام)"""
+        seconds = np.asarray(seconds, dtype=float)
+        rng = random.Random(con_id ^ self.seed)
+        base = rng.uniform(20, 500)
+        wave = sum(
+            rng.uniform(0.3, 1.0) * np.sin(seconds / rng.uniform(*periods) + rng.uniform(0, 2 * np.pi))
+            for periods in ((30, 120), (600, 3600), (3600, 6 * 3600), (86400, 5 * 86400))
+        )
+        return base * (1 + self.volatility * wave)
+
+    def _noise(self, con_id: int, seconds, salt: int):
+        """ضوضاء ثابتة في [0, 1) لكل شمعة"""
+        values = (np.asarray(seconds, dtype=np.int64) * 2654435761 + con_id * 40503 + salt * 97) % 1000003
+        return values / 1000003
+
+    @staticmethod
+    def _con_id(contract) -> int:
+        return contract.conId or zlib.crc32(ContractCache.make_key(contract).encode()) & 0x7FFFFFFF
+
+    def _next_id(self) -> int:
+        with self._lock:
+            return next(self._ids)
+
+    def _delay(self, base: float) -> float:
+        return base + (random.uniform(0, self.jitter) if self.jitter else 0)
+
+    def _count(self, name: str, check_loop: bool = True):
+        off_loop = check_loop and not self._on_loop()
+        with self._lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+            if off_loop:
+                self.stats['off_loop_calls'] = self.stats.get('off_loop_calls', 0) + 1
+
+    def _on_loop(self) -> bool:
+        """هل الخيط الحالي يشغّل حلقة الاتصال"""
+        try:
+            return self._loop is not None and asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    @staticmethod
+    def _run(awaitable):
+        """util.run مع إغلاق الـ coroutine إذا رُفض التشغيل (داخل حلقة تعمل أو بلا حلقة)"""
+        try:
+            return util.run(awaitable)
+        except RuntimeError:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise
+
+    def _emit_later(self, delay: float, func, *args):
+        """جدولة حدث على حلقة الاتصال (من أي خيط) كما تصل رسائل TWS"""
+        if self._loop is None:
+            raise ConnectionError("FakeIB غير متصل")
+        self._loop.call_soon_threadsafe(self._loop.call_later, delay, func, *args)
+
+    async def _wait_async(self, name: str):
+        self._count(name, check_loop=False)
+        await asyncio.sleep(self._delay(self.latency))
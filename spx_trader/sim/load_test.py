@@ -0,0 +1,178 @@
+# sim/load_test.py
+"""
+اختبار حمل لمسار المراقبة الحقيقي (MarketMonitor و StockTrader) على بوابة IB وهمية محلية
+
+مثال:
+    python -m sim.load_test --symbols 1000 --orders 300 --latency 0.02 --fill-latency 0.2
+    python -m sim.load_test --symbols 500 --real-dispatch   # إشارات الفحص ترسل أوامر فعلية
+"""
+import sys
+import time
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from core.ib_loop import IBLoop
+from core.scheduler import RequestScheduler, LIMITS
+from core.contract_cache import ContractCache
+from core.monitoring import MarketMonitor
+from utils.latency import LatencyTracker
+from sim.fake_ib import FakeIB
+
+# بدون --pacing تكون حدود المعدل غير مقيدة لقياس إنتاجية الكود نفسه
+UNLIMITED = {name: (1e9, 1e9) for name in LIMITS}
+
+
+class SimTrader:
+    """بديل SPXTrader يحمل ما يحتاجه المراقب والمتداولون فقط"""
+
+    def __init__(self, ib: FakeIB, config: dict, scheduler: RequestScheduler, data_dir: Path):
+        self.ib = ib
+        self.config = config
+        self.scheduler = scheduler
+        self.ib_loop = scheduler.loop
+        self.current_trades = {}
+        self.latency = LatencyTracker()
+        self.contract_cache = ContractCache(ib, scheduler, path=data_dir / 'contracts.json')
+
+
+def isolate_journal(data_dir: Path):
+    """توجيه سجل الصفقات (CSV + SQLite) إلى مجلد مؤقت حتى لا يلوث الاختبار سجل التداول"""
+    from utils import ledger as ledger_module, journal as journal_module
+    ledger_module._ledger = ledger_module.TradeLedger(path=data_dir / 'trades.db', csv_path=data_dir / 'none.csv')
+    journal = journal_module._journal = journal_module.TradeJournal(csv_path=data_dir / 'executed_trades.csv')
+    return journal
+
+
+def run_scan(monitor: MarketMonitor, passes: int, log) -> list:
+    """دورات فحص كاملة للقائمة على حلقة IB (الأولى تعبئة أولية والباقي فروقات)"""
+    timings = []
+    for _ in range(passes):
+        started = time.perf_counter()
+        monitor.ib_loop.run(monitor._scan_watchlist_async(log))
+        monitor.trader.contract_cache.flush()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def wait_for_orders(trader: SimTrader, count: int, timeout: float) -> int:
+    """انتظار إرسال أوامر الإشارات من خيوط الأوامر (حسب قياسات order_submit)"""
+    deadline = time.monotonic() + timeout
+    while True:
+        placed = trader.latency.snapshot().get('order_submit', {}).get('count', 0)
+        if placed >= count or time.monotonic() > deadline:
+            return placed
+        time.sleep(0.05)
+
+
+def run_orders(monitor: MarketMonitor, symbols: list, count: int, timeout: float):
+    """إرسال count أمرًا متزامنًا عبر StockTrader وانتظار تنفيذها"""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(count, 64) or 1) as pool:
+        orders = list(pool.map(
+            lambda i: monitor.stock_trader.place_order(symbols[i % len(symbols)], 'CALL' if i % 2 else 'PUT'),
+            range(count)
+        ))
+    submitted = time.perf_counter() - started
+    pending = [order for order in orders if order]
+    deadline = time.monotonic() + timeout
+    for order in pending:
+        order.wait(max(0, deadline - time.monotonic()))
+    filled = sum(order.filled for order in pending)
+    return submitted, time.perf_counter() - started, filled, len(pending)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="اختبار حمل على بوابة IB وهمية")
+    parser.add_argument('--symbols', type=int, default=1000, help="حجم قائمة المتابعة")
+    parser.add_argument('--passes', type=int, default=2, help="عدد دورات الفحص")
+    parser.add_argument('--orders', type=int, default=200, help="عدد الأوامر المتزامنة")
+    parser.add_argument('--duration', type=float, default=30, help="مدة متابعة الصفقات المفتوحة بالثواني")
+    parser.add_argument('--latency', type=float, default=0.01, help="زمن رد البوابة بالثواني")
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--fill-latency', type=float, default=0.05, help="زمن تنفيذ أوامر السوق")
+    parser.add_argument('--tick-interval', type=float, default=0.25)
+    parser.add_argument('--concurrency', type=int, default=50, help="حد الطلبات المتزامنة أثناء الفحص")
+    parser.add_argument('--tp-pct', type=float, default=0.3)
+    parser.add_argument('--sl-pct', type=float, default=0.3)
+    parser.add_argument('--exit-mode', choices=('client', 'bracket'), default='client')
+    parser.add_argument('--pacing', action='store_true', help="تطبيق حدود معدل IB الحقيقية")
+    parser.add_argument('--recorded', action='store_true', help="شموع من ذاكرة الشموع المحلية عند توفرها")
+    parser.add_argument('--real-dispatch', action='store_true',
+                        help="إشارات الفحص تمر بمسار الأوامر الحقيقي (خيوط الأوامر خارج حلقة IB)")
+    parser.add_argument('--verbose', action='store_true', help="طباعة رسائل المراقب")
+    args = parser.parse_args(argv)
+
+    data_dir = Path(tempfile.mkdtemp(prefix='spx_load_'))
+    bar_cache = None
+    if args.recorded:
+        from utils.bar_cache import get_bar_cache
+        bar_cache = get_bar_cache()
+    fake = FakeIB(latency=args.latency, jitter=args.jitter, fill_latency=args.fill_latency,
+                  tick_interval=args.tick_interval, bar_cache=bar_cache)
+    journal = isolate_journal(data_dir)
+
+    config = {
+        'qty': 1, 'tp_pct': args.tp_pct, 'sl_pct': args.sl_pct,
+        'rsi_period': 14, 'rsi_overbought': 70, 'rsi_oversold': 30,
+        'use_rsi': True, 'use_ma': True, 'ma_period': 50,
+        'scan_mode': 'async', 'scan_concurrency': args.concurrency,
+        'bar_store_mode': 'delta', 'batch_analysis': True,
+        'exit_mode': args.exit_mode, 'bar_cache': False, 'metrics_port': 0
+    }
+    scheduler = RequestScheduler(None if args.pacing else UNLIMITED, loop=IBLoop())
+    trader = SimTrader(fake, config, scheduler, data_dir)
+    monitor = MarketMonitor(trader)
+    # بدون --real-dispatch لا تُرسل الإشارات أثناء الفحص أوامر حتى تبقى مرحلة الأوامر قابلة للقياس
+    signals = []
+    dispatch = monitor._dispatch_signal
+
+    def count_signal(symbol, signal, price, log_func, bar=None):
+        signals.append(symbol)
+        if args.real_dispatch:
+            dispatch(symbol, signal, price, log_func, bar)
+
+    monitor._dispatch_signal = count_signal
+    log = print if args.verbose else (lambda message: None)
+    # الاتصال وخيوط الأوامر كما في التشغيل الفعلي؛ الفحص يُدار هنا دورة بدورة
+    monitor.start_monitoring(log, watchlist=[f"SYM{i:04d}" for i in range(args.symbols)],
+                             scan=False, monitor_trades=False)
+
+    print(f"البيانات المؤقتة: {data_dir}")
+    for number, elapsed in enumerate(run_scan(monitor, args.passes, log), 1):
+        print(f"دورة الفحص {number}: {args.symbols} رمز خلال {elapsed:.2f} ث "
+              f"({args.symbols / elapsed:.0f} رمز/ث)")
+    print(f"إشارات: {len(signals)}")
+    if args.real_dispatch:
+        placed = wait_for_orders(trader, len(signals), timeout=30)
+        print(f"أوامر الإشارات: {placed}/{len(signals)} أُرسلت من خيوط الأوامر")
+
+    submitted, elapsed, filled, pending = run_orders(monitor, monitor.watchlist, args.orders, timeout=30)
+    print(f"الأوامر: {pending}/{args.orders} أُرسلت خلال {submitted:.2f} ث، "
+          f"{filled} نُفذت خلال {elapsed:.2f} ث")
+
+    threading.Thread(target=monitor._monitor_open_trades, args=(log,), daemon=True).start()
+    time.sleep(args.duration)
+    monitor.running = False
+    closed = [info for info in trader.current_trades.values() if info['status'] == 'closed']
+    reasons = {}
+    for info in closed:
+        reason = info.get('exit_reason', '?')
+        reasons[reason] = reasons.get(reason, 0) + 1
+    print(f"الصفقات: {len(trader.current_trades)} فُتحت، {len(closed)} أُغلقت خلال "
+          f"{args.duration:.0f} ث {reasons}")
+
+    monitor.stop_monitoring()
+    journal.close()
+    print(scheduler.summary())
+    for stage, stats in trader.latency.snapshot().items():
+        print(f"  {stage:<13} n={stats['count']:<6} p50={stats['p50'] * 1000:8.2f}  "
+              f"p95={stats['p95'] * 1000:8.2f}  p99={stats['p99'] * 1000:8.2f} مللي ث")
+    print(f"طلبات البوابة: {dict(sorted(fake.stats.items()))}")
+    fake.disconnect()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# الوحدات تُستورد بالمسار المجرد (core.* و utils.*) من مجلد المشروع كما يضبطه main.py
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
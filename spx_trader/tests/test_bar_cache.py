@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+import pytest
+from ib_insync import BarData, Stock
+
+from core.bar_store import BarStore
+from core.scheduler import RequestScheduler, LIMITS
+from utils import bar_cache as bar_cache_module
+from utils.bar_cache import BarCache, COLUMNS
+
+TZ = 'America/New_York'
+STEP = pd.Timedelta(minutes=15)
+UNLIMITED = {name: (1e9, 1e9) for name in LIMITS}
+
+
+def make_bars(start, end):
+    """شموع 15 دقيقة من start حتى end (شاملة) بأسعار تعتمد على الوقت فقط"""
+    bars = []
+    for stamp in pd.date_range(start, end, freq=STEP):
+        price = 100 + (stamp.value // 10 ** 9 % 7200) / 100
+        bars.append(BarData(date=stamp.to_pydatetime(), open=price, high=price + 1, low=price - 1,
+                            close=price + 0.5, volume=1000, average=price, barCount=10))
+    return bars
+
+
+class RecordingIB:
+    """بديل IB يعيد شموعًا بمنطقة زمنية (كما ترسلها TWS) ويسجل الطلبات"""
+
+    def __init__(self):
+        self.requests = []
+
+    def reqHistoricalData(self, contract, endDateTime, durationStr, barSizeSetting, whatToShow,
+                          useRTH, formatDate=1, keepUpToDate=False):
+        self.requests.append({'endDateTime': endDateTime, 'durationStr': durationStr})
+        end = pd.Timestamp(endDateTime) if endDateTime else pd.Timestamp.now(tz=TZ)
+        end = end.tz_convert(TZ).floor(STEP)
+        value, unit = durationStr.split()
+        count = max(1, int(value) * (86400 if unit == 'D' else 1) // int(STEP.total_seconds()))
+        return make_bars(end - (count - 1) * STEP, end)
+
+    async def reqHistoricalDataAsync(self, *args, **kwargs):
+        return self.reqHistoricalData(*args, **kwargs)
+
+
+@pytest.fixture
+def now():
+    return pd.Timestamp.now(tz=TZ).floor(STEP)
+
+
+def test_round_trip_keeps_values_and_timezone(tmp_path, now):
+    cache = BarCache(root=tmp_path)
+    bars = make_bars(now - 20 * STEP, now)
+    cache.append('AAA', bars, symbol='AAA', bar_size='15 mins', what_to_show='TRADES')
+
+    df = cache.load_df('AAA')
+    assert len(df) == len(bars)
+    assert str(df['date'].dt.tz) == TZ
+    assert list(df['date']) == [pd.Timestamp(bar.date) for bar in bars]
+    assert list(df['close']) == [bar.close for bar in bars]
+    assert cache.last_date('AAA') == pd.Timestamp(bars[-1].date)
+    assert len(cache.load_df('AAA', limit=5)) == 5
+
+
+def test_gaps_between_segments_and_fill(tmp_path, now):
+    cache = BarCache(root=tmp_path)
+    cache.append('AAA', make_bars(now - 40 * STEP, now - 30 * STEP))
+    cache.append('AAA', make_bars(now - 10 * STEP, now))
+
+    assert cache.gaps('AAA') == [(now - 30 * STEP, now - 10 * STEP)]
+
+    # ملء الفجوة يعيد كتابة السلسلة مرتبة بلا تكرار
+    cache.append('AAA', make_bars(now - 31 * STEP, now - 9 * STEP))
+    df = cache.load_df('AAA')
+    assert cache.gaps('AAA') == []
+    assert df['date'].is_monotonic_increasing and df['date'].is_unique
+    assert len(df) == 41
+
+
+def test_bar_store_fills_gap_of_tz_aware_cache(tmp_path, now):
+    cache = BarCache(root=tmp_path)
+    ib = RecordingIB()
+    store = BarStore(ib, RequestScheduler(UNLIMITED), '15 mins', '2 D', cache=cache)
+    contract = Stock('AAA', 'SMART', 'USD', conId=1)
+    key = store._series_key('AAA', contract)
+    # فجوة داخل نافذة اليومين (مثل انقطاع أثناء اليوم)
+    cache.append(key, make_bars(now - 80 * STEP, now - 60 * STEP))
+    cache.append(key, make_bars(now - 20 * STEP, now - 4 * STEP))
+
+    requests = store._gap_requests(key)
+    assert len(requests) == 1
+    assert requests[0]['endDateTime'] == (now - 19 * STEP).to_pydatetime()
+
+    df = store.update('AAA', contract)
+    assert df is not None
+    assert 'AAA' in store._bars
+    assert ib.requests[0]['endDateTime'] == requests[0]['endDateTime']
+    assert cache.gaps(key) == []
+    assert df['date'].iloc[-1] >= now
+
+
+def test_gaps_older_than_window_are_skipped(tmp_path, now):
+    cache = BarCache(root=tmp_path)
+    store = BarStore(RecordingIB(), RequestScheduler(UNLIMITED), '15 mins', '2 D', cache=cache)
+    key = store._series_key('AAA', Stock('AAA', 'SMART', 'USD', conId=1))
+    cache.append(key, make_bars(now - pd.Timedelta(days=5), now - pd.Timedelta(days=4)))
+    cache.append(key, make_bars(now - pd.Timedelta(days=3), now - pd.Timedelta(hours=1)))
+
+    assert store._gap_requests(key) == []
+
+
+
+def test_gap_fill_does_not_replace_mapped_files(tmp_path, now):
+    cache = BarCache(root=tmp_path)
+    cache.append('AAA', make_bars(now - 40 * STEP, now - 30 * STEP))
+    cache.append('AAA', make_bars(now - 10 * STEP, now))
+    held = cache.load('AAA')
+    before = np.array(held['date'])
+
+    cache.append('AAA', make_bars(now - 31 * STEP, now - 9 * STEP))
+
+    # القارئ القديم يبقى على نسخة متسقة والتحميل الجديد يرى السلسلة المدمجة
+    assert np.array_equal(held['date'], before)
+    assert len(cache.load_df('AAA')) == 41
+    del held
+    cache.append('AAA', make_bars(now - 50 * STEP, now - 45 * STEP))
+    assert sorted(path.name for path in (tmp_path / 'AAA').glob('*.bin')) == \
+        sorted(f"{column}.2.bin" for column in COLUMNS)
+    assert len(cache.load_df('AAA')) == 47
+
+
+def test_failed_append_is_written_as_new_generation(tmp_path, now, monkeypatch):
+    cache = BarCache(root=tmp_path)
+    cache.append('AAA', make_bars(now - 10 * STEP, now - 5 * STEP))
+
+    def locked_open(path, mode='r', *args, **kwargs):
+        # ملف مربوط بالذاكرة على Windows يرفض القص
+        if mode == 'ab':
+            raise PermissionError(13, 'mapped', str(path))
+        return open(path, mode, *args, **kwargs)
+
+    monkeypatch.setattr(bar_cache_module, 'open', locked_open, raising=False)
+    cache.append('AAA', make_bars(now - 4 * STEP, now))
+    monkeypatch.undo()
+
+    df = cache.load_df('AAA')
+    assert len(df) == 11 and df['date'].is_unique
+    assert df['date'].iloc[-1] == now
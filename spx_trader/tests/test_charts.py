@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from ui import charts as charts_module
+from ui.charts import TradingCharts
+
+
+class FakeWidget:
+    """بديل عنصر Tk يسجل التحديثات المجدولة بـ after"""
+
+    def __init__(self):
+        self.jobs = []
+
+    def after(self, delay_ms, callback):
+        self.jobs.append((delay_ms, callback))
+        return len(self.jobs)
+
+    def pack_forget(self):
+        pass
+
+
+class AggCanvas(FigureCanvasAgg):
+    """لوحة Agg بدون شاشة تعد الرسم الكامل والـ blit"""
+
+    def __init__(self, figure, master=None):
+        super().__init__(figure)
+        self.widget = FakeWidget()
+        self.draws = self.blits = 0
+
+    def get_tk_widget(self):
+        return self.widget
+
+    def draw(self):
+        self.draws += 1
+        super().draw()
+
+    def blit(self, bbox=None):
+        self.blits += 1
+
+
+def candles(count, shift=0.0):
+    close = 100 + shift + np.sin(np.arange(count) / 5)
+    return pd.DataFrame({'open': close - 0.2, 'high': close + 0.5, 'low': close - 0.5, 'close': close})
+
+
+def make_charts(monkeypatch, **settings):
+    monkeypatch.setattr(charts_module, 'FigureCanvasTkAgg', AggCanvas)
+    monkeypatch.setattr(charts_module, 'config', {'chart_render_mode': 'incremental', **settings})
+    return TradingCharts(None)
+
+
+def test_incremental_blits_until_limits_change(monkeypatch):
+    charts = make_charts(monkeypatch, chart_max_fps=0)
+    canvas = charts.canvas
+
+    charts.update_chart(candles(50))
+    assert (canvas.draws, canvas.blits) == (1, 0)  # أول رسم كامل يلتقط الخلفية
+
+    charts.update_chart(candles(52))
+    charts.update_chart(candles(53))
+    assert (canvas.draws, canvas.blits) == (1, 2)  # داخل حدود المحاور: blit فقط
+
+    charts.update_chart(candles(53, shift=50))
+    assert (canvas.draws, canvas.blits) == (2, 2)  # خروج السعر عن المحاور يعيد الرسم الكامل
+
+
+def test_full_mode_redraws_every_update(monkeypatch):
+    charts = make_charts(monkeypatch, chart_max_fps=0, chart_render_mode='full')
+    charts.update_chart(candles(50))
+    charts.update_chart(candles(51))
+    assert (charts.canvas.draws, charts.canvas.blits) == (2, 0)
+    assert charts._artists is None
+
+
+@pytest.mark.parametrize('max_fps', [0, -5, '-1'])
+def test_zero_or_negative_fps_is_unthrottled(monkeypatch, max_fps):
+    charts = make_charts(monkeypatch, chart_max_fps=max_fps)
+    for count in (50, 51, 52):
+        charts.update_chart(candles(count))
+    assert charts.canvas.widget.jobs == []
+    assert charts.canvas.draws + charts.canvas.blits == 3
+
+
+def test_updates_within_frame_interval_are_coalesced(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(charts_module, 'time', SimpleNamespace(monotonic=lambda: now[0]))
+    charts = make_charts(monkeypatch, chart_max_fps=10)
+    charts.update_chart(candles(50))
+    now[0] += 0.03
+    charts.update_chart(candles(51))
+    charts.update_chart(candles(52))
+
+    # تحديث واحد مجدول يرسم أحدث البيانات فقط
+    (delay_ms, callback), = charts.canvas.widget.jobs
+    assert delay_ms == 71
+    callback()
+    assert charts._length == 52
+    assert charts.canvas.draws + charts.canvas.blits == 2
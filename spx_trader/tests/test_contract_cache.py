@@ -0,0 +1,55 @@
+import json
+import os
+
+from ib_insync import Stock
+
+from core.contract_cache import ContractCache
+from core.scheduler import RequestScheduler, LIMITS
+
+UNLIMITED = {name: (1e9, 1e9) for name in LIMITS}
+
+
+class QualifyingIB:
+    """بديل IB يؤهل أي عقد بمعرّف ثابت"""
+
+    async def qualifyContractsAsync(self, contract):
+        contract.conId = sum(map(ord, contract.symbol))
+        return [contract]
+
+
+def test_new_contracts_are_saved_once_per_flush(tmp_path, monkeypatch):
+    path = tmp_path / 'contracts.json'
+    cache = ContractCache(QualifyingIB(), RequestScheduler(UNLIMITED), path=path, flush_interval=3600)
+    saves = []
+    save = cache._save
+    monkeypatch.setattr(cache, '_save', lambda entries: saves.append(len(entries)) or save(entries))
+
+    for i in range(50):
+        assert cache.qualify(Stock(f'S{i}', 'SMART', 'USD')).conId
+    assert saves == [] and not path.exists()
+
+    cache.flush()
+    cache.flush()  # لا تغييرات منذ الحفظ السابق
+    assert saves == [50]
+    assert len(json.loads(path.read_text(encoding='utf-8'))) == 50
+    assert not list(tmp_path.glob('*.tmp'))
+
+    reloaded = ContractCache(QualifyingIB(), RequestScheduler(UNLIMITED), path=path)
+    assert reloaded.qualify(Stock('S7', 'SMART', 'USD')).conId == sum(map(ord, 'S7'))
+
+
+def test_flush_interval_bounds_unsaved_time(tmp_path):
+    path = tmp_path / 'contracts.json'
+    cache = ContractCache(QualifyingIB(), RequestScheduler(UNLIMITED), path=path, flush_interval=0)
+    cache.qualify(Stock('AAA', 'SMART', 'USD'))
+    assert 'AAA|STK|SMART|USD' in json.loads(path.read_text(encoding='utf-8'))
+
+
+def test_temp_file_is_unique_per_process(tmp_path, monkeypatch):
+    cache = ContractCache(QualifyingIB(), RequestScheduler(UNLIMITED), path=tmp_path / 'contracts.json')
+    written = []
+    replace = os.replace
+    monkeypatch.setattr(os, 'replace', lambda src, dst: written.append(str(src)) or replace(src, dst))
+    cache.qualify(Stock('AAA', 'SMART', 'USD'))
+    cache.flush()
+    assert written == [f"{tmp_path / 'contracts.json'}.{os.getpid()}.tmp"]
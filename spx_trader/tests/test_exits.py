@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from backtest.engine import simulate_exits
+from trading.exits import calculate_tp_sl, exit_reason
+
+PARAMS = {'tp_pct': 2, 'sl_pct': 1.5}
+
+
+@pytest.mark.parametrize('direction, price, reason', [
+    (1, 102, 'TP'), (1, 103, 'TP'), (1, 98.5, 'SL'), (1, 97, 'SL'), (1, 100, None),
+    (-1, 98, 'TP'), (-1, 97, 'TP'), (-1, 101.5, 'SL'), (-1, 103, 'SL'), (-1, 100, None),
+])
+def test_exit_reason_for_long_and_short(direction, price, reason):
+    target, stop = calculate_tp_sl(100.0, direction, PARAMS['tp_pct'], PARAMS['sl_pct'])
+    assert exit_reason(price, target, stop) == reason
+
+
+@pytest.fixture(scope='module')
+def bars():
+    """شموع عشوائية بفجوات افتتاح وإشارات شراء وبيع متفرقة"""
+    rng = np.random.RandomState(11)
+    close = 100 + np.cumsum(rng.normal(0, 0.8, 400))
+    open_ = np.roll(close, 1) + rng.normal(0, 0.6, len(close))
+    open_[0] = close[0]
+    spread = np.abs(rng.normal(0, 0.7, (2, len(close))))
+    high = np.maximum(open_, close) + spread[0]
+    low = np.minimum(open_, close) - spread[1]
+    signals = rng.rand(len(close))
+    buy, sell = signals < 0.05, signals > 0.95
+    return open_, high, low, close, buy, sell
+
+
+def replay_live(open_, high, low, close, buy, sell, params):
+    """
+    تمرير أسعار كل شمعة إلى exit_reason كما تصل للمراقبة الحية:
+    الافتتاح، ثم الأسوأ للمركز، ثم الأفضل، ثم الإغلاق
+    """
+    trades, position = [], None
+    for bar in range(len(close)):
+        if position:
+            entry, direction, target, stop = position
+            adverse, favorable = (low[bar], high[bar]) if direction == 1 else (high[bar], low[bar])
+            for price in (open_[bar], adverse, favorable, close[bar]):
+                reason = exit_reason(price, target, stop)
+                if reason:
+                    trades.append((entry, bar, reason))
+                    position = None
+                    break
+        # الدخول عند إغلاق شمعة الإشارة إذا لم يكن هناك مركز مفتوح
+        if position is None and (buy[bar] or sell[bar]):
+            direction = 1 if buy[bar] else -1
+            target, stop = calculate_tp_sl(close[bar], direction, params['tp_pct'], params['sl_pct'])
+            position = (bar, direction, target, stop)
+    if position:
+        trades.append((position[0], len(close) - 1, 'OPEN'))
+    return trades
+
+
+def test_live_exits_match_backtest_on_same_bars(bars):
+    simulated = simulate_exits(*bars, PARAMS)
+    live = replay_live(*bars, PARAMS)
+
+    assert len(simulated) > 20
+    assert {trade[-1] for trade in simulated} >= {'TP', 'SL'}
+    assert [(entry, exit_bar, reason) for entry, exit_bar, *_, reason in simulated] == live
+
+
+def test_gap_through_target_exits_at_open_even_if_stop_is_touched_later():
+    # الشمعة الثانية تفتتح فوق الهدف ثم تهبط تحت الوقف
+    open_ = np.array([100.0, 103.0])
+    high = np.array([100.5, 103.5])
+    low = np.array([99.5, 97.0])
+    close = np.array([100.0, 97.5])
+    buy, sell = np.array([True, False]), np.array([False, False])
+
+    (trade,) = simulate_exits(open_, high, low, close, buy, sell, PARAMS)
+    assert trade[1] == 1 and trade[-1] == 'TP' and trade[-2] == 103.0
+    assert replay_live(open_, high, low, close, buy, sell, PARAMS) == [(0, 1, 'TP')]
@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import time
+
+import pandas as pd
+import pytest
+from ib_insync import Stock
+
+from core.ib_loop import IBLoop
+from core.monitoring import MarketMonitor
+from core.scheduler import RequestScheduler
+from sim.fake_ib import FakeIB
+from sim.load_test import SimTrader, UNLIMITED, isolate_journal
+from utils import journal as journal_module, ledger as ledger_module
+
+CONFIG = {
+    'qty': 1, 'tp_pct': 5, 'sl_pct': 5, 'rsi_period': 14, 'ma_period': 50,
+    'scan_mode': 'async', 'bar_store_mode': 'delta', 'batch_analysis': True,
+    'exit_mode': 'client', 'bar_cache': False, 'metrics_port': 0
+}
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    # استعادة السجلات العامة بعد الاختبار
+    for module, name in ((ledger_module, '_ledger'), (journal_module, '_journal')):
+        monkeypatch.setattr(module, name, getattr(module, name))
+    journal = isolate_journal(tmp_path)
+    yield journal
+    journal.close()
+
+
+@pytest.fixture
+def trader(tmp_path, journal):
+    ib_loop = IBLoop()
+    fake = FakeIB(latency=0.001, fill_latency=0.01, tick_interval=0.05)
+    trader = SimTrader(fake, dict(CONFIG), RequestScheduler(UNLIMITED, loop=ib_loop), tmp_path)
+    yield trader
+    fake.disconnect()
+    ib_loop.stop()
+
+
+def test_sync_methods_fail_like_ib_insync(trader):
+    fake = trader.ib
+    trader.ib_loop.run(fake.connectAsync())
+
+    # داخل حلقة تعمل: util.run لا يستطيع تشغيلها مرة أخرى
+    async def inside_loop():
+        fake.qualifyContracts(Stock('AAA', 'SMART', 'USD'))
+
+    with pytest.raises(RuntimeError):
+        trader.ib_loop.run(inside_loop())
+
+    # في خيط بلا حلقة أحداث
+    errors = []
+
+    def in_thread():
+        try:
+            fake.reqHistoricalData(Stock('AAA', 'SMART', 'USD'), '', '1 D', '15 mins', 'TRADES', True)
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=in_thread)
+    thread.start()
+    thread.join()
+    assert errors
+
+
+def test_scan_signal_is_placed_through_real_dispatch(trader):
+    monitor = MarketMonitor(trader)
+    assert monitor.start_monitoring(lambda message: None, watchlist=['AAA'], scan=False, monitor_trades=False)
+    fake = trader.ib
+    assert fake.isConnected()
+
+    # الإشارة تصدر من حلقة IB (مثل الفحص غير المتزامن) والأمر يُرسل من خيوط الأوامر
+    async def signal():
+        monitor._dispatch_signal('AAA', 'reversal_up', 100.0, lambda message: None)
+
+    trader.ib_loop.run(signal())
+    deadline = time.monotonic() + 5
+    while not trader.current_trades and time.monotonic() < deadline:
+        time.sleep(0.02)
+    monitor.stop_monitoring()
+
+    assert len(trader.current_trades) == 1
+    assert fake.stats['placeOrder'] == 1
+    assert fake.stats.get('off_loop_calls', 0) == 0
+
+
+def test_signal_is_dispatched_once_per_bar(trader, monkeypatch):
+    sent = []
+    monitor = MarketMonitor(trader, on_signal=lambda *signal: sent.append(signal))
+    monkeypatch.setattr(monitor.indicators, 'identify_reversal_candles', lambda df, indicators: 'reversal_up')
+    monkeypatch.setattr(monitor, '_latest_indicators', lambda symbol, df: {})
+    bars = pd.DataFrame({'date': pd.date_range('2024-01-02 09:30', periods=3, freq='15min'),
+                         'close': [100.0, 101.0, 102.0]})
+
+    # الشمعة قيد التكوين تُحلَّل في كل دورة فحص: إشارة واحدة لها
+    for close in (102.0, 102.5, 101.8):
+        bars.loc[2, 'close'] = close
+        monitor._analyze_symbol('AAA', bars, lambda message: None)
+    assert sent == [('AAA', 'reversal_up', 102.0)]
+
+    # شمعة جديدة ورمز آخر يرسلان من جديد
+    next_bar = pd.concat([bars, pd.DataFrame({'date': [bars['date'].iloc[-1] + pd.Timedelta(minutes=15)],
+                                               'close': [99.0]})], ignore_index=True)
+    monitor._analyze_symbol('AAA', next_bar, lambda message: None)
+    monitor._analyze_symbol('BBB', bars, lambda message: None)
+    assert [signal[0] for signal in sent] == ['AAA', 'AAA', 'BBB']
+
+
+def test_journal_is_opened_at_start_off_the_ib_loop(trader, monkeypatch, tmp_path):
+    created = []
+    make_journal = journal_module.TradeJournal
+
+    def record_thread(*args, **kwargs):
+        created.append(threading.current_thread().name)
+        return make_journal(csv_path=tmp_path / 'late.csv')
+
+    monkeypatch.setattr(journal_module, '_journal', None)
+    monkeypatch.setattr(journal_module, 'TradeJournal', record_thread)
+    monitor = MarketMonitor(trader)
+    assert monitor.start_monitoring(lambda message: None, watchlist=['AAA'], scan=False, monitor_trades=False)
+    try:
+        assert created and created[0] != 'ib-loop'
+        # أول صفقة من معالج التنفيذ على حلقة IB تجد السجل جاهزًا
+        assert trader.ib_loop.call(journal_module.get_journal) is journal_module._journal
+        assert len(created) == 1
+    finally:
+        monitor.stop_monitoring()
+        journal_module._journal.close()
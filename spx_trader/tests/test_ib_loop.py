@@ -0,0 +1,55 @@
+import asyncio
+import threading
+
+import pytest
+
+from core.ib_loop import IBLoop
+from core.scheduler import RequestScheduler, LIMITS
+
+UNLIMITED = {name: (1e9, 1e9) for name in LIMITS}
+
+
+@pytest.fixture
+def ib_loop():
+    loop = IBLoop()
+    yield loop
+    loop.stop()
+
+
+def test_scheduler_runs_requests_on_the_ib_loop(ib_loop):
+    scheduler = RequestScheduler(UNLIMITED, loop=ib_loop)
+
+    async def request_async():
+        await asyncio.sleep(0)
+        return threading.current_thread().name
+
+    # من خيط عادي: الدوال المتزامنة وغير المتزامنة تُنفَّذ على خيط الحلقة
+    assert scheduler.call('message', request_async) == 'ib-loop'
+    assert scheduler.call('message', lambda: threading.current_thread().name) == 'ib-loop'
+
+    # من الحلقة نفسها: call_async يقبل الدوال المتزامنة وغير المتزامنة
+    async def from_loop():
+        return (await scheduler.call_async('message', request_async),
+                await scheduler.call_async('message', lambda: threading.current_thread().name))
+
+    assert ib_loop.run(from_loop()) == ('ib-loop', 'ib-loop')
+
+
+def test_run_refuses_to_block_the_loop_thread(ib_loop):
+    async def nested():
+        ib_loop.run(asyncio.sleep(0))
+
+    with pytest.raises(RuntimeError):
+        ib_loop.run(nested())
+
+
+def test_call_later_runs_on_loop_and_can_be_cancelled(ib_loop):
+    fired = []
+    done = threading.Event()
+    ib_loop.call_later(0.01, lambda: (fired.append(threading.current_thread().name), done.set()))
+    cancelled = ib_loop.call_later(0.05, fired.append, 'cancelled')
+    cancelled.cancel()
+
+    assert done.wait(2)
+    ib_loop.run(asyncio.sleep(0.1))
+    assert fired == ['ib-loop']
@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.indicators import TechnicalIndicators
+from utils.streaming_indicators import (IndicatorState, StreamingBollinger, StreamingMACD,
+                                        StreamingRSI)
+
+RTOL = 1e-9
+
+
+@pytest.fixture(scope='module')
+def bars():
+    """سلسلة ثابتة: مسار عشوائي بنمو وتذبذب مع فترات ثبات (فروق صفرية)"""
+    rng = np.random.RandomState(7)
+    steps = rng.normal(0, 1, 300)
+    steps[100:110] = 0
+    close = 100 + np.cumsum(steps)
+    dates = pd.date_range('2024-01-02 09:30', periods=len(close), freq='15min', tz='America/New_York')
+    return pd.DataFrame({'date': dates, 'close': close})
+
+
+@pytest.fixture(scope='module')
+def indicators():
+    return TechnicalIndicators()
+
+
+def assert_series_close(streamed, expected):
+    expected = np.asarray(expected, dtype=float)
+    np.testing.assert_allclose(np.asarray(streamed, dtype=float), expected, rtol=RTOL, atol=1e-9,
+                               equal_nan=True)
+
+
+def test_indicator_state_matches_pandas_on_every_prefix(bars, indicators):
+    state = IndicatorState(rsi_period=14, ma_period=50)
+    for end in range(3, len(bars) + 1, 7):
+        frame = bars.iloc[:end]
+        values = state.sync(frame)
+        assert values is not None
+        assert values['rsi'] == pytest.approx(indicators.calculate_rsi(frame['close'], 14).iloc[-1],
+                                              rel=RTOL, nan_ok=True)
+        assert values['ma'] == pytest.approx(indicators.calculate_ma(frame['close'], 50).iloc[-1],
+                                             rel=RTOL, nan_ok=True)
+
+
+def test_live_update_of_last_bar_and_rebuild_on_history_change(bars, indicators):
+    state = IndicatorState(rsi_period=14, ma_period=50)
+    state.sync(bars.iloc[:200])
+
+    # تحديث الشمعة الأخيرة (قيد التكوين) لا يغير الحالة المغلقة
+    live = bars.iloc[:200].copy()
+    live.loc[live.index[-1], 'close'] += 3.5
+    values = state.sync(live)
+    assert values['rsi'] == pytest.approx(indicators.calculate_rsi(live['close'], 14).iloc[-1], rel=RTOL)
+    assert values['ma'] == pytest.approx(indicators.calculate_ma(live['close'], 50).iloc[-1], rel=RTOL)
+
+    # تاريخ أقصر من الحالة المحفوظة: يلزم إعادة البناء
+    assert state.sync(bars.iloc[:150]) is None
+
+
+def test_streaming_rsi_wilder_matches_pandas(bars, indicators):
+    rsi = StreamingRSI(14, wilder=True)
+    streamed = [rsi.update(price) for price in bars['close']]
+    assert_series_close(streamed, indicators.calculate_rsi(bars['close'], 14, wilder=True))
+
+
+def test_streaming_bollinger_matches_pandas(bars, indicators):
+    bands = StreamingBollinger(20, 2)
+    streamed = np.array([bands.update(price) for price in bars['close']])
+    upper, lower = indicators.calculate_bollinger_bands(bars['close'], 20, 2)
+    assert_series_close(streamed[:, 0], upper)
+    assert_series_close(streamed[:, 1], lower)
+
+
+def test_streaming_macd_matches_pandas(bars, indicators):
+    macd = StreamingMACD(12, 26, 9)
+    streamed = np.array([macd.update(price) for price in bars['close']])
+    line, signal = indicators.calculate_macd(bars['close'], 12, 26, 9)
+    assert_series_close(streamed[:, 0], line)
+    assert_series_close(streamed[:, 1], signal)
+
+
+def test_batch_path_agrees_with_indicator_state(bars, indicators):
+    # المسار الافتراضي (batch_analysis) يعيد الحساب على آخر lookback شمعة فقط
+    frame = bars.assign(open=bars['close'], high=bars['close'] + 1, low=bars['close'] - 1)
+    lookback = max(50, 14 + 1, 20) + 2
+    symbols, ohlc = indicators.stack_frames({'AAA': frame}, lookback)
+    result = indicators.analyze_batch(symbols, ohlc, 14, 50)['AAA']
+
+    values = IndicatorState(rsi_period=14, ma_period=50).sync(frame)
+    assert result['rsi'] == pytest.approx(values['rsi'], rel=1e-8)
+    assert result['ma'] == pytest.approx(values['ma'], rel=1e-8)
+
+
+@pytest.fixture(scope='module')
+def candles():
+    """شموع عدة رموز بظلال طويلة وأجسام صغيرة متكررة حتى تظهر إشارات في الاتجاهين"""
+    rng = np.random.RandomState(5)
+    frames = {}
+    for symbol in ('AAA', 'BBB', 'CCC'):
+        close = 100 + np.cumsum(rng.normal(0, 1, 120))
+        open_ = close + rng.normal(0, 0.15, len(close))
+        top, bottom = np.maximum(open_, close), np.minimum(open_, close)
+        shadows = rng.exponential(0.8, (2, len(close)))
+        frames[symbol] = pd.DataFrame({'open': open_, 'high': top + shadows[0],
+                                       'low': bottom - shadows[1], 'close': close})
+    return frames
+
+
+SETTINGS = [
+    {'use_rsi': True, 'use_ma': True, 'rsi_oversold': 45, 'rsi_overbought': 55},
+    {'use_rsi': False, 'use_ma': False, 'rsi_oversold': 30, 'rsi_overbought': 70},
+]
+
+
+def scalar_signals(indicators, frame):
+    """إشارة المسار الفردي لكل شمعة (على البيانات حتى الشمعة فقط)"""
+    return [None, None] + [indicators.identify_reversal_candles(frame.iloc[:end])
+                           for end in range(3, len(frame) + 1)]
+
+
+@pytest.mark.parametrize('settings', SETTINGS)
+def test_whole_frame_masks_match_scalar_path(candles, indicators, monkeypatch, settings):
+    monkeypatch.setattr(indicators, '_filter_settings', lambda: settings)
+    found = set()
+    for frame in candles.values():
+        buy, sell = indicators.detect_reversals(frame)
+        masks = ['reversal_up' if up else 'reversal_down' if down else None for up, down in zip(buy, sell)]
+        expected = scalar_signals(indicators, frame)
+        assert masks == expected
+        found.update(expected)
+    assert {'reversal_up', 'reversal_down'} <= found
+
+
+@pytest.mark.parametrize('settings', SETTINGS)
+def test_batch_signals_match_scalar_path(candles, indicators, monkeypatch, settings):
+    monkeypatch.setattr(indicators, '_filter_settings', lambda: settings)
+    found = set()
+    for symbol, frame in candles.items():
+        expected = scalar_signals(indicators, frame)
+        for end in range(3, len(frame) + 1):
+            symbols, ohlc = indicators.stack_frames({symbol: frame.iloc[:end]})
+            assert indicators.analyze_batch(symbols, ohlc)[symbol]['signal'] == expected[end - 1]
+        found.update(expected)
+    assert {'reversal_up', 'reversal_down'} <= found
+
+
+def test_batch_of_unequal_frames_matches_each_symbol_alone(candles, indicators):
+    frames = {symbol: frame.iloc[:90 + 10 * i] for i, (symbol, frame) in enumerate(candles.items())}
+    symbols, ohlc = indicators.stack_frames(frames)
+    together = indicators.analyze_batch(symbols, ohlc)
+
+    for symbol, frame in frames.items():
+        alone = indicators.analyze_batch(*indicators.stack_frames({symbol: frame}))[symbol]
+        for name in ('rsi', 'ma', 'upper', 'lower'):
+            assert together[symbol][name] == pytest.approx(alone[name], rel=1e-9)
+        assert together[symbol]['signal'] == alone['signal']
+        assert together[symbol]['rsi'] == pytest.approx(
+            indicators.calculate_rsi(frame['close']).iloc[-1], rel=1e-9)
+        upper, lower = indicators.calculate_bollinger_bands(frame['close'])
+        assert together[symbol]['upper'] == pytest.approx(upper.iloc[-1], rel=1e-9)
+        assert together[symbol]['lower'] == pytest.approx(lower.iloc[-1], rel=1e-9)
@@ -0,0 +1,66 @@
+import csv
+import time
+
+import pytest
+
+from sim.load_test import isolate_journal
+from utils import journal as journal_module, ledger as ledger_module
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    for module, name in ((ledger_module, '_ledger'), (journal_module, '_journal')):
+        monkeypatch.setattr(module, name, getattr(module, name))
+    monkeypatch.setattr(journal_module, 'RETRY_DELAY', 0.01)
+    journal = isolate_journal(tmp_path)
+    yield journal
+    journal.close()
+
+
+class FlakyLedger:
+    """سجل يفشل في أول failures محاولات ثم يكتب في السجل الحقيقي"""
+
+    def __init__(self, ledger, failures):
+        self.ledger = ledger
+        self.failures = failures
+        self.calls = 0
+
+    def record_many(self, records):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise OSError('database is locked')
+        self.ledger.record_many(records)
+
+
+def record(trade_id, status='OPEN'):
+    return {'trade_id': trade_id, 'timestamp': '2024-01-02 10:00:00', 'symbol': 'AAA', 'status': status}
+
+
+def test_failed_batch_is_retried_before_new_items(journal):
+    ledger = journal.ledger
+    journal.ledger = FlakyLedger(ledger, failures=3)
+
+    journal.submit(row=['2024-01-02 10:00:00', 'AAA'], record=record('t1'))
+    journal.submit(record=record('t2'))
+    deadline = time.monotonic() + 5
+    while ledger.count() < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    journal.close()
+
+    assert journal.ledger.calls >= 4
+    assert {row['trade_id'] for row in ledger.query()} == {'t1', 't2'}
+    # صف CSV كُتب مرة واحدة رغم إعادة محاولة السجل
+    with open(journal.csv_path, newline='', encoding='utf-8') as f:
+        assert len(list(csv.reader(f))) == 2
+
+
+def test_close_makes_a_last_attempt_for_a_failing_batch(journal, monkeypatch):
+    monkeypatch.setattr(journal_module, 'RETRY_DELAY', 60)
+    ledger = journal.ledger
+    journal.ledger = FlakyLedger(ledger, failures=1)
+
+    journal.submit(record=record('t1'))
+    journal.close()
+
+    assert not journal._thread.is_alive()
+    assert [row['trade_id'] for row in ledger.query()] == ['t1']
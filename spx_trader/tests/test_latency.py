@@ -0,0 +1,56 @@
+import urllib.request
+
+import numpy as np
+import pytest
+
+from utils.latency import LatencyTracker
+
+
+def test_percentiles_of_recorded_samples():
+    tracker = LatencyTracker()
+    samples = np.random.RandomState(2).exponential(0.01, 1000)
+    for value in samples:
+        tracker.record('historical', value, 'AAA')
+
+    stats = tracker.snapshot()['historical']
+    assert stats['count'] == 1000 and stats['sum'] == pytest.approx(samples.sum())
+    for name, quantile in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+        assert stats[name] == pytest.approx(np.quantile(samples, quantile))
+    assert stats['max'] == samples.max()
+    assert tracker.symbol_snapshot('historical')[('historical', 'AAA')]['count'] == 1000
+
+
+def test_window_keeps_latest_samples_but_counts_all():
+    tracker = LatencyTracker(window=100, symbol_window=10)
+    for value in range(250):
+        tracker.record('exit', float(value), 'AAA')
+
+    stats = tracker.snapshot()['exit']
+    # النسب من آخر 100 قياس (150..249) والعدد والمجموع لكل القياسات
+    assert stats['count'] == 250 and stats['sum'] == sum(range(250))
+    assert stats['p50'] == pytest.approx(np.quantile(np.arange(150, 250), 0.5))
+    assert stats['max'] == 249
+    assert tracker.symbol_snapshot()[('exit', 'AAA')]['p50'] == pytest.approx(244.5)
+
+
+def test_disabled_tracker_and_empty_stage():
+    tracker = LatencyTracker(enabled=False)
+    with tracker.time('signal', 'AAA'):
+        pass
+    assert tracker.snapshot() == {}
+    assert LatencyTracker._summarize([], 0, 0.0)['p99'] == 0.0
+
+
+def test_prometheus_endpoint():
+    tracker = LatencyTracker()
+    tracker.record('signal', 0.002, 'AAA')
+    server = tracker.serve(0)
+    try:
+        port = server.server_port
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=5) as response:
+            body = response.read().decode('utf-8')
+    finally:
+        tracker.stop_serving()
+
+    assert 'spx_stage_latency_seconds{stage="signal",quantile="0.99"} 0.002000' in body
+    assert 'spx_symbol_latency_seconds_count{stage="signal",symbol="AAA"} 1' in body
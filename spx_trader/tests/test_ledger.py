@@ -0,0 +1,91 @@
+import csv
+from datetime import datetime
+
+import pytest
+from ib_insync import Stock
+
+from utils.journal import CSV_HEADER
+from utils.ledger import TradeLedger
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = TradeLedger(path=tmp_path / 'trades.db', csv_path=tmp_path / 'none.csv')
+    yield ledger
+    ledger.close()
+
+
+def open_record(trade_id, symbol='AAA', opened='2024-01-02 10:00:00'):
+    return {'trade_id': trade_id, 'timestamp': opened, 'symbol': symbol, 'type': 'STK',
+            'qty': 10, 'entry': 100.0, 'tp': 105.0, 'sl': 97.0, 'status': 'OPEN'}
+
+
+def test_close_updates_open_trade_in_place(ledger):
+    ledger.record_trade(open_record('t1'))
+    close = TradeLedger.close_record('t1', {
+        'contract': Stock('AAA', 'SMART', 'USD'), 'entry': 100.0, 'target': 105.0, 'stop': 97.0,
+        'timestamp': datetime(2024, 1, 2, 15, 0), 'exit_price': 105.2,
+        'exit_time': datetime(2024, 1, 2, 11, 30), 'exit_reason': 'TP'
+    })
+    ledger.record_trade(close)
+    ledger.record_trade(close)  # إعادة الكتابة (مثل إعادة محاولة دفعة) لا تضيف صفًا
+
+    assert ledger.count() == 1
+    (row,) = ledger.query()
+    assert row['status'] == 'CLOSED' and row['exit_reason'] == 'TP'
+    assert row['exit_price'] == 105.2 and row['exit_time'] == '2024-01-02 11:30:00'
+    # وقت الفتح الأصلي والحقول غير الموجودة في سجل الإغلاق تبقى كما هي
+    assert row['timestamp'] == '2024-01-02 10:00:00'
+    assert row['type'] == 'STK' and row['qty'] == 10
+
+
+def test_empty_values_do_not_overwrite(ledger):
+    ledger.record_trade(open_record('t1'))
+    ledger.record_trade({'trade_id': 't1', 'timestamp': '2024-01-03 09:30:00', 'symbol': 'AAA',
+                         'type': '', 'status': 'CLOSED', 'exit_price': 99.0})
+
+    (row,) = ledger.query()
+    assert row['type'] == 'STK' and row['entry'] == 100.0
+    assert row['status'] == 'CLOSED' and row['exit_price'] == 99.0
+
+
+def test_query_filters_and_pages_newest_first(ledger):
+    ledger.record_many([open_record(f"t{i}", 'AAA' if i % 2 else 'BBB', f"2024-01-{i + 1:02d} 10:00:00")
+                        for i in range(6)])
+    ledger.record_trade({**open_record('t3', 'AAA', '2024-01-04 10:00:00'), 'status': 'CLOSED'})
+
+    assert [row['trade_id'] for row in ledger.query(symbol='AAA')] == ['t5', 't3', 't1']
+    assert [row['trade_id'] for row in ledger.query(limit=2, offset=2)] == ['t3', 't2']
+    assert ledger.count(status='OPEN') == 5
+    assert ledger.count(start='2024-01-03', end='2024-01-05 23:59:59') == 3
+
+
+def test_csv_is_imported_once(tmp_path):
+    csv_path = tmp_path / 'executed_trades.csv'
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        writer.writerow(['2024-01-02 10:00:00', 'AAA', 'CALL', '4800', '1', '5.0', '6.0', '4.0',
+                         '20240105', 'OPEN', '', ''])
+
+    first = TradeLedger(path=tmp_path / 'trades.db', csv_path=csv_path)
+    first.close()
+    ledger = TradeLedger(path=tmp_path / 'trades.db', csv_path=csv_path)
+    try:
+        (row,) = ledger.query()
+        assert row['trade_id'] == 'csv_2' and row['strike'] == '4800' and row['entry'] == 5.0
+    finally:
+        ledger.close()
+
+
+def test_late_open_record_does_not_reopen_closed_trade(ledger):
+    ledger.record_trade(open_record('t1'))
+    ledger.record_trade({'trade_id': 't1', 'timestamp': '2024-01-02 10:00:00', 'symbol': 'AAA',
+                         'status': 'CLOSED', 'exit_price': 104.0, 'exit_reason': 'TP'})
+    # سجل الفتح يصل متأخرًا (دفعة سجل مؤجلة أو معادة)
+    ledger.record_trade(open_record('t1'))
+
+    (row,) = ledger.query()
+    assert row['status'] == 'CLOSED'
+    assert row['exit_price'] == 104.0 and row['exit_reason'] == 'TP'
+    assert ledger.count(status='OPEN') == 0
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from ui.lod import PricePyramid, PyramidCache
+
+
+def assert_same_levels(pyramid, values):
+    expected = PricePyramid(values, pyramid.min_buckets)
+    assert len(pyramid.levels) == len(expected.levels)
+    for level, reference in zip(pyramid.levels, expected.levels):
+        for part, reference_part in zip(level, reference):
+            np.testing.assert_array_equal(part, reference_part)
+
+
+@pytest.fixture
+def values():
+    rng = np.random.RandomState(3)
+    values = 100 + np.cumsum(rng.normal(0, 1, 3001))
+    values[:49] = np.nan  # مثل المتوسط المتحرك قبل اكتمال فترته
+    return values
+
+
+def test_incremental_updates_match_full_rebuild(values):
+    pyramid = PricePyramid(values[:2000], min_buckets=16)
+
+    live = values[:2000].copy()
+    live[-1] += 5  # تحديث الشمعة الأخيرة
+    assert pyramid.update(live)
+    assert_same_levels(pyramid, live)
+
+    for end in (2001, 2048, 2049, 3001):  # إلحاق شموع (أطوال فردية وزوجية)
+        assert pyramid.update(values[:end])
+        assert_same_levels(pyramid, values[:end])
+
+    edited = values.copy()
+    edited[1234] -= 50  # تعديل في الوسط
+    assert pyramid.update(edited)
+    assert_same_levels(pyramid, edited)
+
+    assert pyramid.update(values[:500])  # تاريخ أقصر
+    assert_same_levels(pyramid, values[:500])
+    assert not pyramid.update(values[:500].copy())
+
+
+def test_cache_sees_middle_edit_and_in_place_changes(values):
+    cache = PyramidCache()
+    series = values[:1000].copy()
+    pyramid = cache.get('AAA', 'close', series)
+
+    # نفس الطول والقيمتين الأولى والأخيرة: التوقيع القديم كان يعيد الهرم دون تحديث
+    series[500] += 40
+    assert cache.get('AAA', 'close', series) is pyramid
+    assert_same_levels(pyramid, series)
+    xs, ys = pyramid.visible(0, 1000, 100)
+    assert np.nanmax(ys) == np.nanmax(series)
@@ -0,0 +1,103 @@
+import threading
+
+from ui.log_pipeline import LogPipeline
+
+
+class FakeRoot:
+    """بديل Tk يسجل التفريغ المجدول بـ after لتشغيله يدويًا"""
+
+    def __init__(self):
+        self.jobs = {}
+        self._ids = 0
+
+    def after(self, delay_ms, callback):
+        self._ids += 1
+        self.jobs[self._ids] = callback
+        return self._ids
+
+    def after_cancel(self, after_id):
+        self.jobs.pop(after_id, None)
+
+    def run_pending(self):
+        jobs, self.jobs = self.jobs, {}
+        for callback in jobs.values():
+            callback()
+
+
+class FakeText:
+    """بديل tk.Text بالحد الأدنى من فهارس 'سطر.عمود' المستخدمة"""
+
+    def __init__(self):
+        self.text = ''
+        self.inserts = 0
+
+    def insert(self, index, text):
+        self.text += text
+        self.inserts += 1
+
+    def get(self, start, end):
+        return '\n'.join(self.text.split('\n')[:int(end.split('.')[0]) - 1]) + '\n'
+
+    def delete(self, start, end):
+        self.text = '\n'.join(self.text.split('\n')[int(end.split('.')[0]) - 1:])
+
+    def yview(self):
+        return 0.0, 1.0
+
+    def see(self, index):
+        pass
+
+    def lines(self):
+        return self.text.splitlines()
+
+
+def make_pipeline(tmp_path, **kwargs):
+    root, output = FakeRoot(), FakeText()
+    pipeline = LogPipeline(root, output, spill_dir=tmp_path, **kwargs)
+    pipeline.start()
+    return root, output, pipeline
+
+
+def spilled(tmp_path):
+    return [line for path in sorted(tmp_path.glob('events_*.log'))
+            for line in path.read_text(encoding='utf-8').splitlines()]
+
+
+def test_batches_are_inserted_once_per_drain(tmp_path):
+    root, output, pipeline = make_pipeline(tmp_path, batch_size=50)
+    threads = [threading.Thread(target=lambda n=n: [pipeline.push(f"w{n}-{i}") for i in range(30)])
+               for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert output.text == ''  # لا شيء يلمس الواجهة قبل التفريغ
+
+    for _ in range(3):
+        root.run_pending()
+    assert output.inserts == 3
+    assert len(output.lines()) == 120 and output.lines()[0].endswith('w0-0')
+    assert len(root.jobs) == 1
+
+
+def test_ring_keeps_latest_lines_and_spills_the_rest(tmp_path):
+    root, output, pipeline = make_pipeline(tmp_path, max_lines=100, batch_size=70)
+    for i in range(250):
+        pipeline.push(f"msg {i}")
+    for _ in range(4):
+        root.run_pending()
+
+    assert [line.split('] ')[1] for line in output.lines()] == [f"msg {i}" for i in range(150, 250)]
+    assert [line.split('] ')[1] for line in spilled(tmp_path)] == [f"msg {i}" for i in range(150)]
+
+
+def test_stop_spills_undisplayed_messages(tmp_path):
+    root, output, pipeline = make_pipeline(tmp_path)
+    pipeline.push('shown')
+    root.run_pending()
+    pipeline.push('late')
+    pipeline.stop()
+
+    assert root.jobs == {}
+    assert [line.split('] ')[1] for line in output.lines()] == ['shown']
+    assert [line.split('] ')[1] for line in spilled(tmp_path)] == ['late']
@@ -0,0 +1,62 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from backtest import optimizer
+from backtest.engine import evaluate
+from backtest.optimizer import build_trials, optimize, parse_values
+
+BASE = {'rsi_period': 14, 'ma_period': 20, 'tp_pct': 2, 'sl_pct': 1, 'qty': 1,
+        'use_rsi': False, 'use_ma': True, 'rsi_oversold': 30, 'rsi_overbought': 70}
+
+
+@pytest.fixture(scope='module')
+def ohlc():
+    rng = np.random.RandomState(5)
+    close = 100 + np.cumsum(rng.normal(0, 0.8, (3, 600)), axis=1)
+    open_ = close - rng.normal(0, 0.5, close.shape)
+    spread = np.abs(rng.normal(0, 0.6, (2,) + close.shape))
+    return {'open': open_, 'high': np.maximum(open_, close) + spread[0],
+            'low': np.minimum(open_, close) - spread[1], 'close': close}
+
+
+def test_parse_values():
+    assert parse_values('10,14,21') == [10, 14, 21]
+    assert parse_values('1:2:0.25') == [1, 1.25, 1.5, 1.75, 2]
+
+
+def test_grid_and_sampled_trials():
+    space = {'rsi_period': [7, 14, 21], 'tp_pct': [1, 2.5], 'sl_pct': [1, 2]}
+    grid = build_trials(space)
+    assert [tuple(trial.values()) for trial in grid] == list(itertools.product(*space.values()))
+
+    sample = build_trials(space, samples=5, seed=3)
+    assert len(sample) == 5 and all(trial in grid for trial in sample)
+    assert len({tuple(trial.values()) for trial in sample}) == 5
+    assert sample == build_trials(space, samples=5, seed=3)
+    assert type(sample[0]['rsi_period']) is int
+    assert build_trials(space, samples=100) == grid  # عينة أكبر من الشبكة تعيد الشبكة كاملة
+
+
+def test_parallel_results_match_serial_and_are_ranked(ohlc, monkeypatch):
+    monkeypatch.setattr(optimizer, 'default_params', lambda: dict(BASE))
+    space = {'ma_period': [10, 20], 'tp_pct': [1, 2, 3], 'sl_pct': [0.5, 1, 2]}
+
+    results = optimize(ohlc, space, rank=['-max_drawdown', 'total_pnl'], workers=2, min_trades=150)
+
+    serial = {}
+    for trial in build_trials(space):
+        stats = evaluate(ohlc, {**BASE, **trial})
+        if stats['trades'] >= 150:
+            serial[tuple(trial.values())] = stats
+    assert 0 < len(results) == len(serial) < 18
+    for row in results.to_dict('records'):
+        expected = serial[tuple(row[name] for name in space)]
+        assert row['trades'] == expected['trades']
+        assert row['total_pnl'] == pytest.approx(expected['total_pnl'])
+        assert row['max_drawdown'] == pytest.approx(expected['max_drawdown'])
+
+    keys = list(zip(results['max_drawdown'], -results['total_pnl']))
+    assert keys == sorted(keys)
+    assert list(results.index) == list(range(len(results)))
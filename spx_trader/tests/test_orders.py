@@ -0,0 +1,193 @@
+import itertools
+import threading
+from types import SimpleNamespace
+
+import pytest
+from ib_insync import LimitOrder, MarketOrder, Option, OrderStatus, Stock, Trade
+
+from core.ib_loop import IBLoop
+from core.scheduler import RequestScheduler, LIMITS
+from trading.orders import (PendingOrder, attach_oca_exits, build_exit_orders, place_bracket,
+                            track_bracket_exit)
+
+UNLIMITED = {name: (1e9, 1e9) for name in LIMITS}
+
+
+class CancelRecorder:
+    """بديل IB يسجل طلبات الإلغاء وخيطها دون تغيير حالة الأمر"""
+
+    def __init__(self):
+        self.cancelled = []
+
+    def cancelOrder(self, order):
+        self.cancelled.append((order.orderId, threading.current_thread().name))
+
+
+@pytest.fixture
+def ib_loop():
+    loop = IBLoop()
+    yield loop
+    loop.stop()
+
+
+def make_trade(quantity=10):
+    order = MarketOrder('BUY', quantity)
+    order.orderId = 7
+    return Trade(contract=Stock('AAA', 'SMART', 'USD', conId=1), order=order,
+                 orderStatus=OrderStatus(orderId=7, status='Submitted', remaining=quantity))
+
+
+def track(ib, trade, ib_loop, timeout=0.05, grace=5):
+    results = {'filled': [], 'failed': [], 'thread': []}
+    done = threading.Event()
+
+    def on_filled(trade, quantity):
+        results['filled'].append(quantity)
+        results['thread'].append(threading.current_thread().name)
+        done.set()
+
+    def on_failed(trade, reason):
+        results['failed'].append(reason)
+        done.set()
+
+    order = PendingOrder(ib, trade, timeout, RequestScheduler(UNLIMITED, loop=ib_loop),
+                         on_filled, on_failed, grace=grace)
+    return order, results, done
+
+
+def cancel_with_fills(ib_loop, trade, filled):
+    def apply():
+        trade.orderStatus.filled = filled
+        trade.orderStatus.remaining = trade.order.totalQuantity - filled
+        trade.orderStatus.avgFillPrice = 100.5
+        trade.orderStatus.status = 'Cancelled'
+        trade.statusEvent.emit(trade)
+    ib_loop.call(apply)
+
+
+def test_timeout_cancels_on_loop_and_reports_partial_fill(ib_loop):
+    ib, trade = CancelRecorder(), make_trade()
+    order, results, done = track(ib, trade, ib_loop)
+
+    # المهلة تطلب الإلغاء من حلقة IB، ثم يؤكد الوسيط الإلغاء بعد تنفيذ 3 فقط
+    for _ in range(100):
+        if ib.cancelled:
+            break
+        done.wait(0.02)
+    assert ib.cancelled == [(7, 'ib-loop')]
+    assert not order.done
+
+    cancel_with_fills(ib_loop, trade, 3)
+    assert done.wait(2)
+    assert order.status == 'partial' and order.filled and order.quantity == 3
+    assert results['filled'] == [3] and results['thread'] == ['ib-loop']
+    assert results['failed'] == []
+
+
+def test_cancel_without_fills_fails(ib_loop):
+    ib, trade = CancelRecorder(), make_trade()
+    order, results, done = track(ib, trade, ib_loop, timeout=10)
+
+    cancel_with_fills(ib_loop, trade, 0)
+    assert done.wait(2)
+    assert order.status == 'failed' and not order.filled
+    assert results['filled'] == [] and len(results['failed']) == 1
+
+
+def test_grace_expiry_uses_last_known_fills(ib_loop):
+    ib, trade = CancelRecorder(), make_trade()
+    trade.orderStatus.filled = 4
+    order, results, done = track(ib, trade, ib_loop, timeout=0.02, grace=0.05)
+
+    assert done.wait(2)
+    assert order.status == 'partial'
+    assert results['filled'] == [4]
+
+
+def test_full_fill_completes_once(ib_loop):
+    ib, trade = CancelRecorder(), make_trade(2)
+    order, results, done = track(ib, trade, ib_loop, timeout=10)
+
+    def fill():
+        trade.orderStatus.filled = 2
+        trade.orderStatus.status = 'Filled'
+        trade.statusEvent.emit(trade)
+        trade.filledEvent.emit(trade)
+        trade.filledEvent.emit(trade)
+
+    ib_loop.call(fill)
+    assert done.wait(2)
+    assert order.status == 'filled' and results['filled'] == [2]
+    assert ib.cancelled == []
+
+
+class BracketIB:
+    """بديل IB يعطي أرقام أوامر متتالية ويعيد صفقة لكل أمر مرسل"""
+
+    def __init__(self, fail=False):
+        self.client = SimpleNamespace(getReqId=itertools.count(100).__next__)
+        self.placed = []
+        self.fail = fail
+
+    def placeOrder(self, contract, order):
+        if self.fail:
+            raise ConnectionError('not connected')
+        if not order.orderId:
+            order.orderId = self.client.getReqId()
+        self.placed.append(order)
+        return Trade(contract=contract, order=order, orderStatus=OrderStatus(orderId=order.orderId))
+
+
+def fill(trade, price):
+    trade.orderStatus.status, trade.orderStatus.avgFillPrice = 'Filled', price
+    trade.filledEvent.emit(trade)
+
+
+def test_bracket_children_share_oca_group_and_transmit_last():
+    ib = BracketIB()
+    contract = Stock('AAA', 'SMART', 'USD', conId=1)
+    parent, tp, sl = place_bracket(ib, contract, LimitOrder('BUY', 10, 100.0), 102.004, 98.996,
+                                   RequestScheduler(UNLIMITED))
+
+    assert [order.transmit for order in ib.placed] == [False, False, True]
+    assert tp.order.parentId == sl.order.parentId == parent.order.orderId == 100
+    assert tp.order.ocaGroup == sl.order.ocaGroup and tp.order.ocaType == 1
+    assert (tp.order.action, tp.order.orderType, tp.order.lmtPrice) == ('SELL', 'LMT', 102.0)
+    assert (sl.order.action, sl.order.orderType, sl.order.auxPrice) == ('SELL', 'STP', 99.0)
+    assert tp.order.totalQuantity == sl.order.totalQuantity == 10
+
+    # خيارات: وحدة تسعير 0.05 تحت 3 دولار
+    option = Option('SPX', '20240105', 4800, 'C', 'SMART')
+    take_profit, stop_loss = build_exit_orders(option, 'BUY', 1, 2.93, 1.97)
+    assert (take_profit.lmtPrice, stop_loss.auxPrice) == (2.95, 1.95)
+    assert take_profit.ocaGroup != build_exit_orders(option, 'BUY', 1, 2.93, 1.97)[0].ocaGroup
+
+
+def test_first_exit_fill_closes_trade_once():
+    ib, closed = BracketIB(), []
+    contract = Stock('AAA', 'SMART', 'USD', conId=1)
+    _, tp, sl = place_bracket(ib, contract, LimitOrder('SELL', 5, 100.0), 98, 101,
+                              RequestScheduler(UNLIMITED))
+    trade_info = {'status': 'open'}
+    track_bracket_exit(trade_info, tp, sl, on_closed=closed.append)
+    assert (trade_info['tp_order_id'], trade_info['sl_order_id']) == (tp.order.orderId, sl.order.orderId)
+
+    fill(sl, 101.02)
+    fill(tp, 98.0)  # الأمر الآخر في مجموعة OCA لا يغير صفقة مغلقة
+    assert trade_info['status'] == 'closed' and trade_info['exit_reason'] == 'SL'
+    assert trade_info['exit_price'] == 101.02 and closed == [trade_info]
+
+
+@pytest.mark.parametrize('fail', [False, True])
+def test_attach_oca_exits_falls_back_to_client_exits(fail):
+    ib = BracketIB(fail=fail)
+    trade_info = {'contract': Stock('AAA', 'SMART', 'USD', conId=1), 'action': 'BUY', 'quantity': 3,
+                  'target': 105.0, 'stop': 97.0, 'status': 'open'}
+    attach_oca_exits(ib, trade_info, RequestScheduler(UNLIMITED))
+
+    if fail:
+        assert trade_info['exit_mode'] == 'client' and 'tp_order_id' not in trade_info
+    else:
+        assert trade_info['exit_mode'] == 'bracket'
+        assert [order.parentId for order in ib.placed] == [0, 0]
+        assert [trade_info['tp_order_id'], trade_info['sl_order_id']] == [order.orderId for order in ib.placed]
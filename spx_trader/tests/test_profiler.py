@@ -0,0 +1,72 @@
+import threading
+import xml.etree.ElementTree as ET
+from collections import Counter
+
+from utils.profiler import SamplingProfiler, flame_svg
+
+SVG = '{http://www.w3.org/2000/svg}'
+
+
+def outer():
+    return inner()
+
+
+def inner():
+    return None
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_collapse_orders_root_to_leaf_and_merges_threads(tmp_path):
+    profiler = SamplingProfiler(interval=0.01, output_dir=tmp_path)
+    leaf_first = (inner.__code__, outer.__code__)
+    folded = profiler.collapse(Counter({('main', leaf_first): 3, ('worker;1', leaf_first): 2,
+                                        ('main', leaf_first[1:]): 1}))
+
+    outer_label = f"outer (test_profiler.py:{outer.__code__.co_firstlineno})"
+    inner_label = f"inner (test_profiler.py:{inner.__code__.co_firstlineno})"
+    assert folded == Counter({f"main;{outer_label};{inner_label}": 3,
+                              f"worker,1;{outer_label};{inner_label}": 2,  # ";" يفصل الإطارات فقط
+                              f"main;{outer_label}": 1})
+
+
+def test_flame_svg_widths_follow_sample_counts():
+    folded = Counter({'T;a;b': 3, 'T;a;c': 1, 'U;d <x>': 4, 'U;tiny': 0})
+    svg = ET.fromstring(flame_svg(folded, title='run <1>', width=800))
+
+    assert svg.find(f'{SVG}text').text == 'run <1>'
+    rects = {group.find(f'{SVG}title').text.split(' - ')[0]:
+             tuple(float(group.find(f'{SVG}rect').get(key)) for key in ('x', 'y', 'width'))
+             for group in svg.iter(f'{SVG}g')}
+    assert rects == {
+        'T': (0, 24, 400), 'a': (0, 40, 400), 'b': (0, 56, 300), 'c': (300, 56, 100),
+        'U': (400, 24, 400), 'd <x>': (400, 40, 400)
+    }
+    assert float(svg.get('height')) == 3 * 16 + 30
+
+
+def test_sampling_run_writes_folded_and_svg(tmp_path):
+    stop, finished = threading.Event(), threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name='busy-worker', daemon=True)
+    worker.start()
+    profiler = SamplingProfiler(interval=0.002, output_dir=tmp_path)
+    results = []
+    profiler.on_finished = lambda result: results.append(result) or finished.set()
+    try:
+        assert profiler.start(duration=0.2)
+        assert not profiler.start()  # تشغيل واحد فقط في الوقت نفسه
+        assert finished.wait(5)
+    finally:
+        stop.set()
+        worker.join()
+
+    (result,) = results
+    assert not profiler.running and result['samples'] > 10
+    folded = result['folded'].read_text(encoding='utf-8').splitlines()
+    assert any(line.startswith('busy-worker;') and 'busy_loop (test_profiler.py:' in line for line in folded)
+    assert not any(line.startswith('sampling-profiler;') for line in folded)
+    assert ET.parse(result['svg']).getroot().tag == f'{SVG}svg'
+    assert profiler.stop() is None
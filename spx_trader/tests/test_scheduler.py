@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+
+from core.ib_loop import IBLoop
+from core.scheduler import RequestScheduler, TokenBucket, EXIT, ENTRY, SCAN
+
+
+def test_bucket_refills_at_rate_up_to_capacity(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: clock[0])
+    bucket = TokenBucket(rate=2.0, capacity=3)
+
+    for _ in range(3):
+        assert bucket.wait_time() == 0
+        bucket.take()
+    assert bucket.wait_time() == pytest.approx(0.5)
+
+    clock[0] += 0.25
+    assert bucket.wait_time() == pytest.approx(0.25)
+    clock[0] += 10
+    assert bucket.wait_time() == 0
+    assert bucket.tokens == 3  # لا تتجاوز السعة مهما طال الانتظار
+
+
+def test_waiters_are_served_by_priority_then_arrival():
+    scheduler = RequestScheduler({'messages': (5.0, 1)})
+    scheduler.acquire('message')  # استهلاك السعة: الطلبات التالية تنتظر في الطابور
+    order = []
+
+    def request(name, priority):
+        scheduler.acquire('message', priority)
+        order.append(name)
+
+    threads = []
+    for name, priority in (('scan-1', SCAN), ('entry', ENTRY), ('scan-2', SCAN), ('exit', EXIT)):
+        thread = threading.Thread(target=request, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.005)  # ترتيب وصول ثابت قبل توفر التوكن التالي
+    for thread in threads:
+        thread.join(5)
+
+    assert order == ['exit', 'entry', 'scan-1', 'scan-2']
+    assert scheduler.metrics()['messages']['requests'] == 5
+
+
+def test_identical_inflight_requests_are_deduplicated():
+    scheduler = RequestScheduler({'messages': (1e9, 1e9)})
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_request():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'bars'
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(scheduler.call('message', slow_request, key='k')))
+    first.start()
+    started.wait(5)
+    second = threading.Thread(target=lambda: results.append(scheduler.call('message', slow_request, key='k')))
+    second.start()
+    time.sleep(0.05)
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert results == ['bars', 'bars']
+    assert len(calls) == 1 and scheduler.dedup_hits == 1
+    # بعد اكتمال الطلب يُرسل الطلب المطابق التالي من جديد
+    assert scheduler.call('message', lambda: 'fresh', key='k') == 'fresh'
+
+
+def test_blocking_call_is_refused_on_the_ib_loop():
+    ib_loop = IBLoop()
+    scheduler = RequestScheduler({'messages': (1e9, 1e9)}, loop=ib_loop)
+    try:
+        async def from_loop():
+            with pytest.raises(RuntimeError):
+                scheduler.call('message', lambda: None)
+            # submit لا ينتظر: يعود بمستقبل يكتمل على الحلقة
+            return scheduler.submit('message', lambda: threading.current_thread().name)
+
+        assert ib_loop.run(from_loop()).result(5) == 'ib-loop'
+    finally:
+        ib_loop.stop()
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    ib_loop = IBLoop()
+    scheduler = RequestScheduler({'messages': (5.0, 1)}, loop=ib_loop)
+    try:
+        scheduler.acquire('message')  # استهلاك السعة: الطلب التالي ينتظر في الطابور
+        waiter = ib_loop.spawn(scheduler.acquire_async('message', SCAN))
+        deadline = time.monotonic() + 2
+        while not scheduler.metrics()['messages']['queue_depth'] and time.monotonic() < deadline:
+            time.sleep(0.005)
+        waiter.cancel()  # مثل إيقاف المراقبة أثناء انتظار طلب فحص
+
+        deadline = time.monotonic() + 2
+        while scheduler.metrics()['messages']['queue_depth'] and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert scheduler.metrics()['messages']['queue_depth'] == 0
+
+        # طلب الفحص التالي يحصل على دوره (كان ينتظر رأس الطابور الملغى إلى الأبد)
+        acquired = threading.Thread(target=scheduler.acquire, args=('message', SCAN))
+        acquired.start()
+        acquired.join(2)
+        assert not acquired.is_alive()
+    finally:
+        ib_loop.stop()
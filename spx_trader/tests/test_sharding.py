@@ -0,0 +1,71 @@
+import pytest
+
+from core.ib_loop import IBLoop
+from core.scheduler import RequestScheduler
+from core.sharding import ShardCoordinator, partition, MAX_FAILURES, STABLE_SECONDS
+from sim.fake_ib import FakeIB
+from sim.load_test import SimTrader, UNLIMITED
+
+
+def test_partition_is_balanced_and_stable():
+    symbols = [f"S{i}" for i in range(10)]
+    shards = partition(symbols, 3)
+
+    assert shards == [symbols[0::3], symbols[1::3], symbols[2::3]]
+    assert sorted(sum(shards, [])) == sorted(symbols)
+    assert max(map(len, shards)) - min(map(len, shards)) <= 1
+    assert partition(symbols, 3) == shards
+    assert partition(['A'], 3) == [['A'], [], []]
+
+
+class DeadProcess:
+    exitcode = 1
+
+    def is_alive(self):
+        return False
+
+
+@pytest.fixture
+def coordinator(tmp_path):
+    ib_loop = IBLoop()
+    trader = SimTrader(FakeIB(), {'client_id': 1}, RequestScheduler(UNLIMITED, loop=ib_loop), tmp_path)
+    coordinator = ShardCoordinator(trader, 1)
+    coordinator.monitor.running = True
+    coordinator._log_func = lambda message: None
+    coordinator._stats = {0: coordinator._new_stats(['AAA'])}
+    coordinator._processes = {0: DeadProcess()}
+    coordinator._spawned_at = {0: 0.0}
+    yield coordinator
+    ib_loop.stop()
+
+
+def test_restart_backoff_doubles_and_gives_up(coordinator):
+    spawns = []
+
+    def spawn(index):
+        # العامل الجديد يتوقف فورًا بعد التشغيل
+        spawns.append(now)
+        coordinator._processes[index] = DeadProcess()
+        coordinator._spawned_at[index] = now
+
+    coordinator._spawn = spawn
+    now = 1.0
+    for _ in range(2000):
+        coordinator._check_workers(now)
+        now += 1
+
+    stats = coordinator._stats[0]
+    assert stats['gave_up'] and stats['failures'] == MAX_FAILURES
+    assert stats['restarts'] == MAX_FAILURES - 1
+    # التوقف يُكتشف في الفحص التالي لإعادة التشغيل (ثانية لاحقة)
+    assert spawns[0] == 1 + 5
+    assert [later - earlier - 1 for earlier, later in zip(spawns, spawns[1:])] == [10, 20, 40]
+
+
+def test_stable_worker_resets_failure_count(coordinator):
+    coordinator._stats[0]['failures'] = MAX_FAILURES - 1
+    coordinator._spawned_at[0] = 0.0
+    coordinator._check_workers(STABLE_SECONDS + 1)
+
+    assert coordinator._stats[0]['failures'] == 1
+    assert not coordinator._stats[0]['gave_up']
@@ -0,0 +1,86 @@
+import math
+
+import pytest
+from eventkit import Event
+from ib_insync import Stock, Ticker
+
+from core.subscriptions import MarketDataSubscriptions
+
+
+class DirectScheduler:
+    """بديل المجدول ينفذ الطلبات فورًا"""
+
+    def call(self, name, func, *args, priority=None, **kwargs):
+        return func(*args, **kwargs)
+
+    submit = call
+
+
+class RecordingIB:
+    def __init__(self):
+        self.pendingTickersEvent = Event('pendingTickersEvent')
+        self.subscribed, self.cancelled = [], []
+
+    def reqMktData(self, contract, *args):
+        self.subscribed.append(contract.conId)
+        return Ticker(contract=contract)
+
+    def cancelMktData(self, contract):
+        self.cancelled.append(contract.conId)
+
+
+def trade(con_id, status='open', exit_mode='client'):
+    return {'contract': Stock(f"S{con_id}", 'SMART', 'USD', conId=con_id),
+            'status': status, 'exit_mode': exit_mode}
+
+
+@pytest.fixture
+def pool():
+    ib, prices = RecordingIB(), []
+    pool = MarketDataSubscriptions(ib, lambda *args: prices.append(args), DirectScheduler())
+    return ib, pool, prices
+
+
+def test_one_subscription_per_contract_until_last_trade_closes(pool):
+    ib, subscriptions, _ = pool
+    subscriptions.subscribe('t1', trade(1))
+    subscriptions.subscribe('t2', trade(1))
+    subscriptions.subscribe('t1', trade(1))  # تكرار الصفقة نفسها لا يضيف اشتراكًا
+    assert ib.subscribed == [1] and subscriptions.active_count == 1
+
+    subscriptions.unsubscribe('t1')
+    assert ib.cancelled == [] and subscriptions.active_count == 1
+    subscriptions.unsubscribe('t2')
+    subscriptions.unsubscribe('t2')
+    assert ib.cancelled == [1] and subscriptions.active_count == 0
+
+
+def test_sync_follows_open_client_managed_trades(pool):
+    ib, subscriptions, _ = pool
+    subscriptions.sync({'t1': trade(1), 't2': trade(2), 't3': trade(3, exit_mode='bracket'),
+                        't4': trade(4, status='closed')})
+    assert sorted(ib.subscribed) == [1, 2]
+
+    subscriptions.sync({'t2': trade(2), 't5': trade(5)})
+    assert ib.cancelled == [1] and sorted(ib.subscribed) == [1, 2, 5]
+
+    subscriptions.close()
+    assert sorted(ib.cancelled) == [1, 2, 5]
+    assert len(ib.pendingTickersEvent) == 0
+
+
+def test_prices_reach_every_trade_on_the_contract(pool):
+    ib, subscriptions, prices = pool
+    subscriptions.subscribe('t1', trade(1))
+    subscriptions.subscribe('t2', trade(1))
+    ticker = subscriptions._tickers[1]
+
+    ticker.last = 101.5
+    ib.pendingTickersEvent.emit({ticker})
+    assert sorted((trade_id, price) for trade_id, _, price in prices) == [('t1', 101.5), ('t2', 101.5)]
+
+    # بدون سعر صالح لا تُستدعى المعالجة
+    prices.clear()
+    ticker.last = math.nan
+    ib.pendingTickersEvent.emit({ticker})
+    assert prices == []
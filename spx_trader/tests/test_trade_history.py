@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+import pytest
+
+from ui.trade_history import TradeHistoryWindow, COLUMNS
+from utils.ledger import TradeLedger
+
+
+class FakeTree:
+    """بديل Treeview يحفظ الصفوف المعروضة"""
+
+    def __init__(self):
+        self.rows = []
+
+    def get_children(self):
+        return list(range(len(self.rows)))
+
+    def delete(self, *items):
+        self.rows = []
+
+    def insert(self, parent, index, values):
+        self.rows.append(dict(zip([key for key, _, _ in COLUMNS], values)))
+
+
+def field(value=''):
+    return SimpleNamespace(get=lambda: value)
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = TradeLedger(path=tmp_path / 'trades.db', csv_path=tmp_path / 'none.csv')
+    # 25 صفقة على يومين لرمزين، كل ثالثة مغلقة
+    ledger.record_many([
+        {'trade_id': f"t{i}", 'timestamp': f"2024-01-0{2 + i // 15} 10:{i:02d}:00",
+         'symbol': 'AAA' if i % 2 else 'BBB', 'qty': 1, 'entry': 100.0 + i,
+         'status': 'CLOSED' if i % 3 == 0 else 'OPEN'}
+        for i in range(25)
+    ])
+    yield ledger
+    ledger.close()
+
+
+def make_window(ledger, page_size=4, symbol='', status='', start='', end=''):
+    """النافذة بدون Tk: الفلاتر والجدول بدائل بسيطة"""
+    window = TradeHistoryWindow.__new__(TradeHistoryWindow)
+    window.logger, window.ledger, window.page_size = None, ledger, page_size
+    window.page, window.total = 0, 0
+    window.symbol_entry, window.start_entry, window.end_entry = field(symbol), field(start), field(end)
+    window.status_var = field(status)
+    window.tree = FakeTree()
+    window.page_label = SimpleNamespace(config=lambda text: setattr(window, 'label', text))
+    window.apply_filters()
+    return window
+
+
+def test_pages_walk_filtered_rows_newest_first(ledger):
+    window = make_window(ledger, symbol='aaa', status='OPEN')
+    expected = [f"t{i}" for i in range(23, 0, -2) if i % 3]  # 8 صفقات
+
+    seen = []
+    for page in range(3):
+        window.show_page(page)
+        seen += [row['entry'] for row in window.tree.rows]
+    assert window.total == 8 and window.label == "صفحة 2 من 2 - 8 صفقة"
+    assert seen[:8] == [100.0 + int(trade_id[1:]) for trade_id in expected]
+    assert len(seen) == 12  # الصفحة الأخيرة تُعرض مرة أخرى عند تجاوزها
+    assert {row['symbol'] for row in window.tree.rows} == {'AAA'}
+
+
+def test_page_is_clamped_and_end_date_is_inclusive(ledger):
+    window = make_window(ledger, page_size=10, start='2024-01-02', end='2024-01-02')
+    assert window.total == 15 and window.label == "صفحة 1 من 2 - 15 صفقة"
+
+    window.show_page(-3)
+    assert window.page == 0 and len(window.tree.rows) == 10
+    window.show_page(99)
+    assert window.page == 1 and len(window.tree.rows) == 5
+    assert window.tree.rows[-1]['timestamp'] == '2024-01-02 10:00:00'
+
+
+def test_empty_result_shows_single_empty_page(ledger):
+    window = make_window(ledger, symbol='ZZZ')
+    assert window.total == 0 and window.tree.rows == []
+    assert window.label == "صفحة 1 من 1 - 0 صفقة"
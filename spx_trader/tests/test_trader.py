@@ -0,0 +1,40 @@
+from core.trader import SPXTrader
+
+
+def test_startup_errors_are_shown_when_handler_is_installed(monkeypatch):
+    # خطأ أثناء __init__ (قبل أن تثبّت الواجهة معالج العرض)
+    monkeypatch.setattr(SPXTrader, 'load_config', lambda self: self._report_error('bad config') or {})
+    trader = SPXTrader()
+
+    shown = []
+    trader.on_error = shown.append
+    assert shown == ['bad config']
+
+    trader._report_error('later')
+    trader.on_error = shown.append  # لا يُعاد عرض ما عُرض سابقًا
+    assert shown == ['bad config', 'later']
+
+
+def test_default_config_file_loads_as_the_same_defaults(tmp_path, monkeypatch):
+    from config import config as app_config, DEFAULTS
+    monkeypatch.setattr(app_config, 'config_file', tmp_path / 'config.ini')
+    app_config._create_default_config()
+    trader = SPXTrader()
+
+    assert trader.config == dict(DEFAULTS, expiry=trader.get_next_friday())
+
+    text = app_config.config_file.read_text()
+    app_config.config_file.write_text(text.replace('tp_pct = 5', 'tp_pct = 2.5')
+                                      .replace('scan_mode = async', 'scan_mode = sync'))
+    config = trader.load_config()
+    assert config['tp_pct'] == 2.5 and config['scan_mode'] == 'sync'
+
+
+def test_modules_are_loaded_once_under_the_bare_path():
+    import sys
+    import core.monitoring  # noqa: F401 - يحمّل مسار الأوامر والسجل كاملاً
+    trader = SPXTrader()
+    trader.stock_trader, trader.option_trader  # noqa: B018
+
+    # نسخة ثانية (spx_trader.utils.journal مثلاً) تعني سجلاً وخيط كتابة واتصال SQLite آخر
+    assert not [name for name in sys.modules if name.startswith('spx_trader')]
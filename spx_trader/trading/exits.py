@@ -0,0 +1,41 @@
+# trading/exits.py
+
+
+def calculate_tp_sl(entry_price, direction: int, tp_pct: float, sl_pct: float):
+    """
+    مستويات جني الربح ووقف الخسارة كنسبة مئوية من سعر الدخول
+
+    Args:
+        direction (int): 1 لمركز شراء، -1 لمركز بيع (هدف أدنى من الدخول)
+
+    Returns:
+        Tuple: (الهدف، الوقف)
+    """
+    target = entry_price * (1 + direction * tp_pct / 100)
+    stop = entry_price * (1 - direction * sl_pct / 100)
+    return target, stop
+
+
+def trade_direction(target, stop):
+    """اتجاه الصفقة من مستوياتها: الصفقات القصيرة يكون هدفها أدنى من وقف الخسارة"""
+    return 1 if target >= stop else -1
+
+
+def tp_hit(price, target, direction):
+    """هل وصل السعر للهدف (يقبل مصفوفات NumPy)"""
+    return direction * (price - target) >= 0
+
+
+def sl_hit(price, stop, direction):
+    """هل وصل السعر لوقف الخسارة (يقبل مصفوفات NumPy)"""
+    return direction * (price - stop) <= 0
+
+
+def exit_reason(price, target, stop):
+    """سبب الخروج عند هذا السعر: 'TP' أو 'SL' أو None"""
+    direction = trade_direction(target, stop)
+    if tp_hit(price, target, direction):
+        return 'TP'
+    if sl_hit(price, stop, direction):
+        return 'SL'
+    return None
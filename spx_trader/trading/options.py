@@ -1,8 +1,12 @@
 # trading/options.py
 from ib_insync import *
 import time
-from spx_trader.utils.logger import Logger  # استيراد مطلق
-from spx_trader.utils.file_manager import save_trade_to_file  # استيراد مطلق
+from utils.logger import Logger
+from utils.file_manager import save_trade_to_file
+from utils.journal import get_journal
+from trading.orders import PendingOrder, attach_oca_exits
+from trading.exits import calculate_tp_sl
+from core.scheduler import ENTRY
 
 
 class OptionTrader:
@@ -18,8 +22,9 @@ class OptionTrader:
         :param option_type: نوع الخيار (CALL/PUT)
         :param price: سعر السوق الحالي
         :param log_func: دالة تسجيل الرسائل
-        :return: bool نتيجة التنفيذ
+        :return: PendingOrder مقبض الأمر (يعود فورًا دون انتظار التنفيذ) أو False عند الفشل
         """
+        started = time.perf_counter()
         try:
             # تحديد سعر الإضراب الأقرب
             nearest_strike = self._calculate_nearest_strike(price)
@@ -28,16 +33,23 @@ class OptionTrader:
             # إنشاء عقد الخيار
             option = self._create_option_contract(option_type, nearest_strike, right)
             
-            # تأهيل العقد وتنفيذ الأمر
-            self.ib.qualifyContracts(option)
+            # تأهيل العقد (من الذاكرة المؤقتة إن وجد) وتنفيذ الأمر
+            option = self.trader.contract_cache.qualify(option, priority=ENTRY)
+            if option is None:
+                log_func("⚠️ تعذر تأهيل عقد الخيار")
+                return False
             trade = self._execute_option_order(option)
+            self.trader.latency.record('order_submit', time.perf_counter() - started, option.symbol)
             
-            # انتظار التنفيذ
-            if self._wait_for_order_execution(trade, 30):
-                return self._handle_successful_trade(trade, option_type, nearest_strike, log_func)
-            else:
-                log_func("⚠️ فشل تنفيذ الأمر في الوقت المحدد")
-                return False
+            # متابعة التنفيذ عبر الأحداث دون حجب خيط المراقبة
+            return PendingOrder(
+                self.ib, trade, 30,
+                on_filled=lambda t, quantity: self._handle_successful_trade(
+                    t, option_type, nearest_strike, log_func, quantity),
+                on_failed=lambda t, reason: log_func(f"⚠️ {reason}"),
+                scheduler=self.trader.scheduler,
+                latency=self.trader.latency
+            )
                 
         except Exception as e:
             error_msg = f"خطأ في تنفيذ أمر الخيار: {e}"
@@ -62,23 +74,22 @@ class OptionTrader:
     def _execute_option_order(self, option):
         """تنفيذ أمر السوق للخيار"""
         order = MarketOrder('BUY', self.trader.config['qty'])
-        return self.ib.placeOrder(option, order)
+        return self.trader.scheduler.call('message', self.ib.placeOrder, option, order, priority=ENTRY)
     
-    def _wait_for_order_execution(self, trade, timeout):
-        """انتظار تنفيذ الأمر مع تحديد وقت قصوى"""
-        start_time = time.time()
-        while not trade.fills and (time.time() - start_time) < timeout:
-            time.sleep(1)
-        return bool(trade.fills)
-    
-    def _handle_successful_trade(self, trade, option_type, strike, log_func):
-        """معالجة الصفقة الناجحة"""
-        entry_price = trade.fills[0].execution.price
-        log_func(f"✅ تم تنفيذ صفقة {option_type} عند Strike {strike} - السعر {entry_price:.2f}")
+    def _handle_successful_trade(self, trade, option_type, strike, log_func, quantity=None):
+        """معالجة الصفقة الناجحة (quantity: الكمية المنفذة فعلاً، قد تكون جزئية)"""
+        quantity = quantity or trade.order.totalQuantity
+        entry_price = trade.orderStatus.avgFillPrice or trade.fills[-1].execution.price
+        log_func(f"✅ تم تنفيذ صفقة {option_type} ({quantity:g}) عند Strike {strike} - السعر {entry_price:.2f}")
         
         # حساب مستويات TP/SL
         target, stop = self._calculate_tp_sl(entry_price)
         
+        # في وضع الأقواس يتولى الوسيط الخروج عبر أمرين OCA بدلاً من حلقة المراقبة
+        broker_exits = self.trader.config.get('exit_mode') == 'bracket'
+        if broker_exits:
+            log_func(f"🛡 إرسال أوامر الخروج لدى الوسيط (TP {target:.2f} / SL {stop:.2f})")
+        
         # حفظ الصفقة
         self._record_trade(
             trade=trade,
@@ -86,37 +97,47 @@ class OptionTrader:
             strike=strike,
             entry_price=entry_price,
             target=target,
-            stop=stop
+            stop=stop,
+            quantity=quantity,
+            broker_exits=broker_exits
         )
         
         return True
     
     def _calculate_tp_sl(self, entry_price):
         """حساب مستويات جني الربح ووقف الخسارة"""
-        target = entry_price * (1 + self.trader.config['tp_pct'] / 100)
-        stop = entry_price * (1 - self.trader.config['sl_pct'] / 100)
-        return target, stop
+        # الخيارات تُشترى دائمًا (CALL أو PUT)، فالهدف أعلى من سعر الدخول
+        return calculate_tp_sl(entry_price, 1, self.trader.config['tp_pct'], self.trader.config['sl_pct'])
     
-    def _record_trade(self, trade, option_type, strike, entry_price, target, stop):
+    def _record_trade(self, trade, option_type, strike, entry_price, target, stop, quantity, broker_exits=False):
         """تسجيل الصفقة في النظام"""
         trade_id = f"{option_type}_{strike}_{time.time()}"
         
-        self.current_trades[trade_id] = {
+        trade_info = {
             'trade': trade,
             'entry': entry_price,
             'target': target,
             'stop': stop,
             'option': trade.contract,
+            'contract': trade.contract,
+            'action': 'BUY',
+            'quantity': quantity,
             'status': 'open'
         }
+        if broker_exits:
+            # المعالج يعمل على حلقة IB: أوامر الخروج تُرسل دون انتظار
+            attach_oca_exits(self.ib, trade_info, self.trader.scheduler,
+                             on_closed=lambda info: get_journal().record_close(trade_id, info))
+        self.current_trades[trade_id] = trade_info
         
         save_trade_to_file(
             symbol='SPX',
             option_type=option_type,
             strike=strike,
-            qty=self.trader.config['qty'],
+            qty=quantity,
             entry=entry_price,
             tp=target,
             sl=stop,
-            expiry=self.trader.config['expiry']
+            expiry=self.trader.config['expiry'],
+            trade_id=trade_id
         )
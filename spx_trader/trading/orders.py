@@ -0,0 +1,262 @@
+# trading/orders.py
+import time
+import uuid
+import asyncio
+import threading
+import pandas as pd
+from typing import Callable, Optional
+from ib_insync import LimitOrder, StopOrder
+from utils.logger import Logger
+from core.scheduler import RequestScheduler, EXIT, ENTRY
+from utils.latency import LatencyTracker
+
+FAILED_STATUSES = ('Cancelled', 'ApiCancelled', 'Inactive')
+
+
+class PendingOrder:
+    """
+    مقبض أمر قيد التنفيذ يكتمل عبر أحداث ib_insync بدلاً من الانتظار بالاستطلاع
+
+    يعود place_order فورًا بهذا المقبض، ويُستدعى on_filled(trade, quantity) عند التنفيذ
+    الكامل أو الجزئي (أمر أُلغي أو انتهت مهلته بعد تنفيذ جزء منه)، و on_failed عند
+    الإلغاء/الرفض/انتهاء المهلة دون أي تنفيذ. عند انتهاء المهلة يُلغى الأمر لدى الوسيط
+    ثم تُنتظر حالته النهائية (حتى grace ثانية) لمعرفة الكمية المنفذة فعلاً.
+    المؤقتات تعمل على حلقة IB التي تصل عليها أحداث الأمر.
+    """
+
+    def __init__(self, ib, trade, timeout: float, scheduler: RequestScheduler,
+                 on_filled: Callable, on_failed: Optional[Callable] = None,
+                 latency: LatencyTracker = None, grace: float = 5):
+        self.ib = ib
+        self.trade = trade
+        self.logger = Logger()
+        self.scheduler = scheduler
+        self.latency = latency
+        self.started = time.perf_counter()
+        self.on_filled = on_filled
+        self.on_failed = on_failed
+        self.grace = grace
+        self.status = 'working'
+        self.quantity = 0
+        self._timed_out = False
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+        trade.filledEvent += self._on_filled
+        trade.statusEvent += self._on_status
+        self._timer = self._call_later(timeout, self._on_timeout)
+
+        # الأمر قد يُنفَّذ أو يُلغى قبل ربط الأحداث
+        if trade.orderStatus.status == 'Filled':
+            self._on_filled(trade)
+        elif trade.orderStatus.status in FAILED_STATUSES:
+            self._on_status(trade)
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def filled(self) -> bool:
+        """تم فتح مركز (كامل أو جزئي)"""
+        return self.status in ('filled', 'partial')
+
+    def wait(self, timeout: float = None) -> bool:
+        """انتظار اكتمال الأمر (للاستخدام خارج مسار المراقبة فقط)"""
+        self._done.wait(timeout)
+        return self.filled
+
+    def cancel(self):
+        """إلغاء الأمر إذا كان لا يزال قيد التنفيذ (الكمية المنفذة قبل الإلغاء تُبلَّغ عبر on_filled)"""
+        if not self.done:
+            self._request_cancel()
+
+    def _on_filled(self, trade):
+        self._settle(trade)
+
+    def _on_status(self, trade):
+        if trade.orderStatus.status in FAILED_STATUSES:
+            self._settle(trade, f"حالة الأمر: {trade.orderStatus.status}")
+
+    def _on_timeout(self):
+        """انتهاء المهلة: طلب الإلغاء وانتظار الحالة النهائية لمعرفة ما نُفذ"""
+        if self.done:
+            return
+        self._timed_out = True
+        self._request_cancel()
+        self._timer = self._call_later(self.grace, self._on_grace_expired)
+
+    def _on_grace_expired(self):
+        # لم تصل حالة نهائية بعد الإلغاء: الاعتماد على آخر كمية منفذة معروفة
+        self._settle(self.trade, "لم يؤكد الوسيط إلغاء الأمر بعد انتهاء المهلة")
+
+    def _settle(self, trade, reason: str = None):
+        """إنهاء المقبض حسب الكمية المنفذة: كامل أو جزئي أو فشل"""
+        filled = trade.orderStatus.filled or sum(fill.execution.shares for fill in trade.fills)
+        if trade.orderStatus.status == 'Filled':
+            status = 'filled'
+        elif filled > 0:
+            status = 'partial'
+        else:
+            status = 'timeout' if self._timed_out else 'failed'
+        if not self._complete(status):
+            return
+
+        if status == 'timeout':
+            reason = "فشل تنفيذ الأمر في الوقت المحدد"
+        if not self.filled:
+            self._notify_failed(reason)
+            return
+
+        self.quantity = filled
+        if status == 'partial':
+            self.logger.warning(f"⚠️ تنفيذ جزئي للأمر {trade.order.orderId}: "
+                                f"{filled:g} من {trade.order.totalQuantity:g} ({reason})")
+        if self.latency:
+            self.latency.record('fill_wait', time.perf_counter() - self.started, trade.contract.symbol)
+        try:
+            self.on_filled(trade, filled)
+        except Exception as e:
+            self.logger.error(f"خطأ في معالجة تنفيذ الأمر: {e}")
+
+    def _complete(self, status: str) -> bool:
+        """إنهاء المقبض مرة واحدة فقط وفصل الأحداث"""
+        with self._lock:
+            if self._done.is_set():
+                return False
+            self.status = status
+            self._done.set()
+
+        self._timer.cancel()
+        self.trade.filledEvent -= self._on_filled
+        self.trade.statusEvent -= self._on_status
+        return True
+
+    def _request_cancel(self):
+        """إرسال الإلغاء دون حجب حلقة IB"""
+        self.scheduler.submit('message', self.ib.cancelOrder, self.trade.order, priority=EXIT)
+
+    def _call_later(self, delay: float, func: Callable):
+        """مؤقت على حلقة IB (أو خيط مؤقت عند عدم وجودها كما في الاختبارات)"""
+        if self.scheduler.loop is not None:
+            return self.scheduler.loop.call_later(delay, func)
+        timer = threading.Timer(delay, func)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def _notify_failed(self, reason: str):
+        try:
+            if self.on_failed:
+                self.on_failed(self.trade, reason)
+        except Exception as e:
+            self.logger.error(f"خطأ في معالجة فشل الأمر: {e}")
+
+
+def resize_exits(ib, exits, quantity, scheduler: RequestScheduler):
+    """تعديل كمية أوامر الخروج المرفقة لتطابق الكمية المنفذة فعلاً (تنفيذ جزئي)"""
+    for exit_trade in exits:
+        if exit_trade.order.totalQuantity != quantity:
+            exit_trade.order.totalQuantity = quantity
+            scheduler.submit('message', ib.placeOrder, exit_trade.contract, exit_trade.order, priority=EXIT)
+
+
+def round_to_tick(price: float, contract) -> float:
+    """تقريب السعر لأقرب وحدة تسعير يقبلها الوسيط"""
+    if contract.secType == 'OPT':
+        # خيارات SPX/SPXW: 0.05 تحت 3 دولار و 0.10 فوقها
+        tick = 0.05 if price < 3 else 0.10
+    else:
+        tick = 0.01
+    return round(round(price / tick) * tick, 2)
+
+
+def build_exit_orders(contract, action: str, quantity, target: float, stop: float, parent_id: int = 0):
+    """أمرا جني الربح ووقف الخسارة في مجموعة OCA واحدة (تنفيذ أحدهما يلغي الآخر)"""
+    close_action = 'SELL' if action == 'BUY' else 'BUY'
+    oca_group = f"OCA_{uuid.uuid4().hex[:12]}"
+    take_profit = LimitOrder(
+        close_action, quantity, round_to_tick(target, contract),
+        ocaGroup=oca_group, ocaType=1, parentId=parent_id
+    )
+    stop_loss = StopOrder(
+        close_action, quantity, round_to_tick(stop, contract),
+        ocaGroup=oca_group, ocaType=1, parentId=parent_id
+    )
+    return take_profit, stop_loss
+
+
+def place_bracket(ib, contract, parent_order, target: float, stop: float, scheduler: RequestScheduler):
+    """
+    إرسال أمر الدخول كأمر أب مع أمري خروج مرفقين لدى الوسيط
+    
+    Returns:
+        Tuple: (صفقة الدخول، صفقة جني الربح، صفقة وقف الخسارة)
+    """
+    parent_order.orderId = ib.client.getReqId()
+    parent_order.transmit = False
+    take_profit, stop_loss = build_exit_orders(
+        contract, parent_order.action, parent_order.totalQuantity,
+        target, stop, parent_order.orderId
+    )
+    take_profit.transmit = False
+    stop_loss.transmit = True  # إرسال آخر أمر ينقل المجموعة كاملة
+
+    parent_trade = scheduler.call('message', ib.placeOrder, contract, parent_order, priority=ENTRY)
+    tp_trade = scheduler.call('message', ib.placeOrder, contract, take_profit, priority=ENTRY)
+    sl_trade = scheduler.call('message', ib.placeOrder, contract, stop_loss, priority=ENTRY)
+    return parent_trade, tp_trade, sl_trade
+
+
+async def place_oca_exits(ib, contract, action: str, quantity, target: float, stop: float,
+                          scheduler: RequestScheduler):
+    """إرسال أمري خروج OCA لمركز تم تنفيذه (عندما لا يُعرف سعر الدخول مسبقًا)"""
+    take_profit, stop_loss = build_exit_orders(contract, action, quantity, target, stop)
+    return (await scheduler.call_async('message', ib.placeOrder, contract, take_profit, priority=EXIT),
+            await scheduler.call_async('message', ib.placeOrder, contract, stop_loss, priority=EXIT))
+
+
+def attach_oca_exits(ib, trade_info: dict, scheduler: RequestScheduler, on_closed: Optional[Callable] = None):
+    """
+    إرفاق أمري خروج OCA بالصفقة دون حجب معالج التنفيذ (على حلقة IB)
+
+    تُعلَّم الصفقة فورًا بوضع الأقواس، وتعود للخروج من جهة العميل إذا فشل الإرسال.
+    """
+    trade_info['exit_mode'] = 'bracket'
+
+    async def attach():
+        try:
+            exits = await place_oca_exits(ib, trade_info['contract'], trade_info['action'], trade_info['quantity'],
+                                          trade_info['target'], trade_info['stop'], scheduler)
+            track_bracket_exit(trade_info, *exits, on_closed=on_closed)
+        except Exception as e:
+            trade_info['exit_mode'] = 'client'
+            Logger().error(f"فشل إرسال أوامر الخروج لدى الوسيط - المتابعة من جهة العميل: {e}")
+
+    if scheduler.loop is None:
+        return asyncio.run(attach())
+    return scheduler.loop.spawn(attach())
+
+
+def track_bracket_exit(trade_info: dict, tp_trade, sl_trade, on_closed: Optional[Callable] = None):
+    """تسجيل أرقام أوامر الخروج وتحديث الصفقة عند تنفيذ أحدها لدى الوسيط"""
+    trade_info.update({
+        'exit_mode': 'bracket',
+        'tp_order_id': tp_trade.order.orderId,
+        'sl_order_id': sl_trade.order.orderId
+    })
+
+    def filled(trade, reason):
+        if trade_info.get('status') != 'open':
+            return
+        trade_info.update({
+            'status': 'closed',
+            'exit_price': trade.orderStatus.avgFillPrice,
+            'exit_time': pd.Timestamp.now(),
+            'exit_reason': reason
+        })
+        if on_closed:
+            on_closed(trade_info)
+
+    tp_trade.filledEvent += lambda trade: filled(trade, 'TP')
+    sl_trade.filledEvent += lambda trade: filled(trade, 'SL')
@@ -1,7 +1,13 @@
 # trading/stocks.py
 import time
 from ib_insync import *
-from spx_trader.utils.logger import Logger  # استيراد مطلق
+from utils.logger import Logger
+from trading.orders import (PendingOrder, attach_oca_exits, place_bracket, resize_exits,
+                            track_bracket_exit)
+from trading.exits import calculate_tp_sl
+from core.scheduler import ENTRY
+from utils.file_manager import save_trade_to_file
+from utils.journal import get_journal
 
  #-------------------------
 class StockTrader:
@@ -10,7 +16,7 @@ class StockTrader:
         self.trader = trader
         self.ib = trader.ib
         self.logger = Logger()
-        self.current_trades = {}  # تمت الإضافة: قاموس لتتبع الصفقات المفتوحة
+        self.current_trades = trader.current_trades  # مشترك مع المراقب لمتابعة TP/SL
         self.config = trader.config  # تمت الإضافة: تكوين متسق
     
     def place_order(self, symbol, action, price=None, order_type='MARKET'):
@@ -21,11 +27,15 @@ class StockTrader:
             action (str): 'CALL' للشراء، 'PUT' للبيع
             price (float): السعر المطلوب لأوامر الحد/الإيقاف
             order_type (str): 'MARKET' للطلب السوقي، 'LIMIT' للحد، 'STOP' للإيقاف
+        
+        يعود فورًا بمقبض PendingOrder، أو False عند فشل إرسال الأمر
         """
+        started = time.perf_counter()
         try:
             # إنشاء عقد السهم والتأهل
-            contract = Stock(symbol, 'SMART', 'USD')
-            self.ib.qualifyContracts(contract)
+            contract = self.trader.contract_cache.qualify(Stock(symbol, 'SMART', 'USD'), priority=ENTRY)
+            if contract is None:
+                raise ValueError(f"تعذر تأهيل عقد {symbol}")
             
             # إنشاء نوع الأمر المناسب
             if order_type.upper() == 'MARKET':
@@ -42,52 +52,23 @@ class StockTrader:
             else:
                 raise ValueError("نوع أمر غير صالح أو سعر مفقود")
             
-            # تنفيذ الأمر
-            trade = self.ib.placeOrder(contract, order)
-            
-            # انتظار تنفيذ الصفقة بحد أقصى 30 ثانية
-            start_time = time.time()
-            while not trade.fills and (time.time() - start_time) < 30:
-                time.sleep(1)
-            
-            # إذا تم تنفيذ الصفقة
-            if trade.fills:
-                entry_price = trade.fills[0].execution.price
-                self.logger.info(f"✅ [{symbol}] تم تنفيذ صفقة {action} عند السعر {entry_price:.2f}")
-                
-                # حساب أهداف الربح ووقف الخسارة
-                if action == 'CALL':
-                    target = entry_price * (1 + self.config['tp_pct'] / 100)
-                    stop = entry_price * (1 - self.config['sl_pct'] / 100)
-                else:  # PUT
-                    target = entry_price * (1 - self.config['tp_pct'] / 100)
-                    stop = entry_price * (1 + self.config['sl_pct'] / 100)
-                
-                # تسجيل الصفقة الجارية
-                trade_id = f"{symbol}_{action}_{int(time.time())}"
-                self.current_trades[trade_id] = {
-                    'trade': trade,
-                    'entry': entry_price,
-                    'target': target,
-                    'stop': stop,
-                    'contract': contract,
-                    'status': 'open',
-                    'type': 'stock'
-                }
-                
-                # حفظ الصفقة في الملف
-                self._save_trade_to_file(
-                    symbol=symbol,
-                    action=action,
-                    qty=self.config['qty'],
-                    entry=entry_price,
-                    tp=target,
-                    sl=stop
-                )
-                return True
+            # تنفيذ الأمر (كأمر أب مع أوامر خروج مرفقة في وضع الأقواس)
+            exits = None
+            if self.config.get('exit_mode') == 'bracket' and price:
+                target, stop = self._calculate_tp_sl(price, action)
+                trade, *exits = place_bracket(self.ib, contract, order, target, stop, self.trader.scheduler)
             else:
-                self.logger.warning(f"⚠️ [{symbol}] فشل تنفيذ الأمر في الوقت المحدد")
-                return False
+                trade = self.trader.scheduler.call('message', self.ib.placeOrder, contract, order, priority=ENTRY)
+            self.trader.latency.record('order_submit', time.perf_counter() - started, symbol)
+            
+            # متابعة التنفيذ عبر الأحداث (حد أقصى 30 ثانية) دون حجب خيط المراقبة
+            return PendingOrder(
+                self.ib, trade, 30,
+                on_filled=lambda t, quantity: self._handle_fill(t, symbol, action, contract, exits, quantity),
+                on_failed=lambda t, reason: self.logger.warning(f"⚠️ [{symbol}] {reason}"),
+                scheduler=self.trader.scheduler,
+                latency=self.trader.latency
+            )
                 
         except ValueError as ve:
             self.logger.error(f"خطأ في التحقق من صحة الأمر: {ve}")
@@ -96,7 +77,67 @@ class StockTrader:
             self.logger.error(f"خطأ في تنفيذ أمر السهم: {e}")
             return False
     
+    def _handle_fill(self, trade, symbol, action, contract, exits=None, quantity=None):
+        """تسجيل الصفقة بعد تنفيذ أمر الدخول (quantity: الكمية المنفذة فعلاً، قد تكون جزئية)"""
+        quantity = quantity or trade.order.totalQuantity
+        entry_price = trade.orderStatus.avgFillPrice or trade.fills[-1].execution.price
+        self.logger.info(f"✅ [{symbol}] تم تنفيذ صفقة {action} ({quantity:g}) عند السعر {entry_price:.2f}")
+        
+        if exits:
+            # المستويات المرسلة مع الأمر الأب هي المعتمدة لدى الوسيط
+            take_profit, stop_loss = exits
+            target, stop = take_profit.order.lmtPrice, stop_loss.order.auxPrice
+            resize_exits(self.ib, exits, quantity, self.trader.scheduler)
+        else:
+            target, stop = self._calculate_tp_sl(entry_price, action)
+        
+        # تسجيل الصفقة الجارية
+        trade_id = f"{symbol}_{action}_{int(time.time())}"
+        trade_info = {
+            'trade': trade,
+            'entry': entry_price,
+            'target': target,
+            'stop': stop,
+            'contract': contract,
+            'action': trade.order.action,
+            'quantity': quantity,
+            'status': 'open',
+            'type': 'stock'
+        }
+        on_closed = lambda info: get_journal().record_close(trade_id, info)
+        if exits:
+            track_bracket_exit(trade_info, *exits, on_closed=on_closed)
+        elif self.config.get('exit_mode') == 'bracket':
+            # المعالج يعمل على حلقة IB: أوامر الخروج تُرسل دون انتظار
+            attach_oca_exits(self.ib, trade_info, self.trader.scheduler, on_closed=on_closed)
+        self.current_trades[trade_id] = trade_info
+        
+        # حفظ الصفقة في الملف
+        self._save_trade_to_file(
+            trade_id=trade_id,
+            symbol=symbol,
+            action=action,
+            qty=quantity,
+            entry=entry_price,
+            tp=target,
+            sl=stop
+        )
+    
+    def _calculate_tp_sl(self, entry_price, action):
+        """حساب أهداف الربح ووقف الخسارة حسب اتجاه الصفقة"""
+        direction = 1 if action == 'CALL' else -1  # PUT = مركز بيع
+        return calculate_tp_sl(entry_price, direction, self.config['tp_pct'], self.config['sl_pct'])
+    
     def _save_trade_to_file(self, **trade_data):
         """طريقة خاصة لحفظ تفاصيل الصفقة في ملف"""
-        # سيتم تنفيذ الوظيفة هنا
-        pass
+        save_trade_to_file(
+            symbol=trade_data['symbol'],
+            option_type=trade_data['action'],
+            strike='',
+            qty=trade_data['qty'],
+            entry=trade_data['entry'],
+            tp=trade_data['tp'],
+            sl=trade_data['sl'],
+            expiry='',
+            trade_id=trade_data['trade_id']
+        )
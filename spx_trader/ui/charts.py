@@ -1,15 +1,33 @@
 # ui/charts.py
+import time
 import tkinter as tk
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
+import numpy as np
 import pandas as pd
 from config import config
 from utils.logger import Logger
+from utils.indicators import TechnicalIndicators
+from ui.lod import PyramidCache
 
 class TradingCharts:
     def __init__(self, parent_frame):
         self.logger = Logger()
+        self.indicators = TechnicalIndicators()
         self.parent = parent_frame
+        self.render_mode = config.get('chart_render_mode', 'incremental')
+        # 0 أو قيمة سالبة تلغي تحديد معدل الرسم (بدلاً من القسمة على صفر)
+        self.max_fps = max(0.0, float(config.get('chart_max_fps', 10) or 0))
+        self._artists = None
+        self._background = None
+        self._pending_df = None
+        self._redraw_job = None
+        self._last_render = 0.0
+        self.pyramids = PyramidCache()
+        self._series = None
+        self._length = 0
+        self._zoomed = False
+        self._applying_lod = False
         self.setup_chart()
 
     def setup_chart(self):
@@ -21,6 +39,8 @@ class TradingCharts:
             
             self.canvas = FigureCanvasTkAgg(self.figure, master=self.parent)
             self.canvas.get_tk_widget().pack_forget()  # مخفي بشكل افتراضي
+            self.canvas.mpl_connect('draw_event', self._on_draw)
+            self.canvas.mpl_connect('scroll_event', self._on_scroll)
         except Exception as e:
             self.logger.error(f"خطأ في تهيئة الرسم البياني: {e}")
 
@@ -31,12 +51,152 @@ class TradingCharts:
         for spine in self.chart.spines.values():
             spine.set_color('#7F8C8D')
 
-    def update_chart(self, df: pd.DataFrame):
-        """تحديث الرسم البياني ببيانات جديدة"""
+    def update_chart(self, df: pd.DataFrame, symbol: str = None):
+        """تحديث الرسم البياني ببيانات جديدة (بحد أقصى max_fps تحديث في الثانية، 0 بلا حد)"""
+        if not hasattr(self, 'chart'):
+            return
+
+        self._pending_df = (df, symbol)
+        if self._redraw_job is not None:
+            return  # تحديث مجدول بالفعل وسيستخدم أحدث البيانات
+
+        interval = 1 / self.max_fps if self.max_fps else 0
+        delay = self._last_render + interval - time.monotonic()
+        if delay > 0:
+            self._redraw_job = self.canvas.get_tk_widget().after(int(delay * 1000) + 1, self._render_pending)
+        else:
+            self._render_pending()
+
+    def _render_pending(self):
+        self._redraw_job = None
+        pending, self._pending_df = self._pending_df, None
+        if pending is None:
+            return
+        df, symbol = pending
+        self._last_render = time.monotonic()
+        if self.render_mode == 'incremental':
+            self._render_incremental(df, symbol)
+        else:
+            self._render_full(df)
+
+    def _create_artists(self):
+        """إنشاء عناصر الرسم مرة واحدة ثم تحديثها لاحقًا بـ set_data"""
+        self.chart.clear()
+        self._apply_chart_style()
+        price_line, = self.chart.plot([], [], label='السعر', color='#3498DB',
+                                      linewidth=1.5, animated=True)
+        ma_line, = self.chart.plot([], [], label=f"MA {config.get('ma_period', 50)}",
+                                   color='#E74C3C', linestyle='--', linewidth=1.2, animated=True)
+        buy_markers = self.chart.scatter([], [], marker='^', s=100, color='#2ECC71',
+                                         label='إشارة شراء', animated=True)
+        sell_markers = self.chart.scatter([], [], marker='v', s=100, color='#E74C3C',
+                                          label='إشارة بيع', animated=True)
+        self._artists = {
+            'price': price_line,
+            'ma': ma_line,
+            'buy': buy_markers,
+            'sell': sell_markers
+        }
+        self.chart.callbacks.connect('xlim_changed', self._on_xlim_changed)
+        self._finalize_chart()
+        self._background = None
+
+    def _render_incremental(self, df: pd.DataFrame, symbol: str = None):
+        """تحديث البيانات في العناصر الموجودة ورسم منطقة المحاور فقط (blitting)"""
+        try:
+            if self._artists is None:
+                self._create_artists()
+
+            x = np.arange(len(df))
+            close = df['close'].values
+            ma = self.indicators.calculate_ma(df['close'], config.get('ma_period', 50))
+            buy, sell = self.indicators.detect_reversals(df, ma=ma)
+
+            # الخطوط تُرسم من هرم مستويات التفصيل فيبقى عدد النقاط بحدود عرض الرسم
+            symbol = symbol or 'default'
+            self._series = {
+                'price': self.pyramids.get(symbol, 'close', close),
+                'ma': self.pyramids.get(symbol, f"ma_{config.get('ma_period', 50)}", ma.values)
+            }
+            self._length = len(df)
+            self._artists['ma'].set_visible(bool(config.get('use_ma', False)))
+            self._artists['buy'].set_offsets(np.column_stack([x[buy], close[buy]]))
+            self._artists['sell'].set_offsets(np.column_stack([x[sell], close[sell]]))
+
+            limits_changed = not self._zoomed and self._limits_changed(x, close)
+            self._apply_lod()
+            if self._background is None or limits_changed:
+                # تغيرت حدود المحاور: رسم كامل واحد يعيد التقاط الخلفية
+                self.canvas.draw()
+            else:
+                self._blit()
+        except Exception as e:
+            self.logger.error(f"خطأ في تحديث الرسم البياني: {e}")
+
+    def _limits_changed(self, x, close) -> bool:
+        """توسيع المحاور عند خروج البيانات عن النطاق الحالي"""
+        if not len(x):
+            return False
+        x_min, x_max = self.chart.get_xlim()
+        y_min, y_max = self.chart.get_ylim()
+        low, high = np.nanmin(close), np.nanmax(close)
+        if x[0] >= x_min and x[-1] <= x_max and low >= y_min and high <= y_max:
+            return False
+        margin = (high - low) * 0.05 or 1
+        self.chart.set_xlim(x[0], x[0] + max(len(x) * 1.1, 10))
+        self.chart.set_ylim(low - margin, high + margin)
+        return True
+
+    def _apply_lod(self):
+        """اختيار مستوى التفصيل المناسب للنطاق المرئي وعرض الرسم بالبكسل"""
+        if not self._series:
+            return
+        x_min, x_max = self.chart.get_xlim()
+        pixels = self.chart.bbox.width
+        for name, pyramid in self._series.items():
+            self._artists[name].set_data(*pyramid.visible(x_min, x_max, pixels))
+
+    def _on_xlim_changed(self, axes):
+        if self._applying_lod:
+            return
+        self._applying_lod = True
         try:
-            if not hasattr(self, 'chart'):
-                return
+            self._apply_lod()
+        finally:
+            self._applying_lod = False
+
+    def _on_scroll(self, event):
+        """تكبير/تصغير المحور الأفقي حول موضع المؤشر بعجلة الفأرة"""
+        if event.inaxes is not self.chart or not self._length:
+            return
+        x_min, x_max = self.chart.get_xlim()
+        scale = 0.8 if event.button == 'up' else 1.25
+        span = min(max((x_max - x_min) * scale, 10), self._length * 1.1)
+        ratio = (event.xdata - x_min) / (x_max - x_min)
+        new_min = max(event.xdata - span * ratio, 0)
+        # الرجوع للعرض الكامل يعيد متابعة البيانات الجديدة تلقائيًا
+        self._zoomed = span < self._length
+        self.chart.set_xlim(new_min, new_min + span)
+        self.canvas.draw_idle()
 
+    def _on_draw(self, event):
+        """التقاط خلفية المحاور بعد كل رسم كامل ثم رسم العناصر المتحركة فوقها"""
+        if self._artists is None:
+            return
+        self._background = self.canvas.copy_from_bbox(self.chart.bbox)
+        for artist in self._artists.values():
+            self.chart.draw_artist(artist)
+
+    def _blit(self):
+        self.canvas.restore_region(self._background)
+        for artist in self._artists.values():
+            self.chart.draw_artist(artist)
+        self.canvas.blit(self.chart.bbox)
+
+    def _render_full(self, df: pd.DataFrame):
+        """إعادة رسم كاملة (وضع full)"""
+        try:
+            self._artists = None
             self.chart.clear()
             
             # رسم خط السعر
@@ -46,9 +206,9 @@ class TradingCharts:
                           linewidth=1.5)
             
             # رسم المتوسط المتحرك إذا كان مفعلاً
+            ma_period = config.get('ma_period', 50)
+            df['ma'] = self.indicators.calculate_ma(df['close'], ma_period)
             if config.get('use_ma', False):
-                ma_period = config.get('ma_period', 50)
-                df['ma'] = df['close'].rolling(window=ma_period).mean()
                 self.chart.plot(df.index, df['ma'], 
                               label=f'MA {ma_period}', 
                               color='#E74C3C',
@@ -65,37 +225,23 @@ class TradingCharts:
 
     def _plot_reversal_signals(self, df):
         """رسم إشارات الانعكاس على الرسم البياني"""
-        for i in range(2, len(df)):
-            candle = df.iloc[i]
-            prev = df.iloc[i-1]
-            before_prev = df.iloc[i-2]
-            
-            body = abs(candle['close'] - candle['open'])
-            candle_range = candle['high'] - candle['low']
-            
-            if candle_range == 0:
-                continue
-                
-            upper_shadow = candle['high'] - max(candle['close'], candle['open'])
-            lower_shadow = min(candle['close'], candle['open']) - candle['low']
-            
-            # إشارة شراء (انعكاس صاعد)
-            if (prev['close'] < before_prev['close'] and 
-                lower_shadow > 2 * body and 
-                body < candle_range * 0.3):
-                self.chart.plot(i, candle['close'], '^', 
-                              markersize=10, 
-                              color='#2ECC71',
-                              label='إشارة شراء' if i == 2 else "")
-            
-            # إشارة بيع (انعكاس هابط)
-            elif (prev['close'] > before_prev['close'] and 
-                  upper_shadow > 2 * body and 
-                  body < candle_range * 0.3):
-                self.chart.plot(i, candle['close'], 'v', 
-                              markersize=10, 
-                              color='#E74C3C',
-                              label='إشارة بيع' if i == 2 else "")
+        buy, sell = self.indicators.detect_reversals(df, ma=df['ma'])
+        
+        # إشارة شراء (انعكاس صاعد)
+        if buy.any():
+            self.chart.plot(df.index[buy], df['close'].values[buy], '^',
+                          markersize=10,
+                          linestyle='none',
+                          color='#2ECC71',
+                          label='إشارة شراء')
+        
+        # إشارة بيع (انعكاس هابط)
+        if sell.any():
+            self.chart.plot(df.index[sell], df['close'].values[sell], 'v',
+                          markersize=10,
+                          linestyle='none',
+                          color='#E74C3C',
+                          label='إشارة بيع')
 
     def _finalize_chart(self):
         """إعدادات نهائية للرسم البياني"""
@@ -116,6 +262,7 @@ class TradingCharts:
                                            expand=True, 
                                            padx=10, 
                                            pady=5)
+
     def plot_indicators(self, df):
-    df['ma'] = self.indicators.calculate_ma(df['close'])
-    self.ax.plot(df.index, df['ma'], label='Moving Average')
+        df['ma'] = self.indicators.calculate_ma(df['close'])
+        self.chart.plot(df.index, df['ma'], label='Moving Average')
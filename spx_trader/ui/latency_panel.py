@@ -0,0 +1,95 @@
+# ui/latency_panel.py
+import tkinter as tk
+from tkinter import ttk
+from utils.logger import Logger
+from utils.latency import STAGES, LatencyTracker
+
+COLUMNS = [
+    ('name', 'المرحلة', 150),
+    ('count', 'العدد', 80),
+    ('p50', 'p50 (مللي ث)', 100),
+    ('p95', 'p95 (مللي ث)', 100),
+    ('p99', 'p99 (مللي ث)', 100),
+    ('max', 'الأقصى (مللي ث)', 110)
+]
+
+
+class LatencyWindow:
+    """نافذة زمن الاستجابة: توزيع كل مرحلة وأبطأ الرموز فيها، بتحديث دوري"""
+
+    def __init__(self, root, style_config, tracker: LatencyTracker,
+                 refresh_ms: int = 1000, top_symbols: int = 50):
+        self.logger = Logger()
+        self.tracker = tracker
+        self.style_config = style_config
+        self.refresh_ms = refresh_ms
+        self.top_symbols = top_symbols
+
+        self.window = tk.Toplevel(root)
+        self.window.title("زمن الاستجابة")
+        self.window.geometry("750x600")
+
+        self.stage_tree = self._create_table("المراحل", COLUMNS, height=len(STAGES))
+        self._create_symbol_filter()
+        self.symbol_tree = self._create_table("أبطأ الرموز (حسب p95)", COLUMNS, height=15)
+        self.symbol_tree.heading('name', text='الرمز')
+        self.refresh()
+
+    def _create_table(self, title, columns, height):
+        """إنشاء جدول مقاييس"""
+        frame = ttk.LabelFrame(self.window, text=title, **self.style_config['frame'])
+        frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        tree = ttk.Treeview(frame, columns=[c[0] for c in columns], show='headings', height=height)
+        for key, heading, width in columns:
+            tree.heading(key, text=heading)
+            tree.column(key, width=width, anchor='center')
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview,
+                                  **self.style_config['scrollbar'])
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        tree.configure(yscrollcommand=scrollbar.set)
+        return tree
+
+    def _create_symbol_filter(self):
+        """اختيار المرحلة لجدول الرموز"""
+        frame = ttk.Frame(self.window)
+        frame.pack(fill=tk.X, padx=10)
+        ttk.Label(frame, text="المرحلة:", **self.style_config['label']).pack(side=tk.LEFT, padx=5)
+        self.stage_var = tk.StringVar(value=STAGES['historical'])
+        ttk.Combobox(frame, textvariable=self.stage_var, values=list(STAGES.values()),
+                     width=20, state='readonly').pack(side=tk.LEFT, padx=5)
+        ttk.Button(frame, text="تصفير", command=self.tracker.reset,
+                   **self.style_config['button']).pack(side=tk.RIGHT, padx=5)
+
+    def refresh(self):
+        """تحديث الجدولين ثم جدولة التحديث التالي ما دامت النافذة مفتوحة"""
+        if not self.window.winfo_exists():
+            return
+        try:
+            snapshot = self.tracker.snapshot()
+            self._fill(self.stage_tree, [(STAGES.get(stage, stage), snapshot[stage])
+                                         for stage in list(STAGES) + sorted(set(snapshot) - set(STAGES))
+                                         if stage in snapshot])
+
+            stage = next((key for key, label in STAGES.items() if label == self.stage_var.get()), None)
+            symbols = sorted(self.tracker.symbol_snapshot(stage).items(),
+                             key=lambda item: item[1]['p95'], reverse=True)[:self.top_symbols]
+            self._fill(self.symbol_tree, [(symbol, stats) for (_, symbol), stats in symbols])
+        except Exception as e:
+            self.logger.error(f"خطأ في تحديث نافذة زمن الاستجابة: {e}")
+        self.window.after(self.refresh_ms, self.refresh)
+
+    @staticmethod
+    def _fill(tree, rows):
+        tree.delete(*tree.get_children())
+        for name, stats in rows:
+            tree.insert('', tk.END, values=[name, stats['count']] + [
+                f"{stats[key] * 1000:.2f}" for key in ('p50', 'p95', 'p99', 'max')
+            ])
+
+
+def show_latency_window(root, style_config, tracker: LatencyTracker):
+    """عرض نافذة زمن الاستجابة"""
+    return LatencyWindow(root, style_config, tracker)
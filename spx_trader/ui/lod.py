@@ -0,0 +1,138 @@
+# ui/lod.py
+from collections import OrderedDict
+import numpy as np
+
+
+class PricePyramid:
+    """
+    هرم مستويات تفصيل لسلسلة أسعار: المستوى k يجمع كل 2^k شمعة في خانة واحدة
+    تحتفظ بأدنى وأعلى قيمة وموقعيهما، فتبقى القمم والقيعان ظاهرة عند التصغير.
+    """
+
+    def __init__(self, values, min_buckets: int = 256):
+        self.min_buckets = min_buckets
+        self.length = 0
+        self.values = np.empty(0)
+        self.levels = []
+        self.update(values)
+
+    def update(self, values) -> bool:
+        """
+        تحديث الهرم بالسلسلة الجديدة بإعادة حساب الخانات من أول قيمة تغيرت فقط
+
+        تحديث الشمعة الأخيرة أو إلحاق شموع يعيد حساب خانة أو خانتين في كل مستوى،
+        وأي تعديل في الوسط يُكتشف بالمقارنة فلا تبقى خانات قديمة.
+
+        Returns:
+            bool: هل تغيرت السلسلة
+        """
+        values = np.array(values, dtype=float)  # نسخة: تعديل مصفوفة المستدعي لا يخفي التغيير
+        common = min(len(values), self.length)
+        old, new = self.values[:common], values[:common]
+        changed = np.flatnonzero((old != new) & ~(np.isnan(old) & np.isnan(new)))
+        first = int(changed[0]) if len(changed) else common
+        if first == len(values) == self.length:
+            return False
+
+        same_length = len(values) == self.length
+        positions = self.levels[0][1] if same_length else np.arange(len(values))
+        # كل مستوى: (أدنى قيمة، موقعها، أعلى قيمة، موقعها)
+        levels = [(values, positions, values, positions)]
+        while len(levels[-1][0]) > self.min_buckets:
+            k = len(levels)
+            start = first >> k  # أول خانة في المستوى k تحتوي قيمة متغيرة
+            if k >= len(self.levels) or not start:
+                levels.append(self._reduce(*levels[-1]))
+                continue
+            tail = self._reduce(*(part[2 * start:] for part in levels[-1]))
+            if same_length:
+                # نفس عدد الخانات (تحديث الشمعة الأخيرة): الكتابة في المصفوفات الحالية
+                for kept, part in zip(self.levels[k], tail):
+                    kept[start:] = part
+                levels.append(self.levels[k])
+            else:
+                levels.append(tuple(np.concatenate([kept[:start], part])
+                                    for kept, part in zip(self.levels[k], tail)))
+
+        self.values, self.length, self.levels = values, len(values), levels
+        return True
+
+    @staticmethod
+    def _reduce(low, low_at, high, high_at):
+        """دمج كل خانتين متجاورتين في خانة واحدة"""
+        if len(low) % 2:
+            # الخانة الأخيرة المفردة تُدمج مع نفسها
+            low, low_at = np.append(low, low[-1]), np.append(low_at, low_at[-1])
+            high, high_at = np.append(high, high[-1]), np.append(high_at, high_at[-1])
+
+        left_low, right_low = low[0::2], low[1::2]
+        take_right = (right_low < left_low) | np.isnan(left_low)
+        new_low = np.where(take_right, right_low, left_low)
+        new_low_at = np.where(take_right, low_at[1::2], low_at[0::2])
+
+        left_high, right_high = high[0::2], high[1::2]
+        take_right = (right_high > left_high) | np.isnan(left_high)
+        new_high = np.where(take_right, right_high, left_high)
+        new_high_at = np.where(take_right, high_at[1::2], high_at[0::2])
+        return new_low, new_low_at, new_high, new_high_at
+
+    def level_for(self, span: float, pixels: float) -> int:
+        """أدنى مستوى لا يتجاوز عدد خاناته في النطاق المرئي عرض الرسم بالبكسل"""
+        if pixels <= 0 or span <= pixels:
+            return 0
+        level = int(np.ceil(np.log2(span / pixels)))
+        return min(level, len(self.levels) - 1)
+
+    def visible(self, x_min: float, x_max: float, pixels: float):
+        """
+        نقاط الخط للنطاق المرئي من المستوى المناسب
+
+        Returns:
+            Tuple: (المواقع، القيم) بترتيب زمني، بحد أقصى نقطتين لكل بكسل تقريبًا
+        """
+        level = self.level_for(x_max - x_min, pixels)
+        bucket = 2 ** level
+        start = max(int(x_min) // bucket - 1, 0)
+        end = max(int(np.ceil(x_max)) // bucket + 2, start)
+
+        if level == 0:
+            return np.arange(start, min(end, self.length)), self.values[start:end]
+
+        low, low_at, high, high_at = (part[start:end] for part in self.levels[level])
+        low_first = low_at <= high_at
+        xs = np.empty(len(low) * 2, dtype=low_at.dtype)
+        ys = np.empty(len(low) * 2)
+        xs[0::2] = np.where(low_first, low_at, high_at)
+        ys[0::2] = np.where(low_first, low, high)
+        xs[1::2] = np.where(low_first, high_at, low_at)
+        ys[1::2] = np.where(low_first, high, low)
+        return xs, ys
+
+
+class PyramidCache:
+    """تخزين الأهرام لكل رمز وسلسلة وتحديثها من أول قيمة متغيرة فقط"""
+
+    def __init__(self, max_symbols: int = 20):
+        self.max_symbols = max_symbols
+        self._pyramids = OrderedDict()
+
+    def get(self, symbol: str, name: str, values) -> PricePyramid:
+        key = (symbol, name)
+        pyramid = self._pyramids.get(key)
+        if pyramid is not None:
+            pyramid.update(values)
+            self._pyramids.move_to_end(key)
+            return pyramid
+
+        pyramid = PricePyramid(values)
+        self._pyramids[key] = pyramid
+        while len(self._pyramids) > self.max_symbols * 2:
+            self._pyramids.popitem(last=False)
+        return pyramid
+
+    def clear(self, symbol: str = None):
+        if symbol is None:
+            self._pyramids.clear()
+        else:
+            for key in [key for key in self._pyramids if key[0] == symbol]:
+                del self._pyramids[key]
@@ -0,0 +1,90 @@
+# ui/log_pipeline.py
+import queue
+import tkinter as tk
+from datetime import datetime
+from config import DATA_DIR
+from utils.logger import Logger
+
+
+class LogPipeline:
+    """
+    سجل أحداث آمن للخيوط لواجهة Tk: الخيوط العاملة تضيف إلى طابور فقط،
+    وخيط الواجهة يفرغه على دفعات عبر root.after مع الإبقاء على آخر max_lines سطر
+    ونقل الأسطر الأقدم إلى ملف على القرص.
+    """
+
+    def __init__(self, root, output: tk.Text, max_lines: int = 2000,
+                 batch_size: int = 500, interval_ms: int = 100, spill_dir=None):
+        self.logger = Logger()
+        self.root = root
+        self.output = output
+        self.max_lines = max_lines
+        self.batch_size = batch_size
+        self.interval_ms = interval_ms
+        self.spill_dir = spill_dir or DATA_DIR / 'logs'
+        self._queue = queue.SimpleQueue()
+        self._line_count = 0
+        self._after_id = None
+
+    def push(self, msg: str):
+        """إضافة رسالة من أي خيط دون لمس الواجهة"""
+        self._queue.put(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
+
+    def start(self):
+        """بدء التفريغ الدوري من خيط الواجهة"""
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def stop(self):
+        """إيقاف التفريغ ونقل الرسائل المتبقية إلى الملف"""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        pending = self._take(None)
+        if pending:
+            self._spill(pending)
+
+    def _take(self, limit):
+        messages = []
+        while limit is None or len(messages) < limit:
+            try:
+                messages.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return messages
+
+    def _drain(self):
+        try:
+            messages = self._take(self.batch_size)
+            if messages:
+                # متابعة آخر السجل فقط إذا كان المستخدم في أسفله
+                at_bottom = self.output.yview()[1] >= 0.999
+                text = '\n'.join(messages)
+                self.output.insert(tk.END, text + '\n')
+                self._line_count += text.count('\n') + 1
+                self._trim()
+                if at_bottom:
+                    self.output.see(tk.END)
+        except Exception as e:
+            self.logger.error(f"خطأ في تحديث سجل الأحداث: {e}")
+        finally:
+            self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def _trim(self):
+        """حذف الأسطر الزائدة من الواجهة بعد نقلها إلى القرص"""
+        excess = self._line_count - self.max_lines
+        if excess <= 0:
+            return
+        end = f"{excess + 1}.0"
+        self._spill(self.output.get('1.0', end).splitlines())
+        self.output.delete('1.0', end)
+        self._line_count -= excess
+
+    def _spill(self, lines):
+        try:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            path = self.spill_dir / f"events_{datetime.now().strftime('%Y%m%d')}.log"
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+        except Exception as e:
+            self.logger.error(f"خطأ في حفظ سجل الأحداث: {e}")
@@ -2,12 +2,11 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import threading
-from datetime import datetime
 from config import config
 from utils.logger import Logger
-from style import apply_3d_style
-from charts import TradingCharts
-from trade_history import show_trade_history_window
+from style.theme import apply_3d_style
+from ui.log_pipeline import LogPipeline
+from utils.profiler import get_profiler, install_signal_toggle
 
 class MainWindow:
     def __init__(self, trader):
@@ -16,6 +15,9 @@ class MainWindow:
         self.running = False
         self.config = trader.config
         self.create_gui()
+        # بعد إنشاء النافذة: messagebox يحتاج الجذر، والأخطاء السابقة (تحميل الإعدادات) تُعرض الآن
+        self.trader.on_error = lambda message: messagebox.showerror("خطأ", message)
+        self._setup_profiler()
         
     def create_gui(self):
         """إنشاء واجهة المستخدم الرسومية"""
@@ -30,6 +32,7 @@ class MainWindow:
         self._create_trading_tab()
         self._create_watchlist_tab()
         self._setup_chart()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
     def _create_notebook(self):
         """إنشاء دفتر التبويبات"""
@@ -113,7 +116,9 @@ class MainWindow:
             ("✅ بدء المراقبة", self.toggle_monitor, "start_btn"),
             ("💾 حفظ الإعدادات", self.save_settings, None),
             ("📊 عرض الرسم البياني", self.show_chart, None),
-            ("📋 سجل الصفقات", self.show_trade_history, None)
+            ("📋 سجل الصفقات", self.show_trade_history, None),
+            ("⏱ زمن الاستجابة", self.show_latency, None),
+            ("🔬 تحليل الأداء", self.toggle_profiler, None)
         ]
         
         for text, command, attr_name in buttons:
@@ -147,6 +152,10 @@ class MainWindow:
         scrollbar.config(command=self.output.yview)
         self.output.config(yscrollcommand=scrollbar.set)
         
+        # الرسائل تمر عبر طابور يفرغه خيط الواجهة على دفعات
+        self.log_pipeline = LogPipeline(self.root, self.output)
+        self.log_pipeline.start()
+        
     def _create_watchlist_tab(self):
         """إنشاء تبويب قائمة المتابعة"""
         watchlist_tab = ttk.Frame(self.notebook)
@@ -172,8 +181,19 @@ class MainWindow:
         ).pack(pady=5)
         
     def _setup_chart(self):
-        """إعداد الرسم البياني"""
-        self.charts = TradingCharts(self.main_tab)
+        """إعداد الرسم البياني (يُنشأ عند أول عرض - matplotlib لا يُحمَّل عند بدء التشغيل)"""
+        self.charts = None
+        self._chart_data = None
+
+    def _get_charts(self):
+        """إنشاء الرسم البياني عند أول استخدام"""
+        if self.charts is None:
+            from ui.charts import TradingCharts
+            self.charts = TradingCharts(self.main_tab)
+            if self._chart_data is not None:
+                self.charts.update_chart(self._chart_data)
+                self._chart_data = None
+        return self.charts
         
     def toggle_monitor(self):
         """تبديل حالة المراقبة (تشغيل/إيقاف)"""
@@ -206,11 +226,8 @@ class MainWindow:
             self.log_message("🛑 توقف مراقبة قائمة المتابعة")
     
     def log_message(self, msg):
-        """تسجيل رسالة في سجل الأحداث"""
-        timestamp = datetime.now().strftime('%H:%M:%S')
-        self.output.insert(tk.END, f"[{timestamp}] {msg}\n")
-        self.output.see(tk.END)
-        self.output.update()
+        """تسجيل رسالة في سجل الأحداث (آمنة للاستدعاء من أي خيط)"""
+        self.log_pipeline.push(msg)
         
     def save_settings(self):
         """حفظ الإعدادات من الواجهة إلى ملف التكوين"""
@@ -236,6 +253,7 @@ class MainWindow:
         """حفظ قائمة المتابعة"""
         try:
             content = self.watchlist_text.get('1.0', tk.END).strip()
+            config.ensure_files()
             with open(config.watchlist_file, 'w', encoding='utf-8') as f:
                 f.write(content)
             messagebox.showinfo("تم", "تم حفظ قائمة المتابعة بنجاح")
@@ -244,12 +262,40 @@ class MainWindow:
     
     def show_chart(self):
         """إظهار/إخفاء الرسم البياني"""
-        self.charts.toggle_visibility()
+        self._get_charts().toggle_visibility()
     
     def show_trade_history(self):
         """عرض سجل الصفقات"""
+        from ui.trade_history import show_trade_history_window
         show_trade_history_window(self.root, self.style_config)
     
+    def show_latency(self):
+        """عرض توزيعات زمن الاستجابة لكل مرحلة"""
+        from ui.latency_panel import show_latency_window
+        show_latency_window(self.root, self.style_config, self.trader.latency)
+    
+    def _setup_profiler(self):
+        """ربط المُحلل بسجل الأحداث وبإشارة SIGUSR1"""
+        self.profiler = get_profiler()
+        self.profile_seconds = float(self.config.get('profile_seconds', 30))
+        self.profiler.on_finished = lambda result: self.log_message(
+            f"🔬 انتهى التحليل ({result['samples']} عينة): {result['svg']}")
+        install_signal_toggle(self.profiler, self.profile_seconds)
+    
+    def toggle_profiler(self):
+        """بدء/إيقاف تحليل الأداء لجميع الخيوط دون إيقاف التداول"""
+        if self.profiler.toggle(self.profile_seconds):
+            self.log_message(f"🔬 بدء تحليل الأداء لمدة {self.profile_seconds:.0f} ث (اضغط مجددًا للإيقاف المبكر)")
+    
+    def on_close(self):
+        """إغلاق النافذة مع حفظ الرسائل المعلقة"""
+        self.log_pipeline.stop()
+        self.root.destroy()
+    
     def update_chart_data(self, data):
         """تحديث بيانات الرسم البياني"""
+        if self.charts is None:
+            # الرسم لم يُعرض بعد: الاحتفاظ بأحدث البيانات لرسمها عند أول عرض
+            self._chart_data = data
+            return
         self.charts.update_chart(data)
@@ -0,0 +1,136 @@
+# ui/trade_history.py
+import tkinter as tk
+from tkinter import ttk, messagebox
+from utils.logger import Logger
+from utils.ledger import get_ledger
+
+COLUMNS = [
+    ('timestamp', 'الوقت', 140),
+    ('symbol', 'الرمز', 70),
+    ('type', 'النوع', 60),
+    ('strike', 'Strike', 70),
+    ('qty', 'الكمية', 60),
+    ('entry', 'الدخول', 80),
+    ('tp', 'TP', 80),
+    ('sl', 'SL', 80),
+    ('status', 'الحالة', 70),
+    ('exit_price', 'سعر الخروج', 90),
+    ('exit_time', 'وقت الخروج', 140)
+]
+
+STATUSES = ['', 'OPEN', 'CLOSED']
+
+
+class TradeHistoryWindow:
+    """نافذة سجل الصفقات: تعرض صفحة واحدة فقط من السجل مع فلاتر تعتمد على الفهارس"""
+
+    def __init__(self, root, style_config, page_size: int = 100):
+        self.logger = Logger()
+        self.ledger = get_ledger()
+        self.style_config = style_config
+        self.page_size = page_size
+        self.page = 0
+        self.total = 0
+
+        self.window = tk.Toplevel(root)
+        self.window.title("سجل الصفقات")
+        self.window.geometry("1000x500")
+
+        self._create_filters()
+        self._create_table()
+        self._create_pager()
+        self.apply_filters()
+
+    def _create_filters(self):
+        """إنشاء إطار الفلاتر"""
+        frame = ttk.LabelFrame(self.window, text="تصفية", **self.style_config['frame'])
+        frame.pack(fill=tk.X, padx=10, pady=5)
+
+        fields = [
+            ("الرمز:", 'symbol_entry', 10),
+            ("من (YYYY-MM-DD):", 'start_entry', 12),
+            ("إلى (YYYY-MM-DD):", 'end_entry', 12)
+        ]
+        for column, (text, attr_name, width) in enumerate(fields):
+            ttk.Label(frame, text=text, **self.style_config['label']).grid(
+                row=0, column=column * 2, padx=5, pady=5, sticky='e')
+            entry = ttk.Entry(frame, width=width, **self.style_config['entry'])
+            entry.grid(row=0, column=column * 2 + 1, padx=5, pady=5)
+            setattr(self, attr_name, entry)
+
+        ttk.Label(frame, text="الحالة:", **self.style_config['label']).grid(
+            row=0, column=6, padx=5, pady=5, sticky='e')
+        self.status_var = tk.StringVar(value='')
+        ttk.Combobox(frame, textvariable=self.status_var, values=STATUSES,
+                     width=8, state='readonly').grid(row=0, column=7, padx=5, pady=5)
+
+        ttk.Button(frame, text="تطبيق", command=self.apply_filters,
+                   **self.style_config['button']).grid(row=0, column=8, padx=5, pady=5)
+
+    def _create_table(self):
+        """إنشاء جدول الصفقات"""
+        frame = ttk.Frame(self.window)
+        frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        self.tree = ttk.Treeview(frame, columns=[c[0] for c in COLUMNS], show='headings')
+        for key, title, width in COLUMNS:
+            self.tree.heading(key, text=title)
+            self.tree.column(key, width=width, anchor='center')
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.tree.yview,
+                                  **self.style_config['scrollbar'])
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+
+    def _create_pager(self):
+        """إنشاء أزرار التنقل بين الصفحات"""
+        frame = ttk.Frame(self.window)
+        frame.pack(fill=tk.X, padx=10, pady=5)
+
+        ttk.Button(frame, text="◀ السابق", command=lambda: self.show_page(self.page - 1),
+                   **self.style_config['button']).pack(side=tk.LEFT, padx=5)
+        ttk.Button(frame, text="التالي ▶", command=lambda: self.show_page(self.page + 1),
+                   **self.style_config['button']).pack(side=tk.LEFT, padx=5)
+        self.page_label = ttk.Label(frame, text="", **self.style_config['label'])
+        self.page_label.pack(side=tk.LEFT, padx=10)
+
+    def _filters(self) -> dict:
+        start = self.start_entry.get().strip()
+        end = self.end_entry.get().strip()
+        return {
+            'symbol': self.symbol_entry.get().strip().upper() or None,
+            'status': self.status_var.get() or None,
+            'start': start or None,
+            # نهاية اليوم شاملة عند إدخال التاريخ فقط
+            'end': (f"{end} 23:59:59" if len(end) == 10 else end) or None
+        }
+
+    def apply_filters(self):
+        """إعادة حساب عدد النتائج وعرض الصفحة الأولى"""
+        try:
+            self.total = self.ledger.count(**self._filters())
+            self.show_page(0)
+        except Exception as e:
+            self.logger.error(f"خطأ في تحميل سجل الصفقات: {e}")
+            messagebox.showerror("خطأ", f"فشل تحميل سجل الصفقات: {e}", parent=self.window)
+
+    def show_page(self, page: int):
+        """عرض صفحة واحدة فقط من النتائج"""
+        pages = max(1, -(-self.total // self.page_size))
+        page = min(max(page, 0), pages - 1)
+        rows = self.ledger.query(limit=self.page_size, offset=page * self.page_size,
+                                 **self._filters())
+        self.page = page
+
+        self.tree.delete(*self.tree.get_children())
+        for row in rows:
+            self.tree.insert('', tk.END, values=[
+                '' if row.get(key) is None else row[key] for key, _, _ in COLUMNS
+            ])
+        self.page_label.config(text=f"صفحة {page + 1} من {pages} - {self.total} صفقة")
+
+
+def show_trade_history_window(root, style_config):
+    """عرض نافذة سجل الصفقات"""
+    return TradeHistoryWindow(root, style_config)
@@ -0,0 +1,268 @@
+# utils/bar_cache.py
+import os
+import re
+import json
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+from config import DATA_DIR
+from utils.logger import Logger
+
+COLUMNS = {
+    'date': np.int64,  # نانوثانية منذ 1970
+    'open': np.float64,
+    'high': np.float64,
+    'low': np.float64,
+    'close': np.float64,
+    'volume': np.float64,
+    'average': np.float64,
+    'barCount': np.int64
+}
+
+
+class BarCache:
+    """
+    ذاكرة شموع على القرص بتنسيق عمودي: ملف ثنائي لكل عمود يمكن ربطه بالذاكرة (memmap)
+
+    كل سلسلة (عقد + حجم الشمعة + whatToShow) في مجلد مستقل مع meta.json يحفظ
+    عدد الشموع المؤكدة والنطاقات الزمنية المغطاة (segments) لاكتشاف الفجوات.
+    الإضافة في النهاية فقط؛ ملء فجوة قديمة يكتب السلسلة في ملفات جيل جديد
+    (generation في meta.json) بدلاً من استبدال ملفات قد تكون مربوطة بالذاكرة لدى قارئ.
+    """
+
+    def __init__(self, root=None):
+        self.logger = Logger()
+        self.root = root or DATA_DIR / 'bars'
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def series_key(contract_key: str, bar_size: str, what_to_show: str, use_rth: bool = True) -> str:
+        """مفتاح السلسلة من مفتاح العقد وإعدادات الطلب"""
+        return f"{contract_key}|{bar_size}|{what_to_show}|{'RTH' if use_rth else 'ALL'}"
+
+    def load(self, key: str, limit: int = None) -> Optional[Dict[str, np.ndarray]]:
+        """
+        أعمدة السلسلة كمصفوفات memmap للقراءة فقط (آخر limit شمعة)
+
+        المصفوفات تبقى صالحة بعد إعادة كتابة السلسلة لأنها تشير إلى ملفات الجيل السابق؛
+        تُستدعى load من جديد للحصول على الشموع المضافة بعدها.
+
+        Returns:
+            dict: عمود -> مصفوفة، أو None إذا لم تكن السلسلة محفوظة
+        """
+        with self._lock:
+            meta = self._read_meta(key)
+            if not meta or not meta['count']:
+                return None
+            count = meta['count']
+            start = max(0, count - limit) if limit else 0
+            return {
+                column: np.memmap(self._column_path(key, meta, column), dtype=dtype, mode='r',
+                                  shape=(count,))[start:]
+                for column, dtype in COLUMNS.items()
+            }
+
+    def load_df(self, key: str, limit: int = None) -> Optional[pd.DataFrame]:
+        """السلسلة كإطار بيانات بنفس أعمدة util.df"""
+        columns = self.load(key, limit)
+        if columns is None:
+            return None
+        df = pd.DataFrame({column: np.array(values) for column, values in columns.items()})
+        df['date'] = self._to_dates(df['date'].values, self._read_meta(key))
+        return df
+
+    def load_frames(self, bar_size: str = None, what_to_show: str = None) -> Dict[str, pd.DataFrame]:
+        """جميع السلاسل المحفوظة (اختياريًا لحجم شمعة و whatToShow محددين) حسب الرمز"""
+        frames = {}
+        for meta_path in sorted(self.root.glob('*/meta.json')):
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                if bar_size and meta['bar_size'] != bar_size:
+                    continue
+                if what_to_show and meta['what_to_show'] != what_to_show:
+                    continue
+                df = self.load_df(meta['key'])
+                if df is not None:
+                    frames[meta['symbol']] = df
+            except Exception as e:
+                self.logger.error(f"خطأ في قراءة {meta_path}: {e}")
+        return frames
+
+    def last_date(self, key: str):
+        """وقت آخر شمعة محفوظة"""
+        columns = self.load(key, limit=1)
+        if columns is None:
+            return None
+        return self._to_dates(np.array(columns['date']), self._read_meta(key))[0]
+
+    def gaps(self, key: str) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+        """النطاقات غير المغطاة بين النطاقات المحفوظة (لطلبها فقط)"""
+        meta = self._read_meta(key)
+        if not meta:
+            return []
+        bounds = self._to_dates(np.array(meta['segments'], dtype=np.int64).ravel(), {'tz': meta['tz']})
+        return [(bounds[i], bounds[i + 1]) for i in range(1, len(bounds) - 1, 2)]
+
+    def append(self, key: str, bars, symbol: str = '', bar_size: str = '', what_to_show: str = ''):
+        """
+        حفظ شموع مكتملة. الشموع الأحدث من آخر شمعة تُلحق بنهاية الملفات،
+        والأقدم (ملء فجوة) تُدمج بإعادة كتابة السلسلة.
+
+        Args:
+            bars: قائمة BarData أو إطار بيانات بأعمدة util.df
+        """
+        try:
+            df = bars if isinstance(bars, pd.DataFrame) else pd.DataFrame(
+                [{column: getattr(bar, column) for column in COLUMNS} for bar in bars])
+            if df.empty:
+                return
+            with self._lock:
+                meta = self._read_meta(key) or {
+                    'key': key, 'symbol': symbol, 'bar_size': bar_size,
+                    'what_to_show': what_to_show, 'tz': None, 'count': 0, 'segments': []
+                }
+                dates, meta['tz'] = self._to_ns(df['date'], meta['tz'])
+                columns = {column: df[column].values for column in COLUMNS if column != 'date'}
+                columns['date'] = dates
+
+                order = np.argsort(dates, kind='stable')
+                columns = {column: np.asarray(values)[order] for column, values in columns.items()}
+                meta['segments'] = self._add_segment(meta['segments'], int(columns['date'][0]),
+                                                     int(columns['date'][-1]))
+
+                newer = columns['date'] > self._last_ns(key, meta)
+                older = columns['date'][~newer]
+                if len(older) and not np.isin(older, self._read_column(key, meta, 'date')).all():
+                    self._rewrite(key, meta, columns)
+                elif newer.any():
+                    self._append_files(key, meta, {c: v[newer] for c, v in columns.items()})
+                else:
+                    self._write_meta(key, meta)
+        except Exception as e:
+            self.logger.error(f"خطأ في حفظ الشموع {key}: {e}")
+
+    def _append_files(self, key: str, meta: dict, columns: Dict[str, np.ndarray]):
+        """إلحاق الأعمدة بنهاية الملفات ثم تحديث العدد المؤكد في meta.json"""
+        self._folder(key).mkdir(parents=True, exist_ok=True)
+        try:
+            for column, dtype in COLUMNS.items():
+                with open(self._column_path(key, meta, column), 'ab') as f:
+                    # بقايا كتابة لم تُؤكَّد في meta.json (انقطاع سابق) تُحذف أولاً
+                    f.truncate(meta['count'] * np.dtype(dtype).itemsize)
+                    f.write(np.ascontiguousarray(columns[column], dtype=dtype).tobytes())
+        except OSError as e:
+            # ملف مربوط بالذاكرة لدى قارئ لا يمكن قصه على Windows: الشموع تُكتب في جيل جديد
+            self.logger.warning(f"تعذر الإلحاق بملفات {key} ({e}) - إعادة كتابة السلسلة")
+            self._rewrite(key, meta, columns)
+            return
+        meta['count'] += len(columns['date'])
+        self._write_meta(key, meta)
+
+    def _rewrite(self, key: str, meta: dict, columns: Dict[str, np.ndarray]):
+        """
+        دمج شموع أقدم من نهاية السلسلة وكتابتها في ملفات جيل جديد
+
+        الملفات الحالية لا تُستبدل (os.replace يفشل على Windows لملف مربوط بالذاكرة
+        ويترك القارئ على بيانات قديمة في POSIX)؛ meta.json يشير إلى الجيل الجديد
+        بعد اكتمال كتابته، وملفات الجيل السابق تُحذف عندما لا تكون مستخدمة.
+        """
+        merged = {column: np.concatenate([self._read_column(key, meta, column), columns[column]])
+                  for column in COLUMNS}
+        # عند تكرار الوقت تُعتمد الشمعة الجديدة
+        _, index = np.unique(merged['date'][::-1], return_index=True)
+        keep = len(merged['date']) - 1 - index
+        meta = dict(meta, generation=meta.get('generation', 0) + 1, count=len(keep))
+        self._folder(key).mkdir(parents=True, exist_ok=True)
+        for column, dtype in COLUMNS.items():
+            merged[column][keep].astype(dtype).tofile(self._column_path(key, meta, column))
+        self._write_meta(key, meta)
+        self._remove_stale(key, meta)
+
+    def _remove_stale(self, key: str, meta: dict):
+        """حذف ملفات الأجيال السابقة؛ الملف المربوط لدى قارئ (Windows) يُحذف في إعادة كتابة لاحقة"""
+        current = {self._column_path(key, meta, column).name for column in COLUMNS}
+        for path in self._folder(key).glob('*.bin'):
+            if path.name not in current:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    self.logger.debug(f"تأجيل حذف {path.name}: {e}")
+
+    def _read_column(self, key: str, meta: dict, column: str, start: int = 0) -> np.ndarray:
+        """نسخة من عمود (الشموع المؤكدة فقط) دون إبقاء الملف مربوطًا بالذاكرة"""
+        dtype = np.dtype(COLUMNS[column])
+        if start >= meta['count']:
+            return np.empty(0, dtype=dtype)
+        return np.fromfile(self._column_path(key, meta, column), dtype=dtype,
+                           count=meta['count'] - start, offset=start * dtype.itemsize)
+
+    def _column_path(self, key: str, meta: dict, column: str):
+        """ملف العمود في الجيل الحالي (الجيل 0 بالأسماء الأصلية للتوافق مع الذاكرة المحفوظة)"""
+        generation = meta.get('generation', 0)
+        return self._folder(key) / (f"{column}.{generation}.bin" if generation else f"{column}.bin")
+
+    def _last_ns(self, key: str, meta: dict) -> int:
+        return int(self._read_column(key, meta, 'date', meta['count'] - 1)[0]) if meta['count'] else -1
+
+    @staticmethod
+    def _add_segment(segments: list, start: int, end: int) -> list:
+        """دمج نطاق مغطى جديد مع النطاقات المتداخلة معه"""
+        merged = []
+        for seg_start, seg_end in sorted(segments + [[start, end]]):
+            if merged and seg_start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], seg_end)
+            else:
+                merged.append([seg_start, seg_end])
+        return merged
+
+    @staticmethod
+    def _to_ns(dates: pd.Series, tz: Optional[str]):
+        """تحويل أوقات الشموع إلى int64 (UTC للأوقات ذات المنطقة الزمنية)"""
+        stamps = pd.to_datetime(pd.Series(dates).map(pd.Timestamp))
+        if stamps.dt.tz is not None:
+            tz = tz or str(stamps.dt.tz)
+            stamps = stamps.dt.tz_convert('UTC').dt.tz_localize(None)
+        return stamps.values.astype('datetime64[ns]').astype(np.int64), tz
+
+    @staticmethod
+    def _to_dates(values: np.ndarray, meta: dict) -> pd.Series:
+        stamps = pd.Series(pd.to_datetime(values, unit='ns'))
+        if meta.get('tz'):
+            stamps = stamps.dt.tz_localize('UTC').dt.tz_convert(meta['tz'])
+        if meta.get('bar_size', '').endswith(('day', 'week', 'month')):
+            return stamps.dt.date
+        return stamps
+
+    def _folder(self, key: str):
+        return self.root / re.sub(r'[^A-Za-z0-9_.-]+', '_', key)
+
+    def _read_meta(self, key: str) -> Optional[dict]:
+        path = self._folder(key) / 'meta.json'
+        if not path.exists():
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_meta(self, key: str, meta: dict):
+        """حفظ ذري لملف meta.json"""
+        folder = self._folder(key)
+        folder.mkdir(parents=True, exist_ok=True)
+        tmp_path = folder / 'meta.json.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, folder / 'meta.json')
+
+
+_bar_cache = None
+_bar_cache_lock = threading.Lock()
+
+
+def get_bar_cache() -> BarCache:
+    """ذاكرة الشموع المشتركة"""
+    global _bar_cache
+    with _bar_cache_lock:
+        if _bar_cache is None:
+            _bar_cache = BarCache()
+        return _bar_cache
@@ -1,35 +1,42 @@
 # utils/file_manager.py
-import csv
 from datetime import datetime
-from config import config
+from utils.journal import get_journal
 
-def save_trade_to_file(symbol, option_type, strike, qty, entry, tp, sl, expiry):
-    """حفظ تفاصيل الصفقة في ملف CSV"""
+def save_trade_to_file(symbol, option_type, strike, qty, entry, tp, sl, expiry, trade_id=None):
+    """حفظ تفاصيل الصفقة في ملف CSV وفي سجل الصفقات (كتابة مؤجلة عبر خيط السجل)"""
     try:
-        file_exists = config.trades_log.exists()
-        
-        with open(config.trades_log, mode='a', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            if not file_exists:
-                writer.writerow([
-                    'Timestamp', 'Symbol', 'Type', 'Strike', 'Qty', 
-                    'Entry', 'TP', 'SL', 'Expiry', 'Status',
-                    'ExitPrice', 'ExitTime'
-                ])
-                
-            writer.writerow([
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                symbol,
-                option_type,
-                strike,
-                qty,
-                entry,
-                tp,
-                sl,
-                expiry,
-                'OPEN',
-                '',
-                ''
-            ])
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        row = [
+            timestamp,
+            symbol,
+            option_type,
+            strike,
+            qty,
+            entry,
+            tp,
+            sl,
+            expiry,
+            'OPEN',
+            '',
+            ''
+        ]
+
+        record = None
+        if trade_id:
+            record = {
+                'trade_id': trade_id,
+                'timestamp': timestamp,
+                'symbol': symbol,
+                'type': option_type,
+                'strike': strike,
+                'qty': qty,
+                'entry': entry,
+                'tp': tp,
+                'sl': sl,
+                'expiry': expiry,
+                'status': 'OPEN'
+            }
+
+        get_journal().submit(row, record)
     except Exception as e:
         raise Exception(f"فشل في حفظ الصفقة: {e}")
@@ -1,21 +1,113 @@
 # utils/indicators.py
 import numpy as np
 import pandas as pd
-from typing import Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 from config import config
 from utils.logger import Logger
 
+def reversal_masks(open_, high, low, close, rsi, ma,
+                   use_rsi=True, use_ma=True,
+                   rsi_oversold=30, rsi_overbought=70) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    كاشف الشموع الانعكاسية المتجه على المحور الأخير (يدعم مصفوفات 1-D و 2-D)
+    
+    Returns:
+        Tuple: (buy, sell) مصفوفات منطقية بنفس شكل المدخلات
+    """
+    close = np.asarray(close, dtype=float)
+    buy = np.zeros(close.shape, dtype=bool)
+    sell = np.zeros(close.shape, dtype=bool)
+    if close.shape[-1] < 3:
+        return buy, sell
+
+    # الشمعة الحالية ابتداءً من الثالثة مع الشمعتين السابقتين
+    o = np.asarray(open_, dtype=float)[..., 2:]
+    h = np.asarray(high, dtype=float)[..., 2:]
+    lo = np.asarray(low, dtype=float)[..., 2:]
+    c = close[..., 2:]
+    prev = close[..., 1:-1]
+    before_prev = close[..., :-2]
+
+    # تحديد الاتجاه
+    down = prev < before_prev
+    up = ~down
+
+    # تحليل الشمعة
+    body = np.abs(c - o)
+    candle_range = h - lo
+    upper_shadow = h - np.maximum(c, o)
+    lower_shadow = np.minimum(c, o) - lo
+    candle_ok = (candle_range != 0) & (body < candle_range * 0.3)
+
+    # تطبيق الفلاتر
+    filters_ok = candle_ok
+    if use_rsi:
+        r = np.asarray(rsi, dtype=float)[..., 2:]
+        filters_ok = filters_ok & ((down & (r <= rsi_oversold)) | (up & (r >= rsi_overbought)))
+    if use_ma:
+        m = np.asarray(ma, dtype=float)[..., 2:]
+        filters_ok = filters_ok & (((c < m) & up) | ((c > m) & down))
+
+    buy[..., 2:] = filters_ok & down & (lower_shadow > 2 * body)
+    sell[..., 2:] = filters_ok & up & (upper_shadow > 2 * body)
+    return buy, sell
+
+
+def _rolling_sum(values: np.ndarray, period: int) -> np.ndarray:
+    """مجموع نافذة منزلقة على المحور الأخير؛ NaN إذا احتوت النافذة على قيمة مفقودة"""
+    out = np.full(values.shape, np.nan)
+    if values.shape[-1] < period:
+        return out
+    valid = ~np.isnan(values)
+    pad = np.zeros(values.shape[:-1] + (1,))
+    sums = np.concatenate([pad, np.cumsum(np.where(valid, values, 0.0), axis=-1)], axis=-1)
+    counts = np.concatenate([pad, np.cumsum(valid, axis=-1)], axis=-1)
+    window_sums = sums[..., period:] - sums[..., :-period]
+    window_counts = counts[..., period:] - counts[..., :-period]
+    out[..., period - 1:] = np.where(window_counts == period, window_sums, np.nan)
+    return out
+
+
+def batch_rsi(close: np.ndarray, period: int) -> np.ndarray:
+    """RSI على المحور الأخير بنفس تعريف calculate_rsi (متوسط بسيط، الفرق الأول صفر)"""
+    close = np.asarray(close, dtype=float)
+    delta = np.diff(close, axis=-1, prepend=np.nan)
+    missing = np.isnan(close)
+    gain = np.where(missing, np.nan, np.where(delta > 0, delta, 0.0))
+    loss = np.where(missing, np.nan, np.where(delta < 0, -delta, 0.0))
+    avg_gain = _rolling_sum(gain, period) / period
+    avg_loss = _rolling_sum(loss, period) / period
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+def batch_ma(close: np.ndarray, period: int) -> np.ndarray:
+    """المتوسط المتحرك البسيط على المحور الأخير"""
+    return _rolling_sum(np.asarray(close, dtype=float), period) / period
+
+
+def filter_settings() -> dict:
+    """إعدادات فلاتر RSI والمتوسط المتحرك من ملف التكوين"""
+    return {
+        'use_rsi': config.get('use_rsi', True),
+        'use_ma': config.get('use_ma', True),
+        'rsi_oversold': config.get('rsi_oversold', 30),
+        'rsi_overbought': config.get('rsi_overbought', 70)
+    }
+
+
 class TechnicalIndicators:
     def __init__(self):
         self.logger = Logger()
         
-    def calculate_rsi(self, prices: pd.Series, period: int = None) -> pd.Series:
+    def calculate_rsi(self, prices: pd.Series, period: int = None, wilder: bool = False) -> pd.Series:
         """
         حساب مؤشر القوة النسبية (RSI)
         
         Args:
             prices (pd.Series): سلسلة أسعار الإغلاق
             period (int): فترة الحساب (اختياري)
+            wilder (bool): استخدام تنعيم وايلدر بدلاً من المتوسط البسيط
             
         Returns:
             pd.Series: سلسلة قيم RSI
@@ -23,14 +115,27 @@ class TechnicalIndicators:
         try:
             period = period or config.get('rsi_period', 14)
             delta = prices.diff()
-            gain = delta.where(delta > 0, 0).rolling(window=period).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+            if wilder:
+                gain = self._wilder_average(delta.clip(lower=0), period)
+                loss = self._wilder_average((-delta).clip(lower=0), period)
+            else:
+                gain = delta.where(delta > 0, 0).rolling(window=period).mean()
+                loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
             rs = gain / loss
             return 100 - (100 / (1 + rs))
         except Exception as e:
             self.logger.error(f"خطأ في حساب RSI: {e}")
             return pd.Series()
 
+    def _wilder_average(self, values: pd.Series, period: int) -> pd.Series:
+        """متوسط وايلدر: بذرة بمتوسط بسيط لأول فترة ثم تنعيم أسي بمعامل 1/period"""
+        changes = values.iloc[1:]  # الفرق الأول غير معرف
+        if len(changes) < period:
+            return pd.Series(np.nan, index=values.index)
+        smoothed = changes.iloc[period - 1:].copy()
+        smoothed.iloc[0] = changes.iloc[:period].mean()
+        return smoothed.ewm(alpha=1 / period, adjust=False).mean().reindex(values.index)
+
     def calculate_ma(self, prices: pd.Series, period: int = None) -> pd.Series:
         """
         حساب المتوسط المتحرك البسيط (MA)
@@ -71,12 +176,15 @@ class TechnicalIndicators:
             self.logger.error(f"خطأ في حساب بولينجر: {e}")
             return pd.Series(), pd.Series()
 
-    def identify_reversal_candles(self, df: pd.DataFrame) -> Optional[str]:
+    def identify_reversal_candles(self, df: pd.DataFrame,
+                                  indicators: Optional[dict] = None) -> Optional[str]:
         """
         تحديد الشموع الانعكاسية مع تصفية بواسطة المؤشرات
         
         Args:
             df (pd.DataFrame): بيانات الشموع
+            indicators (dict): قيم {'rsi', 'ma'} للشمعة الأخيرة من IndicatorState
+                               (اختياري - يتجنب إعادة حساب السلاسل كاملة)
             
         Returns:
             Optional[str]: 'reversal_up' أو 'reversal_down' أو None
@@ -86,50 +194,139 @@ class TechnicalIndicators:
                 return None
                 
             # حساب المؤشرات
-            df['rsi'] = self.calculate_rsi(df['close'])
-            df['ma'] = self.calculate_ma(df['close'])
-            
-            last = df.iloc[-1]
-            prev = df.iloc[-2]
-            before_prev = df.iloc[-3]
+            if indicators is None:
+                indicators = {
+                    'rsi': self.calculate_rsi(df['close']).iloc[-1],
+                    'ma': self.calculate_ma(df['close']).iloc[-1]
+                }
 
-            # تحديد الاتجاه
-            trend = 'down' if prev['close'] < before_prev['close'] else 'up'
-            
-            # تحليل الشمعة
-            body = abs(last['close'] - last['open'])
-            candle_range = last['high'] - last['low']
-            
-            if candle_range == 0:
-                return None
-                
-            upper_shadow = last['high'] - max(last['close'], last['open'])
-            lower_shadow = min(last['close'], last['open']) - last['low']
-
-            # تطبيق الفلاتر
-            rsi_ok = not config.get('use_rsi', True) or (
-                (trend == 'down' and df['rsi'].iloc[-1] <= config.get('rsi_oversold', 30)) or
-                (trend == 'up' and df['rsi'].iloc[-1] >= config.get('rsi_overbought', 70))
-               ) 
-            ma_ok = not config.get('use_ma', True) or (
-                (last['close'] < df['ma'].iloc[-1] and trend == 'up') or
-                (last['close'] > df['ma'].iloc[-1] and trend == 'down'))
-
-            # تحديد الانعكاس
-            if (trend == 'down' and lower_shadow > 2 * body and 
-                body < candle_range * 0.3 and rsi_ok and ma_ok):
+            # تقييم آخر ثلاث شموع فقط بنفس الكاشف المتجه المستخدم في الرسم البياني
+            tail = df.iloc[-3:]
+            buy, sell = reversal_masks(
+                tail['open'].values, tail['high'].values,
+                tail['low'].values, tail['close'].values,
+                np.array([np.nan, np.nan, indicators['rsi']]),
+                np.array([np.nan, np.nan, indicators['ma']]),
+                **self._filter_settings()
+            )
+
+            if buy[-1]:
                 return 'reversal_up'
-                
-            elif (trend == 'up' and upper_shadow > 2 * body and 
-                  body < candle_range * 0.3 and rsi_ok and ma_ok):
+            elif sell[-1]:
                 return 'reversal_down'
-                
             return None
             
         except Exception as e:
             self.logger.error(f"خطأ في تحديد الشموع الانعكاسية: {e}")
             return None
 
+    def detect_reversals(self, df: pd.DataFrame,
+                         rsi: pd.Series = None,
+                         ma: pd.Series = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        تحديد الشموع الانعكاسية لكامل إطار البيانات دفعة واحدة
+        
+        Args:
+            df (pd.DataFrame): بيانات الشموع (open/high/low/close)
+            rsi (pd.Series): سلسلة RSI محسوبة مسبقًا (اختياري)
+            ma (pd.Series): سلسلة المتوسط المتحرك محسوبة مسبقًا (اختياري)
+            
+        Returns:
+            Tuple: (مصفوفة إشارات الشراء، مصفوفة إشارات البيع) منطقية بطول الإطار
+        """
+        try:
+            if rsi is None:
+                rsi = self.calculate_rsi(df['close'])
+            if ma is None:
+                ma = self.calculate_ma(df['close'])
+            return reversal_masks(
+                df['open'].values, df['high'].values,
+                df['low'].values, df['close'].values,
+                np.asarray(rsi, dtype=float), np.asarray(ma, dtype=float),
+                **self._filter_settings()
+            )
+        except Exception as e:
+            self.logger.error(f"خطأ في تحديد الشموع الانعكاسية: {e}")
+            empty = np.zeros(len(df), dtype=bool)
+            return empty, empty.copy()
+
+    def _filter_settings(self) -> dict:
+        return filter_settings()
+
+    def stack_frames(self, frames: Dict[str, pd.DataFrame],
+                     lookback: int = None) -> Tuple[List[str], Dict[str, np.ndarray]]:
+        """
+        محاذاة شموع عدة رموز في مصفوفات (رموز × شموع) محاذاة يمينية
+        
+        Args:
+            frames (dict): رمز -> إطار بيانات الشموع
+            lookback (int): عدد الشموع الأخيرة المطلوبة (الافتراضي أطول إطار)
+            
+        Returns:
+            Tuple: (قائمة الرموز، {'open','high','low','close'} مصفوفات مكملة بـ NaN يسارًا)
+        """
+        symbols = [symbol for symbol, df in frames.items() if df is not None and len(df)]
+        width = lookback or max((len(frames[symbol]) for symbol in symbols), default=0)
+        ohlc = {}
+        for column in ('open', 'high', 'low', 'close'):
+            matrix = np.full((len(symbols), width), np.nan)
+            for row, symbol in enumerate(symbols):
+                values = frames[symbol][column].values[-width:]
+                matrix[row, width - len(values):] = values
+            ohlc[column] = matrix
+        return symbols, ohlc
+
+    def analyze_batch(self, symbols: List[str], ohlc: Dict[str, np.ndarray],
+                      rsi_period: int = None, ma_period: int = None,
+                      bb_period: int = 20, std_dev: int = 2) -> Dict[str, dict]:
+        """
+        حساب RSI والمتوسط المتحرك وعصابات بولينجر وإشارات الانعكاس لكامل القائمة دفعة واحدة
+        
+        Args:
+            symbols (list): أسماء الرموز بترتيب صفوف المصفوفات
+            ohlc (dict): مصفوفات (رموز × شموع) للأعمدة open/high/low/close
+            
+        Returns:
+            dict: رمز -> {'signal', 'close', 'rsi', 'ma', 'upper', 'lower'} للشمعة الأخيرة
+        """
+        try:
+            rsi_period = rsi_period or config.get('rsi_period', 14)
+            ma_period = ma_period or config.get('ma_period', 50)
+            close = np.asarray(ohlc['close'], dtype=float)
+            rsi = batch_rsi(close, rsi_period)
+            ma = batch_ma(close, ma_period)
+
+            # عصابات بولينجر بإزاحة كل صف بمتوسطه لتقليل أخطاء التقريب
+            with np.errstate(invalid='ignore'):
+                centered = close - np.nanmean(close, axis=-1, keepdims=True)
+            bb_sum = _rolling_sum(centered, bb_period)
+            bb_sq = _rolling_sum(centered ** 2, bb_period)
+            variance = np.maximum(bb_sq - bb_sum ** 2 / bb_period, 0.0) / (bb_period - 1)
+            bb_mid = _rolling_sum(close, bb_period) / bb_period
+            upper = bb_mid + np.sqrt(variance) * std_dev
+            lower = bb_mid - np.sqrt(variance) * std_dev
+
+            buy, sell = reversal_masks(
+                ohlc['open'], ohlc['high'], ohlc['low'], close, rsi, ma,
+                **self._filter_settings()
+            )
+
+            results = {}
+            for row, symbol in enumerate(symbols):
+                signal = 'reversal_up' if buy[row, -1] else 'reversal_down' if sell[row, -1] else None
+                results[symbol] = {
+                    'signal': signal,
+                    'close': close[row, -1],
+                    'rsi': rsi[row, -1],
+                    'ma': ma[row, -1],
+                    'upper': upper[row, -1],
+                    'lower': lower[row, -1]
+                }
+            return results
+        except Exception as e:
+            self.logger.error(f"خطأ في التحليل الجماعي: {e}")
+            return {}
+
     def calculate_macd(self, prices: pd.Series, 
                       fast_period: int = 12, 
                       slow_period: int = 26, 
@@ -0,0 +1,193 @@
+# utils/journal.py
+import os
+import csv
+import time
+import queue
+import atexit
+import threading
+from config import config
+from utils.logger import Logger
+from utils.ledger import TradeLedger, get_ledger
+
+CSV_HEADER = [
+    'Timestamp', 'Symbol', 'Type', 'Strike', 'Qty',
+    'Entry', 'TP', 'SL', 'Expiry', 'Status',
+    'ExitPrice', 'ExitTime'
+]
+
+_STOP = object()
+RETRY_DELAY = 0.5       # ثوانٍ قبل إعادة أول محاولة لدفعة فاشلة
+RETRY_MAX_DELAY = 30    # أقصى تأخير بين المحاولات (يتضاعف حتى يبلغه)
+
+
+class TradeJournal:
+    """
+    كاتب سجل الصفقات في الخلفية: مسار الأوامر يضيف إلى طابور فقط،
+    والخيط الخلفي يجمع الدفعات ويكتبها مرة واحدة (CSV + السجل).
+
+    سياسة fsync:
+        'always'   بعد كل دفعة مكتوبة
+        'interval' كل fsync_interval_ms على الأكثر
+        'shutdown' عند الإغلاق فقط
+    """
+
+    def __init__(self, csv_path=None, fsync_policy: str = None,
+                 fsync_interval_ms: int = None, max_batch: int = 500):
+        self.logger = Logger()
+        self.csv_path = csv_path or config.trades_log
+        self.fsync_policy = fsync_policy or config.get('journal_fsync', 'interval')
+        self.fsync_interval = (fsync_interval_ms or config.get('journal_fsync_ms', 200)) / 1000
+        self.max_batch = max_batch
+        # تهيئة السجل قبل أي كتابة حتى لا يستورد الاستيراد الأولي صفوف الطابور مرتين
+        self.ledger = get_ledger()
+        self._queue = queue.SimpleQueue()
+        self._file = None
+        self._last_fsync = time.monotonic()
+        self._dirty = False
+        self._closed = False
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='trade-journal', daemon=True)
+        self._thread.start()
+
+    def submit(self, row: list = None, record: dict = None):
+        """إضافة صف CSV و/أو سجل للسجل دون انتظار القرص"""
+        self._queue.put((row, record))
+
+    def record_close(self, trade_id: str, trade_info: dict):
+        """تسجيل إغلاق صفقة في السجل عبر الطابور"""
+        self.submit(record=TradeLedger.close_record(trade_id, trade_info))
+
+    def close(self):
+        """تفريغ الطابور وكتابة البيانات على القرص قبل الخروج"""
+        if self._closed:
+            return
+        self._closed = True
+        self._stopping.set()  # إيقاف انتظار إعادة المحاولة
+        self._queue.put(_STOP)
+        self._thread.join(timeout=10)
+
+    def _run(self):
+        failed, delay = None, RETRY_DELAY
+        while True:
+            # الدفعة الفاشلة تُعاد أولاً بتأخير متزايد قبل أخذ عناصر جديدة (يحفظ ترتيب الكتابة)
+            if failed and not self._stopping.is_set():
+                self._stopping.wait(delay)
+                failed = self._write_batch(failed)
+                if failed:
+                    delay = min(delay * 2, RETRY_MAX_DELAY)
+                    continue
+                delay = RETRY_DELAY
+
+            # انتظار أول عنصر ثم جمع ما تراكم معه في دفعة واحدة
+            try:
+                item = self._queue.get(timeout=self.fsync_interval)
+            except queue.Empty:
+                self._maybe_fsync()
+                continue
+
+            batch, stop = [], item is _STOP
+            if not stop:
+                batch.append(item)
+            while not stop and len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+
+            if failed:
+                batch = failed + batch  # عند الإغلاق: محاولة أخيرة مع ما تبقى في الطابور
+            if batch:
+                failed = self._write_batch(batch)
+            if stop:
+                if failed:
+                    failed = self._write_batch(failed)  # محاولة أخيرة قبل الإغلاق
+                if failed:
+                    self.logger.error(f"تعذر حفظ {len(failed)} عنصر من سجل الصفقات قبل الإغلاق")
+                self._shutdown()
+                return
+
+    def _write_batch(self, batch) -> list:
+        """
+        كتابة الدفعة
+
+        Returns:
+            list: ما يجب إعادة محاولته (فارغة عند النجاح) - صفوف CSV المكتوبة لا تُعاد
+                  حتى لا تتكرر، وسجلات السجل آمنة للإعادة لأنها تحديث بالمعرّف
+        """
+        records = [(None, record) for _, record in batch if record]
+        try:
+            rows = [row for row, _ in batch if row]
+            if rows:
+                csv.writer(self._open()).writerows(rows)
+                self._file.flush()
+                self._dirty = True
+        except Exception as e:
+            self.logger.error(f"فشل في حفظ دفعة الصفقات ({len(batch)})، ستُعاد المحاولة: {e}")
+            return batch
+
+        try:
+            if records:
+                self.ledger.record_many([record for _, record in records])
+
+            if self.fsync_policy == 'always':
+                self._fsync()
+            else:
+                self._maybe_fsync()
+            return []
+        except Exception as e:
+            self.logger.error(f"فشل في حفظ سجلات الصفقات ({len(records)})، ستُعاد المحاولة: {e}")
+            return records
+
+    def _open(self):
+        if self._file is None:
+            new_file = not os.path.exists(self.csv_path) or os.path.getsize(self.csv_path) == 0
+            self._file = open(self.csv_path, mode='a', newline='', encoding='utf-8')
+            if new_file:
+                csv.writer(self._file).writerow(CSV_HEADER)
+        return self._file
+
+    def _maybe_fsync(self):
+        if (self.fsync_policy == 'interval' and self._dirty
+                and time.monotonic() - self._last_fsync >= self.fsync_interval):
+            self._fsync()
+
+    def _fsync(self):
+        if self._file is not None and self._dirty:
+            os.fsync(self._file.fileno())
+            self._dirty = False
+        self._last_fsync = time.monotonic()
+
+    def _shutdown(self):
+        try:
+            if self._file is not None:
+                self._file.flush()
+                self._fsync()
+                self._file.close()
+                self._file = None
+        except Exception as e:
+            self.logger.error(f"خطأ في إغلاق سجل الصفقات: {e}")
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_journal() -> TradeJournal:
+    """
+    كاتب السجل المشترك (يُغلق تلقائيًا عند الخروج)
+
+    يُنشأ مبكرًا في MarketMonitor.start_monitoring خارج حلقة IB؛ الاستدعاءات من مسار
+    الأوامر والخروج بعدها لا تفتح ملفات.
+    """
+    global _journal
+    if _journal is not None:
+        return _journal  # المسار المعتاد بعد إنشائه عند بدء المراقبة: بلا قفل
+    with _journal_lock:
+        if _journal is None:
+            _journal = TradeJournal()
+            atexit.register(_journal.close)
+        return _journal
@@ -0,0 +1,181 @@
+# utils/latency.py
+import time
+import threading
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from utils.logger import Logger
+
+# مراحل المسار من إغلاق الشمعة حتى تنفيذ الأمر وخروجه
+STAGES = {
+    'contract': 'تأهيل العقد',
+    'historical': 'الشموع التاريخية',
+    'to_df': 'تحويل util.df',
+    'signal': 'تحليل الإشارة',
+    'signal_batch': 'التحليل الجماعي',
+    'order_submit': 'إرسال الأمر',
+    'fill_wait': 'انتظار التنفيذ',
+    'exit_check': 'فحص TP/SL',
+    'exit': 'مسار الخروج'
+}
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class _Ring:
+    """آخر size قياس في مصفوفة دائرية ثابتة الحجم، مع العدد والمجموع التراكميين"""
+
+    __slots__ = ('values', 'index', 'count', 'total')
+
+    def __init__(self, size: int):
+        self.values = array('d', bytes(8 * size))
+        self.index = 0
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value: float):
+        self.values[self.index] = value
+        self.index = (self.index + 1) % len(self.values)
+        self.count += 1
+        self.total += value
+
+    def window(self) -> array:
+        return self.values[:min(self.count, len(self.values))]
+
+
+class _Timer:
+    __slots__ = ('tracker', 'stage', 'symbol', 'started')
+
+    def __init__(self, tracker, stage: str, symbol: Optional[str]):
+        self.tracker = tracker
+        self.stage = stage
+        self.symbol = symbol
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracker.record(self.stage, time.perf_counter() - self.started, self.symbol)
+        return False
+
+
+class LatencyTracker:
+    """
+    توزيعات زمن متحركة لكل مرحلة ولكل (مرحلة، رمز)
+
+    التسجيل إضافة إلى مصفوفة دائرية فقط (ميكروثانية تقريبًا)، والنسب المئوية
+    تُحسب عند القراءة، فيمكن إبقاؤه مفعلاً أثناء التداول.
+    """
+
+    def __init__(self, window: int = 4096, symbol_window: int = 128, enabled: bool = True):
+        self.logger = Logger()
+        self.window = window
+        self.symbol_window = symbol_window
+        self.enabled = enabled
+        self._stages: Dict[str, _Ring] = {}
+        self._symbols: Dict[tuple, _Ring] = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def record(self, stage: str, seconds: float, symbol: str = None):
+        """تسجيل قياس واحد بالثواني"""
+        if not self.enabled:
+            return
+        with self._lock:
+            ring = self._stages.get(stage)
+            if ring is None:
+                ring = self._stages[stage] = _Ring(self.window)
+            ring.add(seconds)
+            if symbol:
+                ring = self._symbols.get((stage, symbol))
+                if ring is None:
+                    ring = self._symbols[(stage, symbol)] = _Ring(self.symbol_window)
+                ring.add(seconds)
+
+    def time(self, stage: str, symbol: str = None) -> _Timer:
+        """قياس كتلة with كمرحلة"""
+        return _Timer(self, stage, symbol)
+
+    def snapshot(self) -> Dict[str, dict]:
+        """مرحلة -> {count, sum, p50, p95, p99, max} (النسب من النافذة المتحركة)"""
+        with self._lock:
+            rings = {stage: (ring.window(), ring.count, ring.total) for stage, ring in self._stages.items()}
+        return {stage: self._summarize(*values) for stage, values in rings.items()}
+
+    def symbol_snapshot(self, stage: str = None) -> Dict[tuple, dict]:
+        """(مرحلة، رمز) -> نفس مقاييس snapshot (اختياريًا لمرحلة واحدة)"""
+        with self._lock:
+            rings = {key: (ring.window(), ring.count, ring.total)
+                     for key, ring in self._symbols.items() if stage is None or key[0] == stage}
+        return {key: self._summarize(*values) for key, values in rings.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._symbols.clear()
+
+    def prometheus_text(self) -> str:
+        """المقاييس بتنسيق Prometheus النصي (نوع summary)"""
+        lines = []
+        for metric, rows, labels in (
+            ('spx_stage_latency_seconds', self.snapshot(), lambda key: f'stage="{key}"'),
+            ('spx_symbol_latency_seconds', self.symbol_snapshot(),
+             lambda key: f'stage="{key[0]}",symbol="{key[1]}"')
+        ):
+            lines.append(f"# TYPE {metric} summary")
+            for key, stats in sorted(rows.items()):
+                label = labels(key)
+                for quantile in QUANTILES:
+                    lines.append(f'{metric}{{{label},quantile="{quantile}"}} '
+                                 f'{stats[f"p{int(quantile * 100)}"]:.6f}')
+                lines.append(f"{metric}_sum{{{label}}} {stats['sum']:.6f}")
+                lines.append(f"{metric}_count{{{label}}} {stats['count']}")
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port: int, host: str = '127.0.0.1'):
+        """تشغيل نقطة /metrics محلية في خيط خلفي (مرة واحدة)"""
+        if self._server is not None:
+            return self._server
+        tracker = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = tracker.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((host, port), Handler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+            self.logger.info(f"مقاييس الزمن متاحة على http://{host}:{self._server.server_port}/metrics")
+        except Exception as e:
+            self.logger.error(f"فشل تشغيل خادم المقاييس على المنفذ {port}: {e}")
+            self._server = None
+        return self._server
+
+    def stop_serving(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @staticmethod
+    def _summarize(values: array, count: int, total: float) -> dict:
+        if not len(values):
+            return {'count': count, 'sum': total, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+        import numpy as np  # وقت القراءة فقط - لا يُحمَّل عند بدء التشغيل
+        values = np.frombuffer(values, dtype=float)
+        p50, p95, p99 = np.quantile(values, QUANTILES)
+        return {'count': count, 'sum': total, 'p50': float(p50), 'p95': float(p95),
+                'p99': float(p99), 'max': float(values.max())}
@@ -0,0 +1,209 @@
+# utils/ledger.py
+import csv
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Iterable, List, Optional
+from config import config, TRADES_DIR
+from utils.logger import Logger
+
+COLUMNS = [
+    'trade_id', 'timestamp', 'symbol', 'type', 'strike', 'qty',
+    'entry', 'tp', 'sl', 'expiry', 'status',
+    'exit_price', 'exit_time', 'exit_reason'
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    trade_id    TEXT PRIMARY KEY,
+    timestamp   TEXT NOT NULL,
+    symbol      TEXT NOT NULL,
+    type        TEXT,
+    strike      TEXT,
+    qty         REAL,
+    entry       REAL,
+    tp          REAL,
+    sl          REAL,
+    expiry      TEXT,
+    status      TEXT NOT NULL DEFAULT 'OPEN',
+    exit_price  REAL,
+    exit_time   TEXT,
+    exit_reason TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_trades_timestamp ON trades(timestamp);
+CREATE INDEX IF NOT EXISTS idx_trades_symbol ON trades(symbol, timestamp);
+CREATE INDEX IF NOT EXISTS idx_trades_status ON trades(status, timestamp);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _format_time(value) -> Optional[str]:
+    if value is None or value == '':
+        return None
+    if hasattr(value, 'strftime'):
+        return value.strftime(TIME_FORMAT)
+    return str(value)
+
+
+class TradeLedger:
+    """سجل صفقات SQLite بوضع WAL مع فهارس على الوقت والرمز والحالة"""
+
+    def __init__(self, path=None, csv_path=None):
+        self.logger = Logger()
+        config.ensure_files()
+        self.path = path or TRADES_DIR / 'trades.db'
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._import_csv_once(csv_path or config.trades_log)
+
+    def record_trade(self, record: dict):
+        """إضافة صفقة أو تحديثها إن وُجدت"""
+        self.record_many([record])
+
+    def record_many(self, records: Iterable[dict]):
+        """إضافة/تحديث مجموعة صفقات في معاملة واحدة"""
+        rows = [self._row(record) for record in records]
+        if not rows:
+            return
+        placeholders = ', '.join('?' * len(COLUMNS))
+        # وقت الفتح الأصلي والقيم الفارغة لا تستبدل الموجود عند التحديث
+        updates = [f"{column} = COALESCE(NULLIF(excluded.{column}, ''), {column})"
+                   for column in COLUMNS[2:] if column != 'status']
+        # الصفقة المغلقة تبقى مغلقة: سجل فتح متأخر (دفعة مؤجلة أو معادة) لا يعيدها مفتوحة
+        updates.append("status = CASE WHEN status = 'CLOSED' THEN status "
+                       "ELSE COALESCE(NULLIF(excluded.status, ''), status) END")
+        updates = ', '.join(updates)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO trades ({', '.join(COLUMNS)}) VALUES ({placeholders}) "
+                f"ON CONFLICT(trade_id) DO UPDATE SET {updates}",
+                rows
+            )
+
+    def close_trade(self, trade_id: str, trade_info: dict):
+        """تسجيل إغلاق الصفقة (إدراج أو تحديث)"""
+        self.record_trade(self.close_record(trade_id, trade_info))
+
+    @staticmethod
+    def close_record(trade_id: str, trade_info: dict) -> dict:
+        """بناء سجل الإغلاق من بيانات الصفقة الجارية"""
+        contract = trade_info.get('contract')
+        return {
+            'trade_id': trade_id,
+            'timestamp': trade_info.get('timestamp') or datetime.now(),
+            'symbol': getattr(contract, 'symbol', None) or trade_info.get('symbol', ''),
+            'entry': trade_info.get('entry'),
+            'tp': trade_info.get('target'),
+            'sl': trade_info.get('stop'),
+            'status': 'CLOSED',
+            'exit_price': trade_info.get('exit_price'),
+            'exit_time': trade_info.get('exit_time'),
+            'exit_reason': trade_info.get('exit_reason')
+        }
+
+    def query(self, symbol: str = None, status: str = None,
+              start: str = None, end: str = None,
+              limit: int = 100, offset: int = 0) -> List[dict]:
+        """استعلام الصفقات بالفلاتر مع ترقيم الصفحات (الأحدث أولاً)"""
+        where, params = self._filters(symbol, status, start, end)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM trades {where} ORDER BY timestamp DESC, rowid DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self, symbol: str = None, status: str = None,
+              start: str = None, end: str = None) -> int:
+        """عدد الصفقات المطابقة للفلاتر"""
+        where, params = self._filters(symbol, status, start, end)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM trades {where}", params).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _filters(symbol, status, start, end):
+        clauses, params = [], []
+        if symbol:
+            clauses.append('symbol = ?')
+            params.append(symbol)
+        if status:
+            clauses.append('status = ?')
+            params.append(status)
+        if start:
+            clauses.append('timestamp >= ?')
+            params.append(_format_time(start))
+        if end:
+            clauses.append('timestamp <= ?')
+            params.append(_format_time(end))
+        return ('WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    @staticmethod
+    def _row(record: dict) -> tuple:
+        row = dict(record)
+        row['timestamp'] = _format_time(row.get('timestamp'))
+        row['exit_time'] = _format_time(row.get('exit_time'))
+        return tuple(row.get(column) for column in COLUMNS)
+
+    def _import_csv_once(self, csv_path):
+        """استيراد ملف executed_trades.csv مرة واحدة فقط"""
+        try:
+            with self._lock:
+                done = self._conn.execute(
+                    "SELECT value FROM meta WHERE key = 'csv_imported'").fetchone()
+            if done or not csv_path.exists():
+                return
+
+            records = []
+            with open(csv_path, newline='', encoding='utf-8') as f:
+                for line_no, row in enumerate(csv.DictReader(f), start=2):
+                    records.append({
+                        'trade_id': row.get('TradeID') or f"csv_{line_no}",
+                        'timestamp': row.get('Timestamp'),
+                        'symbol': row.get('Symbol'),
+                        'type': row.get('Type'),
+                        'strike': row.get('Strike'),
+                        'qty': row.get('Qty') or None,
+                        'entry': row.get('Entry') or None,
+                        'tp': row.get('TP') or None,
+                        'sl': row.get('SL') or None,
+                        'expiry': row.get('Expiry'),
+                        'status': row.get('Status') or 'OPEN',
+                        'exit_price': row.get('ExitPrice') or None,
+                        'exit_time': row.get('ExitTime') or None
+                    })
+            self.record_many(records)
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('csv_imported', ?)",
+                    (datetime.now().strftime(TIME_FORMAT),)
+                )
+            if records:
+                self.logger.info(f"تم استيراد {len(records)} صفقة من ملف CSV")
+        except Exception as e:
+            self.logger.error(f"خطأ في استيراد سجل الصفقات: {e}")
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger() -> TradeLedger:
+    """السجل المشترك لجميع الخيوط"""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = TradeLedger()
+        return _ledger
@@ -0,0 +1,21 @@
+# utils/logger.py
+import logging
+
+
+class Logger:
+    """نظام التسجيل المشترك: واجهة موحدة فوق logging باسم 'spx' (المخرجات حسب معالجات الجذر)"""
+
+    def __init__(self, name: str = 'spx'):
+        self._logger = logging.getLogger(name)
+
+    def debug(self, message: str):
+        self._logger.debug(message)
+
+    def info(self, message: str):
+        self._logger.info(message)
+
+    def warning(self, message: str):
+        self._logger.warning(message)
+
+    def error(self, message: str):
+        self._logger.error(message)
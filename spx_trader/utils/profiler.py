@@ -0,0 +1,209 @@
+# utils/profiler.py
+import os
+import sys
+import html
+import time
+import signal
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Optional
+from config import DATA_DIR, config
+from utils.logger import Logger
+
+
+class SamplingProfiler:
+    """
+    مُحلل بأخذ العينات لجميع الخيوط أثناء التشغيل (دون إعادة تشغيل التطبيق)
+
+    خيط خلفي يقرأ مكدسات كل الخيوط عبر sys._current_frames كل interval ثانية،
+    ثم يكتب عند الإيقاف ملف مكدسات مطوية (.folded - لـ flamegraph.pl و speedscope)
+    ومخطط لهب SVG مستقل في DATA_DIR/profiles.
+    """
+
+    def __init__(self, interval: float = None, output_dir=None):
+        self.logger = Logger()
+        self.interval = interval or config.get('profile_interval_ms', 10) / 1000
+        self.output_dir = output_dir or DATA_DIR / 'profiles'
+        self.on_finished: Optional[Callable[[dict], None]] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stacks = Counter()
+        self._labels = {}
+        self._samples = 0
+        self._started = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, duration: float = None) -> bool:
+        """بدء أخذ العينات؛ مع duration يتوقف ويكتب الملفات تلقائيًا بعدها"""
+        with self._lock:
+            if self._thread is not None:
+                return False
+            self._stacks = Counter()
+            self._samples = 0
+            self._started = datetime.now()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(duration,),
+                                            name='sampling-profiler', daemon=True)
+            self._thread.start()
+        self.logger.info(f"🔬 بدء التحليل (كل {self.interval * 1000:.0f} مللي ث"
+                         f"{f' لمدة {duration:.0f} ث' if duration else ''})")
+        return True
+
+    def stop(self) -> Optional[dict]:
+        """إيقاف أخذ العينات وكتابة الملفات"""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return None
+            self._stop.set()
+        if thread is not threading.current_thread():
+            thread.join()
+        return self._finish()
+
+    def toggle(self, duration: float = None) -> bool:
+        """تشغيل أو إيقاف؛ يعيد True إذا أصبح يعمل"""
+        if self.running:
+            self.stop()
+            return False
+        return self.start(duration)
+
+    def _run(self, duration: Optional[float]):
+        own = threading.get_ident()
+        names = {}
+        deadline = time.monotonic() + duration if duration else None
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if any(ident not in names for ident in frames):
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                self._stacks[(names.get(ident, str(ident)), tuple(stack))] += 1
+            self._samples += 1
+            if deadline and time.monotonic() >= deadline:
+                break
+        if not self._stop.is_set():
+            self._finish()
+
+    def _finish(self) -> Optional[dict]:
+        with self._lock:
+            if self._thread is None:
+                return None
+            self._thread = None
+            stacks, samples = self._stacks, self._samples
+
+        result = {'samples': samples, 'folded': None, 'svg': None}
+        try:
+            folded = self.collapse(stacks)
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            name = f"profile_{self._started.strftime('%Y%m%d_%H%M%S')}"
+            result['folded'] = self.output_dir / f"{name}.folded"
+            with open(result['folded'], 'w', encoding='utf-8') as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in folded.most_common())
+            result['svg'] = self.output_dir / f"{name}.svg"
+            with open(result['svg'], 'w', encoding='utf-8') as f:
+                f.write(flame_svg(folded, f"{name} - {samples} عينة"))
+            self.logger.info(f"🔬 انتهى التحليل: {samples} عينة في {result['svg']}")
+        except Exception as e:
+            self.logger.error(f"خطأ في كتابة ملفات التحليل: {e}")
+
+        if self.on_finished:
+            try:
+                self.on_finished(result)
+            except Exception as e:
+                self.logger.error(f"خطأ في معالج انتهاء التحليل: {e}")
+        return result
+
+    def collapse(self, stacks: Counter) -> Counter:
+        """(خيط، إطارات) -> 'خيط;دالة (ملف:سطر);...' من الجذر إلى الورقة"""
+        folded = Counter()
+        for (thread, codes), count in stacks.items():
+            labels = [thread.replace(';', ',')] + [self._label(code) for code in reversed(codes)]
+            folded[';'.join(labels)] += count
+        return folded
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = (
+                f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            ).replace(';', ',')
+        return label
+
+
+def flame_svg(folded: Counter, title: str = '', width: int = 1200, row_height: int = 16) -> str:
+    """مخطط لهب SVG مستقل من المكدسات المطوية (الجذر في الأعلى)"""
+    root = {}
+    for stack, count in folded.items():
+        node = root
+        for name in stack.split(';'):
+            entry = node.setdefault(name, [0, {}])
+            entry[0] += count
+            node = entry[1]
+
+    total = sum(folded.values()) or 1
+    rects = []
+    depth_max = [0]
+
+    def layout(node, x, depth):
+        for name, (count, children) in sorted(node.items()):
+            w = count / total * width
+            if w >= 0.5:
+                rects.append((x, depth, w, name, count))
+                depth_max[0] = max(depth_max[0], depth)
+                layout(children, x, depth + 1)
+            x += w
+
+    layout(root, 0.0, 0)
+    height = (depth_max[0] + 1) * row_height + 30
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="monospace" font-size="11">',
+        f'<text x="4" y="16">{html.escape(title)}</text>'
+    ]
+    for x, depth, w, name, count in rects:
+        y = 24 + depth * row_height
+        hue = 10 + hash(name.split(' (')[0]) % 40
+        label = html.escape(name[:int(w // 7)]) if w > 21 else ''
+        parts.append(
+            f'<g><title>{html.escape(name)} - {count} ({count / total:.1%})</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row_height - 1}" '
+            f'fill="hsl({hue},85%,60%)"/><text x="{x + 2:.1f}" y="{y + 12}">{label}</text></g>'
+        )
+    parts.append('</svg>')
+    return '\n'.join(parts)
+
+
+def install_signal_toggle(profiler: SamplingProfiler, duration: float = None) -> bool:
+    """تبديل التحليل بإشارة SIGUSR1 (kill -USR1 <pid>)؛ غير متاح على ويندوز"""
+    if not hasattr(signal, 'SIGUSR1'):
+        return False
+    try:
+        signal.signal(signal.SIGUSR1, lambda signum, frame: threading.Thread(
+            target=profiler.toggle, args=(duration,), daemon=True).start())
+        return True
+    except ValueError:
+        # يجب التثبيت من الخيط الرئيسي
+        return False
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler() -> SamplingProfiler:
+    """المُحلل المشترك للعملية"""
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = SamplingProfiler()
+        return _profiler
@@ -0,0 +1,164 @@
+# utils/startup.py
+"""
+قياس زمن بدء التشغيل حتى ظهور النافذة الرئيسية
+
+main.py يستورد هذه الوحدة قبل أي استيراد آخر، ومع SPX_STARTUP_PROBE=1 تطبع
+العملية زمنها والوحدات الثقيلة المحمَّلة عند ظهور النافذة ثم تُغلق.
+
+الحد نسبي لخط أساس مسجل (زمن البدء قبل تأجيل الاستيرادات) بدلاً من رقم ثابت
+يختلف من جهاز لآخر: يُقاس خط الأساس مرة على نسخة سابقة من المشروع ويُحفظ، ثم
+يُشترط ألا يتجاوز الوسيط --ratio منه على نفس الجهاز. --imports يقيس مرحلة
+الاستيراد فقط (حتى ما قبل إنشاء النافذة) فيعمل بلا شاشة وعلى النسخ السابقة التي
+لا تحتوي المسبار.
+
+مثال (كل تشغيل عملية جديدة - بدء بارد):
+    git worktree add ../baseline 91e4700
+    python -m utils.startup --main ../baseline/spx_trader/main.py --save-baseline baseline.json
+    python -m utils.startup --runs 5 --baseline baseline.json --ratio 0.5
+    python -m utils.startup --exe dist/SPXTrader.exe --budget 2.0
+
+القياس المسجل (Linux، Python 3.11، --imports، 7 تشغيلات من خارج العملية): خط
+الأساس 91e4700 وسيطه 1.47 ث (906 وحدة)، وبعد التأجيل 0.22 ث (223 وحدة) أي 15%؛
+الحد الافتراضي 50% من خط الأساس. (لم تكن 91e4700 تبدأ أصلاً: يلزمها حذف استيراد
+core.connection المفقود وتصحيح مساري charts و style.theme قبل قياسها.)
+"""
+import os
+import sys
+import json
+import time
+
+# تُستورد قبل كل شيء في main.py، فأدوات القياس (subprocess وغيرها) تُستورد داخل الدوال
+STARTED = time.perf_counter()
+
+PROBE_ENV = 'SPX_STARTUP_PROBE'
+PROBE_PREFIX = 'SPX_STARTUP '
+
+# وحدات يجب ألا تُحمَّل قبل ظهور النافذة (تُحمَّل عند أول اتصال أو أول عرض للرسم)
+HEAVY_MODULES = ('ib_insync', 'pandas', 'numpy', 'matplotlib')
+
+# الحد الافتراضي كنسبة من خط الأساس المسجل
+BUDGET_RATIO = 0.5
+
+# استيراد main.py دون تشغيل main(): نفس استيرادات البدء في أي نسخة من المشروع
+IMPORT_PROBE = """
+import json, runpy, sys, time
+started = time.perf_counter()
+runpy.run_path(sys.argv[1], run_name='__startup_probe__')
+print({prefix!r} + json.dumps({{
+    'seconds': time.perf_counter() - started,
+    'heavy_modules': [name for name in {heavy!r} if name in sys.modules],
+    'modules': len(sys.modules)
+}}), flush=True)
+""".format(prefix=PROBE_PREFIX, heavy=HEAVY_MODULES)
+
+
+def probe_startup(root):
+    """طباعة زمن ظهور النافذة والوحدات الثقيلة المحمَّلة ثم الإغلاق (عند تفعيل المسبار فقط)"""
+    if not os.environ.get(PROBE_ENV):
+        return
+
+    def report():
+        root.update_idletasks()
+        print(PROBE_PREFIX + json.dumps({
+            'seconds': time.perf_counter() - STARTED,
+            'heavy_modules': [name for name in HEAVY_MODULES if name in sys.modules],
+            'modules': len(sys.modules)
+        }), flush=True)
+        root.destroy()
+
+    root.after(0, report)
+
+
+def run_once(command: list, cwd: str, timeout: float) -> dict:
+    """تشغيل التطبيق مرة بمسبار بدء التشغيل وقياس الزمن الكلي من خارج العملية"""
+    import subprocess
+    # النسخ السابقة (مثل خط الأساس) تستورد spx_trader.* فتحتاج المجلد الأعلى للمشروع في المسار
+    paths = [os.path.dirname(os.path.abspath(cwd)), os.environ.get('PYTHONPATH', '')]
+    env = {**os.environ, PROBE_ENV: '1', 'PYTHONPATH': os.pathsep.join(filter(None, paths))}
+    started = time.perf_counter()
+    proc = subprocess.run(command, cwd=cwd, env=env, capture_output=True, text=True, timeout=timeout)
+    wall = time.perf_counter() - started
+    for line in proc.stdout.splitlines():
+        if line.startswith(PROBE_PREFIX):
+            return {'wall_seconds': wall, **json.loads(line[len(PROBE_PREFIX):]), 'stderr': proc.stderr}
+    raise RuntimeError(f"لم تظهر النافذة (رمز الخروج {proc.returncode}):\n{proc.stderr[-2000:]}")
+
+
+def import_times(stderr: str, top: int = 15) -> list:
+    """أبطأ الوحدات (الزمن التراكمي) من مخرجات -X importtime"""
+    rows = []
+    for line in stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            if cumulative.strip().isdigit():
+                rows.append((int(cumulative) / 1e6, name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main(argv=None):
+    import argparse
+    import statistics
+    from pathlib import Path
+    parser = argparse.ArgumentParser(description="قياس زمن بدء التشغيل حتى ظهور النافذة")
+    parser.add_argument('--exe', help="ملف تنفيذي محزَّم (PyInstaller) بدلاً من main.py")
+    parser.add_argument('--main', help="main.py لنسخة أخرى من المشروع (مثل خط الأساس)")
+    parser.add_argument('--imports', action='store_true',
+                        help="قياس استيرادات البدء فقط (بلا نافذة - يعمل بلا شاشة وعلى النسخ السابقة)")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, help="الحد الأقصى لوسيط الزمن بالثواني")
+    parser.add_argument('--baseline', help="ملف خط الأساس: الحد = --ratio من وسيطه")
+    parser.add_argument('--ratio', type=float, default=BUDGET_RATIO)
+    parser.add_argument('--save-baseline', help="حفظ الوسيط المقاس كخط أساس في هذا الملف")
+    parser.add_argument('--importtime', action='store_true', help="عرض أبطأ الاستيرادات (غير المحزَّم فقط)")
+    parser.add_argument('--timeout', type=float, default=60)
+    args = parser.parse_args(argv)
+
+    main_py = Path(args.main or Path(__file__).resolve().parent.parent / 'main.py').resolve()
+    mode = 'imports' if args.imports else 'window'
+    if args.exe:
+        command, cwd = [str(Path(args.exe).resolve())], str(Path(args.exe).resolve().parent)
+    else:
+        command = [sys.executable] + (['-X', 'importtime'] if args.importtime else [])
+        command += ['-c', IMPORT_PROBE, str(main_py)] if args.imports else [str(main_py)]
+        cwd = str(main_py.parent)
+
+    budget = args.budget
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        if baseline['mode'] != mode:
+            parser.error(f"خط الأساس مقاس بوضع {baseline['mode']} وليس {mode}")
+        budget = args.ratio * baseline['median']
+        print(f"خط الأساس {baseline['median']:.3f} ث ({baseline['source']})، الحد {args.ratio:.0%} منه")
+
+    results = [run_once(command, cwd, args.timeout) for _ in range(args.runs)]
+    walls = [result['wall_seconds'] for result in results]
+    median = statistics.median(walls)
+    heavy = sorted({name for result in results for name in result['heavy_modules']})
+
+    for number, result in enumerate(results, 1):
+        print(f"تشغيل {number}: {result['wall_seconds']:.3f} ث (داخل العملية "
+              f"{result['seconds']:.3f} ث، {result['modules']} وحدة)")
+    print(f"الوسيط {median:.3f} ث، الأقصى {max(walls):.3f} ث"
+          + (f"، الحد {budget:.3f} ث" if budget is not None else ""))
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps({
+            'median': median, 'mode': mode, 'runs': args.runs, 'source': args.exe or str(main_py)
+        }, ensure_ascii=False), encoding='utf-8')
+        print(f"تم حفظ خط الأساس في {args.save_baseline}")
+    if args.importtime:
+        print("أبطأ الاستيرادات:")
+        for seconds, name in import_times(results[-1]['stderr']):
+            print(f"  {seconds:7.3f} ث  {name}")
+
+    failed = False
+    if heavy and not args.save_baseline:
+        print(f"❌ وحدات ثقيلة حُمِّلت قبل ظهور النافذة: {', '.join(heavy)}")
+        failed = True
+    if budget is not None and median > budget:
+        print("❌ تجاوز زمن بدء التشغيل الحد المسموح")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
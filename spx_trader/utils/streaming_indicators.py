@@ -0,0 +1,253 @@
+# utils/streaming_indicators.py
+import math
+from collections import deque
+import numpy as np
+from typing import Optional
+from config import config
+
+NAN = float('nan')
+
+
+def _kahan_add(total: float, compensation: float, x: float):
+    """جمع مع تعويض كاهان لمنع تراكم أخطاء التقريب في المجاميع الجارية"""
+    y = x - compensation
+    t = total + y
+    return t, (t - total) - y
+
+
+class StreamingSMA:
+    """متوسط متحرك بسيط بمجموع جارٍ (مع تعويض كاهان) - تحديث O(1) لكل شمعة"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.window = deque()
+        self.total = 0.0
+        self.compensation = 0.0
+        self.nonzero = 0
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        """إضافة قيمة جديدة وإرجاع المتوسط الحالي"""
+        self.total, self.compensation, self.nonzero = self._step(x)
+        self.window.append(x)
+        if len(self.window) > self.period:
+            self.window.popleft()
+        self.value = self._mean(self.total, self.nonzero, len(self.window))
+        return self.value
+
+    def peek(self, x: float) -> float:
+        """قيمة المتوسط لو أضيفت x دون تعديل الحالة"""
+        total, _, nonzero = self._step(x)
+        return self._mean(total, nonzero, min(len(self.window) + 1, self.period))
+
+    def _step(self, x):
+        total, compensation, nonzero = self.total, self.compensation, self.nonzero
+        if len(self.window) == self.period:
+            old = self.window[0]
+            total, compensation = _kahan_add(total, compensation, -old)
+            nonzero -= (old != 0)
+        total, compensation = _kahan_add(total, compensation, x)
+        return total, compensation, nonzero + (x != 0)
+
+    def _mean(self, total, nonzero, count):
+        if count < self.period:
+            return NAN
+        # نافذة كلها أصفار تعطي صفرًا تامًا دون أخطاء تقريب متراكمة
+        return total / count if nonzero else 0.0
+
+
+class StreamingEMA:
+    """متوسط متحرك أسي تكراري مطابق لـ ewm(span, adjust=False)"""
+
+    def __init__(self, span: int = None, alpha: float = None):
+        self.alpha = alpha if alpha is not None else 2 / (span + 1)
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        self.value = self.peek(x)
+        return self.value
+
+    def peek(self, x: float) -> float:
+        if self.value != self.value:
+            return x
+        old_wt = 1 - self.alpha
+        # نفس صيغة pandas لضمان تطابق النتائج بتًا ببت
+        return (old_wt * self.value + self.alpha * x) / (old_wt + self.alpha)
+
+
+class StreamingRSI:
+    """مؤشر RSI تزايدي بتنعيم المتوسط البسيط (مطابق لـ calculate_rsi) أو تنعيم وايلدر"""
+
+    def __init__(self, period: int = None, wilder: bool = False):
+        self.period = period or config.get('rsi_period', 14)
+        self.wilder = wilder
+        self.prev_price = None
+        self.value = NAN
+        if wilder:
+            self.avg_gain = _WilderAverage(self.period)
+            self.avg_loss = _WilderAverage(self.period)
+        else:
+            self.avg_gain = StreamingSMA(self.period)
+            self.avg_loss = StreamingSMA(self.period)
+
+    def update(self, price: float) -> float:
+        gain, loss = self._changes(price)
+        self.prev_price = price
+        if gain is None:
+            return self.value
+        self.value = self._rsi(self.avg_gain.update(gain), self.avg_loss.update(loss))
+        return self.value
+
+    def peek(self, price: float) -> float:
+        gain, loss = self._changes(price)
+        if gain is None:
+            return self.value
+        return self._rsi(self.avg_gain.peek(gain), self.avg_loss.peek(loss))
+
+    def _changes(self, price):
+        if self.prev_price is None:
+            # الفرق الأول غير معرف: يُحسب صفرًا في النسخة البسيطة ويُتجاهل في وايلدر
+            return (None, None) if self.wilder else (0.0, 0.0)
+        delta = price - self.prev_price
+        return max(delta, 0.0), max(-delta, 0.0)
+
+    @staticmethod
+    def _rsi(avg_gain, avg_loss):
+        if avg_gain != avg_gain or avg_loss != avg_loss:
+            return NAN
+        if avg_loss == 0:
+            return NAN if avg_gain == 0 else 100.0
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+class _WilderAverage:
+    """متوسط وايلدر: بذرة بمتوسط بسيط لأول period قيمة ثم تنعيم بمعامل 1/period"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.count = 0
+        self.seed_total = 0.0
+        self.ema = StreamingEMA(alpha=1 / period)
+
+    def update(self, x: float) -> float:
+        self.count += 1
+        if self.count < self.period:
+            self.seed_total += x
+            return NAN
+        if self.count == self.period:
+            self.seed_total += x
+            return self.ema.update(self.seed_total / self.period)
+        return self.ema.update(x)
+
+    def peek(self, x: float) -> float:
+        if self.count + 1 < self.period:
+            return NAN
+        if self.count + 1 == self.period:
+            return (self.seed_total + x) / self.period
+        return self.ema.peek(x)
+
+
+class StreamingBollinger:
+    """عصابات بولينجر بتباين ويلفورد على نافذة منزلقة"""
+
+    def __init__(self, period: int = 20, std_dev: float = 2):
+        self.period = period
+        self.std_dev = std_dev
+        self.window = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.value = (NAN, NAN)
+
+    def update(self, x: float):
+        """إضافة قيمة وإرجاع (النطاق العلوي، النطاق السفلي)"""
+        old = self.window[0] if len(self.window) == self.period else None
+        self.mean, self.m2 = self._step(x, old)
+        self.window.append(x)
+        if old is not None:
+            self.window.popleft()
+        self.value = self._bands(self.mean, self.m2, len(self.window))
+        return self.value
+
+    def peek(self, x: float):
+        old = self.window[0] if len(self.window) == self.period else None
+        mean, m2 = self._step(x, old)
+        return self._bands(mean, m2, min(len(self.window) + 1, self.period))
+
+    def _step(self, x, old):
+        n = len(self.window)
+        mean, m2 = self.mean, self.m2
+        if old is not None:
+            # إزالة أقدم قيمة من النافذة
+            n -= 1
+            if n == 0:
+                mean, m2 = 0.0, 0.0
+            else:
+                new_mean = mean - (old - mean) / n
+                m2 -= (old - mean) * (old - new_mean)
+                mean = new_mean
+        n += 1
+        delta = x - mean
+        mean += delta / n
+        m2 += delta * (x - mean)
+        return mean, max(m2, 0.0)
+
+    def _bands(self, mean, m2, count):
+        if count < self.period or count < 2:
+            return NAN, NAN
+        std = math.sqrt(m2 / (count - 1))
+        return mean + std * self.std_dev, mean - std * self.std_dev
+
+
+class StreamingMACD:
+    """مؤشر MACD بمتوسطات أسية تكرارية"""
+
+    def __init__(self, fast_period: int = 12, slow_period: int = 26, signal_period: int = 9):
+        self.fast = StreamingEMA(fast_period)
+        self.slow = StreamingEMA(slow_period)
+        self.signal = StreamingEMA(signal_period)
+        self.value = (NAN, NAN)
+
+    def update(self, x: float):
+        """إضافة سعر وإرجاع (MACD، خط الإشارة)"""
+        macd = self.fast.update(x) - self.slow.update(x)
+        self.value = (macd, self.signal.update(macd))
+        return self.value
+
+    def peek(self, x: float):
+        macd = self.fast.peek(x) - self.slow.peek(x)
+        return macd, self.signal.peek(macd)
+
+
+class IndicatorState:
+    """حالة المؤشرات التزايدية لرمز واحد تُغذى بالشموع المغلقة فقط"""
+
+    def __init__(self, rsi_period: int = None, ma_period: int = None):
+        self.rsi = StreamingRSI(rsi_period)
+        self.ma = StreamingSMA(ma_period or config.get('ma_period', 50))
+        self.last_date = None
+
+    def sync(self, df) -> Optional[dict]:
+        """
+        تغذية الشموع المغلقة الجديدة وتقدير قيم الشمعة الأخيرة (غير المكتملة)
+
+        Args:
+            df (pd.DataFrame): شموع تحتوي عمودي date و close
+
+        Returns:
+            dict: {'rsi': ..., 'ma': ...} للشمعة الأخيرة أو None عند الحاجة لإعادة البناء
+        """
+        dates = df['date'].values
+        closes = df['close'].values
+        start = 0
+        if self.last_date is not None:
+            if len(dates) < 2 or dates[-2] < self.last_date:
+                return None
+            start = np.searchsorted(dates[:-1], self.last_date, side='right')
+
+        for i in range(start, len(dates) - 1):
+            self.rsi.update(closes[i])
+            self.ma.update(closes[i])
+            self.last_date = dates[i]
+
+        last_close = closes[-1]
+        return {'rsi': self.rsi.peek(last_close), 'ma': self.ma.peek(last_close)}